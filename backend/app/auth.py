@@ -1,32 +1,36 @@
-import json
+import math
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from typing import NamedTuple, Optional
 from fastapi import Depends, HTTPException, status, APIRouter
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
 
-from .database import get_db
-from .models import User
+from .config import settings
+from .database import get_db, ReadSessionLocal
+from .models import User, UserProfile
 from .schemas import UserCreate, UserResponse, Token
+from .utils.ttl_cache import TTLCache
+from .services.password_service import get_pwd_context, password_hasher
+from .services.rate_limiter import rate_limiter
+from .services.response_cache import response_cache
 
 # Secret key for JWT (in production, use environment variable)
 SECRET_KEY = "menth-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -36,11 +40,26 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    # python-jose pulls in cryptography, imported on first use rather than at startup
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-async def get_current_user(
+def decode_token_subject(token: str) -> Optional[str]:
+    """Username carried by a valid access token, None if the token is invalid or expired"""
+    from jose import JWTError, jwt
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+
+# Plain def so FastAPI runs it in the threadpool, waiting on the (single, under WAL)
+# writer connection from the event loop stalls the request that holds it
+def get_current_user(
     token: str = Depends(oauth2_scheme), 
     db: Session = Depends(get_db)
 ):
@@ -49,12 +68,8 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
+    username = decode_token_subject(token)
+    if username is None:
         raise credentials_exception
     
     user = db.query(User).filter(User.username == username).first()
@@ -71,40 +86,170 @@ async def get_current_active_user(
     return current_user
 
 
+class Principal(NamedTuple):
+    """The fields of the authenticated user most routes actually need"""
+    id: int
+    username: str
+    is_active: bool
+    user_type: str
+
+
+# Keyed by token subject (username)
+principal_cache = TTLCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl)
+
+
+def _load_principal(username: str) -> Optional[Principal]:
+    db = ReadSessionLocal()
+    try:
+        row = db.query(User.id, User.username, User.is_active, User.user_type).filter(
+            User.username == username
+        ).first()
+        return Principal(*row) if row else None
+    finally:
+        db.close()
+
+
+def invalidate_principals(*usernames: str):
+    """Drop cached principals, for writes the ORM events don't see (query.update(),
+    Core statements). Call it after the commit"""
+    for username in usernames:
+        principal_cache.pop(username)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _mark_principal_stale(mapper, connection, target):
+    # A rename leaves the old subject cached too
+    usernames = {target.username, *(inspect(target).attrs.username.history.deleted or ())}
+    session = object_session(target)
+    if session is None:
+        invalidate_principals(*usernames)
+        return
+    # Flush time is too early: until the commit, a concurrent request would cache the old row again
+    session.info.setdefault("stale_principals", set()).update(usernames)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_principals(session):
+    invalidate_principals(*session.info.pop("stale_principals", ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_stale_principals(session):
+    session.info.pop("stale_principals", None)
+
+
+async def get_current_principal(token: str = Depends(oauth2_scheme)) -> Principal:
+    """Like get_current_user but served from principal_cache, no DB session on a hit"""
+    username = decode_token_subject(token)
+    if username is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    principal = principal_cache.get(username)
+    if principal is None:
+        principal = await run_in_threadpool(_load_principal, username)
+        if principal is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        principal_cache.set(username, principal)
+    return principal
+
+
+async def get_current_active_principal(
+    principal: Principal = Depends(get_current_principal)
+) -> Principal:
+    if not principal.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+
+def first_and_release(db: Session, query):
+    """query.first(), then end the read transaction so the pooled connection isn't
+    held while bcrypt runs. The returned object is detached from the session."""
+    row = query.first()
+    if row is not None:
+        db.expunge(row)
+    db.rollback()
+    return row
+
+
 # Authentication routes
 @router.post("/signup", response_model=UserResponse)
-def signup(user: UserCreate, db: Session = Depends(get_db)):
+async def signup(user: UserCreate, db: Session = Depends(get_db)):
     # Check if user already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = await run_in_threadpool(first_and_release, db, db.query(User).filter(User.email == user.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    # bcrypt runs in the password process pool, not on the event loop
+    hashed_password = await password_hasher.hash(user.password)
     
     # Create new user
     db_user = User(
-    username=user.username,
-    email=user.email,
-    hashed_password=hashed_password,
-    full_name=user.full_name,
-    user_type=user.user_type,
-    level=user.level,
-    subjects=json.dumps(user.subjects) if user.subjects else None  # Convert list to JSON string
-)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+        username=user.username,
+        email=user.email,
+        hashed_password=hashed_password,
+        full_name=user.full_name,
+        user_type=user.user_type,
+        level=user.level,
+        subjects=user.subjects or None  # JSON column, stored as a list
+    )
+    await run_in_threadpool(_save_user, db, db_user)
+    response_cache.invalidate("search")
     return db_user
 
 
+def _save_user(db: Session, user: User):
+    db.add(user)
+    # flush for the id, then user and profile commit together
+    db.flush()
+    db.add(UserProfile(user_id=user.id))
+    db.commit()
+    db.refresh(user)
+
+
+async def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+    """Check credentials off the event loop, rehashing outdated password hashes on success"""
+    user = await run_in_threadpool(first_and_release, db, db.query(User).filter(User.username == username))
+    valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password if user else None)
+    if not valid:
+        return None
+    if new_hash:
+        user.hashed_password = new_hash
+        await run_in_threadpool(_save_password, db, user, new_hash)
+    return user
+
+
+def _save_password(db: Session, user: User, hashed_password: str):
+    db.query(User).filter(User.id == user.id).update({"hashed_password": hashed_password})
+    db.commit()
+    # A bulk update, the mapper events don't fire for it
+    invalidate_principals(user.username)
+
+
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     username: str, 
     password: str, 
     db: Session = Depends(get_db)
 ):
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not verify_password(password, user.hashed_password):
+    # Per account, before paying for a bcrypt check. The middleware's per-IP rule is loose
+    rule, wait = await rate_limiter.check_login(username)
+    if rule is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, please retry shortly",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+    user = await authenticate_user(db, username, password)
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -8,6 +8,136 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     database_url: str = "sqlite:///./mentii.db"
+    # Apply migrations once at startup. Turn off with several workers and run
+    # `alembic upgrade head` as a deploy step instead
+    auto_migrate: bool = True
+    frontend_dir: Optional[str] = None  # built frontend to serve at /, defaults to ../frontend next to backend/
+    redis_url: Optional[str] = None
+
+    # Connection pools (per engine, per worker). pool_size + max_overflow should cover
+    # the 40 request threads, sync handlers can otherwise starve get_db teardown
+    # (which also needs a thread) and deadlock on checkout
+    db_pool_size: int = 20
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800  # seconds, stays under typical server idle timeouts
+
+    # SQLite storage profile, file databases only. "wal": WAL journal, relaxed fsync,
+    # mmap and a bigger page cache, one writer connection per engine and a pool of
+    # read-only readers that never wait on it. "default": stock SQLite, one shared pool
+    sqlite_profile: str = "wal"
+    sqlite_synchronous: str = "NORMAL"  # safe under WAL, a crash can only lose the last commits
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size: int = -64000  # negative is KiB, ~64MB per connection
+    sqlite_busy_timeout: int = 5000  # ms to wait on a lock before SQLITE_BUSY
+    sqlite_read_pool_size: int = 20
+
+    # Read replicas, comma separated URLs. GET routes are spread over the healthy ones,
+    # writes and auth lookups stay on database_url. Two SQLite files (or the same file
+    # twice) are enough to try it locally
+    database_replica_urls: str = ""
+    replica_sticky_seconds: float = 5.0  # a client reads from the primary this long after a write
+    replica_max_lag_seconds: float = 10.0  # replicas further behind are skipped
+    replica_check_interval: float = 5.0  # seconds between health/lag checks
+
+    # Password hashing
+    bcrypt_rounds: int = 12  # raising this rehashes existing passwords on next login
+    password_workers: int = 2  # bcrypt processes, 0 runs bcrypt in the request threadpool
+    password_max_pending: int = 64  # hash/verify jobs admitted before answering 503
+
+    # Authenticated principal cache
+    auth_cache_size: int = 10000
+    auth_cache_ttl: float = 60.0  # seconds, bounds staleness across workers
+
+    # Feed materialization
+    feed_inbox_size: int = 500
+    feed_fanout_threshold: int = 5000  # communities bigger than this are merged at read time
+
+    # Feed ranking, the newest N candidates are ranked by relevance, 0 keeps the feed chronological
+    feed_rank_candidates: int = 300
+    feed_rank_half_life_hours: float = 12.0  # recency halves every this many hours
+    feed_weight_recency: float = 3.0
+    feed_weight_likes: float = 0.5  # per log(1 + likes)
+    feed_weight_comments: float = 0.8  # per log(1 + comments)
+    feed_weight_subject: float = 1.0  # post subject is one of the user's
+    feed_weight_affinity: float = 0.7  # per log(1 + likes the user gave the author)
+    feed_profile_cache_size: int = 10000  # users' subjects and liked authors
+    feed_window_cache_size: int = 2000  # ranked windows kept for their following pages
+    feed_cache_ttl: float = 300.0
+
+    # Like/comment counters, 0 updates them in the request's transaction,
+    # otherwise increments are coalesced in memory and flushed every N seconds
+    counter_flush_interval: float = 0.0
+
+    # Trending
+    trending_half_life_hours: float = 6.0  # a post this much newer needs half the points
+    trending_window_hours: float = 48.0  # older posts drop off the boards
+    trending_refresh_interval: float = 60.0  # seconds between rebuilds from the database
+    trending_cache_ttl: float = 10.0  # likes move the boards constantly, cache briefly
+
+    # Community recommendations
+    recommend_refresh_interval: float = 600.0  # seconds between rebuilds, joins apply immediately
+    recommend_activity_days: int = 14  # posts this recent count as activity
+
+    # Response cache for read-heavy GETs (Redis when redis_url is set)
+    response_cache_size: int = 2000
+    response_cache_ttl: float = 60.0
+    # Writes bump "search" in their own worker (every worker with Redis), others wait this out
+    search_cache_ttl: float = 20.0
+
+    # Streaks and badges
+    activity_flush_interval: float = 30.0  # seconds between streak/badge batches
+
+    # Group commit for message and post inserts
+    write_batch_size: int = 100  # flush as soon as this many are waiting
+    write_batch_delay: float = 0.005  # seconds the first write waits for company
+
+    # Resources
+    resource_storage: str = "local"  # "local" or "s3"
+    resource_storage_path: str = "./uploads"
+    resource_s3_bucket: str = ""
+    resource_s3_prefix: str = "resources/"
+    resource_s3_endpoint_url: Optional[str] = None  # MinIO and other S3-compatible stores
+    resource_max_bytes: int = 200 * 1024 * 1024
+    # Content types kept from the upload, anything else is stored as application/octet-stream.
+    # Nothing a browser would render as a page (text/html, image/svg+xml, ...)
+    resource_content_types: str = (
+        "application/pdf,text/plain,text/csv,image/png,image/jpeg,image/gif,image/webp,"
+        "audio/mpeg,audio/mp4,audio/ogg,video/mp4,video/webm,application/zip,"
+        "application/msword,application/vnd.ms-powerpoint,application/vnd.ms-excel,"
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document,"
+        "application/vnd.openxmlformats-officedocument.presentationml.presentation,"
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+    download_flush_interval: float = 10.0  # seconds between download_count batches
+
+    # Instrumentation, /api/metrics in Prometheus text format (per worker)
+    metrics_enabled: bool = True
+    n_plus_one_threshold: int = 10  # one statement run this many times in a request is flagged
+    slow_request_ms: float = 0.0  # log slower requests with the SQL they ran, 0 is off
+
+    # Rate limits, "METHOD /route/template=COUNT/PERIOD[:BURST]" with PERIOD s, m or h,
+    # comma separated, "*=..." covers every route without its own rule. Buckets are
+    # per user with a valid token, per IP otherwise, shared over Redis when redis_url is set.
+    # Login's per-IP rule is sized for a school behind one NAT, guessing is capped per username
+    rate_limit_enabled: bool = True
+    rate_limit_rules: str = (
+        "POST /api/auth/login=600/m:300, POST /api/auth/signup=10/m:10, "
+        "GET /api/search/=10/s:20, POST /api/chat/send=10/s:30"
+    )
+    rate_limit_login_per_username: str = "10/m:10"  # COUNT/PERIOD[:BURST], empty turns it off
+    rate_limit_max_keys: int = 100000  # in-memory buckets per worker
+    rate_limit_trust_forwarded: bool = False  # key on X-Forwarded-For, only behind a proxy that sets it
+
+    # Overload shedding, 503 before the request starts. 0 turns a check off
+    shed_max_in_flight: int = 1000  # per worker
+    shed_max_queue: int = 200  # requests waiting for a threadpool thread
+    shed_latency_ms: float = 2000.0  # median handler time over recent requests where shedding starts
+    shed_latency_window: int = 200  # recent requests that median is taken over
+
+    # Realtime
+    ws_send_queue_size: int = 100  # pending messages per socket before it is evicted
+    ws_send_timeout: float = 5.0  # seconds a single send may take before the socket is evicted
     
     class Config:
         env_file = ".env"
@@ -1,24 +1,174 @@
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from typing import List, Optional
 import os
 
-# For Windows: SQLite database (easy to start)
-DATABASE_URL = "sqlite:///./mentii.db"
+from .config import settings
+from .services.replica_router import Replica, ReplicaRouter
+
+# SQLite file by default (easy to start), set DATABASE_URL for Postgres
+DATABASE_URL = settings.database_url
+
+# Async drivers for the same database
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)).render_as_string(hide_password=False)
+
+
+def uses_wal(url: str, profile: Optional[str] = None) -> bool:
+    """True for SQLite files running the "wal" storage profile"""
+    parsed = make_url(url)
+    return (
+        parsed.get_backend_name() == "sqlite"
+        and parsed.database not in (None, "", ":memory:")
+        and (profile or settings.sqlite_profile) == "wal"
+    )
+
+
+def _sqlite_pragmas(read_only: bool) -> List[str]:
+    pragmas = [
+        f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout)}",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}",
+        f"PRAGMA cache_size={int(settings.sqlite_cache_size)}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    else:
+        # Persisted in the file, readers pick it up from there
+        pragmas.insert(0, "PRAGMA journal_mode=WAL")
+    return pragmas
+
+
+def _install_sqlite_profile(sync_engine, read_only: bool):
+    pragmas = _sqlite_pragmas(read_only)
+
+    @event.listens_for(sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def _engine_options(url: str, read_only: bool = False, profile: Optional[str] = None) -> dict:
+    options = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+        if uses_wal(url, profile):
+            # SQLite allows one writer at a time anyway, writers queue on the pool
+            # instead of spinning on the file lock. Readers don't block under WAL
+            options["pool_size"] = settings.sqlite_read_pool_size if read_only else 1
+            options["max_overflow"] = settings.db_max_overflow if read_only else 0
+    else:
+        options["pool_pre_ping"] = True
+    return options
+
+
+def create_db_engine(url: str, read_only: bool = False, profile: Optional[str] = None):
+    db_engine = create_engine(url, **_engine_options(url, read_only, profile))
+    if uses_wal(url, profile):
+        _install_sqlite_profile(db_engine, read_only)
+    return db_engine
+
+
+def create_async_db_engine(url: str, read_only: bool = False, profile: Optional[str] = None):
+    db_engine = create_async_engine(async_database_url(url), **_engine_options(url, read_only, profile))
+    if uses_wal(url, profile):
+        # Connect events fire on the sync engine underneath
+        _install_sqlite_profile(db_engine.sync_engine, read_only)
+    return db_engine
+
 
 # Create engine
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
+engine = create_db_engine(DATABASE_URL)
 
 # Create session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the hot read/write paths, shares the schema with `engine`
+async_engine = create_async_db_engine(DATABASE_URL)
+# expire_on_commit=False so results can be serialized after commit without lazy IO
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Read-only engines for GETs and background reads. Their own pools under the WAL
+# profile, the write engines otherwise
+if uses_wal(DATABASE_URL):
+    read_engine = create_db_engine(DATABASE_URL, read_only=True)
+    async_read_engine = create_async_db_engine(DATABASE_URL, read_only=True)
+else:
+    read_engine, async_read_engine = engine, async_engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+# Replicas take the GET routes' reads, see get_read_db/get_async_read_db
+replica_router = ReplicaRouter(
+    [
+        Replica(make_url(url).render_as_string(hide_password=True),
+                create_db_engine(url, read_only=True), create_async_db_engine(url, read_only=True))
+        for url in (url.strip() for url in settings.database_replica_urls.split(",")) if url
+    ],
+    settings.replica_sticky_seconds,
+    settings.replica_max_lag_seconds,
+    settings.replica_check_interval,
+)
+
 # Base class for models
 Base = declarative_base()
 
+def dialect_insert(db):
+    """insert() for the session's dialect, with ON CONFLICT support"""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def _pick_replica(request: Request):
+    replica = replica_router.pick(request.headers.get("authorization"))
+    # The response cache keeps bodies built from a replica only briefly
+    request.state.replica = replica.name if replica else None
+    return replica
+
+# Read-only dependencies, on a replica when one is configured and healthy
+def get_read_db(request: Request):
+    replica = _pick_replica(request)
+    db = replica.SessionLocal() if replica else ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Async dependency, doesn't tie up a threadpool thread for the request
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db(request: Request):
+    replica = _pick_replica(request)
+    async with (replica.AsyncSessionLocal if replica else AsyncReadSessionLocal)() as db:
+        yield db
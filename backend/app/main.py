@@ -1,30 +1,64 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 import os
 
-from .database import engine, Base, get_db
-from .routes import users, chat, communities, resources, search
-from .websocket import websocket_endpoint
+from .config import settings
+from .database import engine, async_engine, read_engine, async_read_engine, replica_router
+from .schema import BACKEND_DIR, ensure_schema
+from .routes import users, chat, communities, resources, search, posts
+from .websocket import websocket_endpoint, manager
 from . import auth  # Import auth from the root app directory
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
+from .services.password_service import password_hasher
+from .services.counter_buffer import post_counters, resource_counters
+from .services.trending_engine import trending_engine
+from .services.community_recommender import community_recommender
+from .services.feed_ranker import feed_ranker
+from .services.streak_service import activity_queue
+from .services.response_cache import response_cache
+from .services.metrics import metrics, MetricsMiddleware
+from .services.rate_limiter import rate_limiter, load_shedder, RateLimitMiddleware
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Mentii Backend Starting...")
+    # Schema work belongs to startup, not import, so importing the app stays cheap
+    if settings.auto_migrate:
+        await run_in_threadpool(ensure_schema, engine)
+    await manager.start()
+    await post_counters.start()
+    await resource_counters.start()
+    await trending_engine.start()
+    await community_recommender.start()
+    await activity_queue.start()
+    await replica_router.start()
     yield
     # Shutdown
+    await manager.stop()
+    await trending_engine.stop()
+    await community_recommender.stop()
+    await activity_queue.stop()
+    await posts.post_writer.stop()
+    await chat.message_writer.stop()
+    await post_counters.stop()
+    await resource_counters.stop()
+    password_hasher.shutdown()
+    await async_engine.dispose()
+    await async_read_engine.dispose()
+    await replica_router.stop()
+    await rate_limiter.store.close()
     print("👋 Mentii Backend Shutting Down...")
 
 app = FastAPI(
     title="Mentii API",
     description="Social Learning Platform API",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware for frontend - keep only one CORS middleware
@@ -36,6 +70,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Read-your-writes: after a successful write the client reads from the primary
+# for a few seconds. Only installed when there are replicas to route away from
+if replica_router.replicas:
+    @app.middleware("http")
+    async def replica_stickiness(request: Request, call_next):
+        response = await call_next(request)
+        if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+            replica_router.mark_write(request.headers.get("authorization"))
+        return response
+
+# Rate limits and overload shedding, refused requests never reach routing
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter, shedder=load_shedder)
+
+# Per-route latency and SQL accounting, added last (outermost) so the timings include every other layer
+if settings.metrics_enabled:
+    metrics.install()
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
 # Include routers
 app.include_router(auth.router)  # auth.router is already defined with prefix="/api/auth" in auth.py
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
@@ -43,16 +95,41 @@ app.include_router(chat.router, prefix="/api/chat", tags=["Chat"])
 app.include_router(communities.router, prefix="/api/communities", tags=["Communities"])
 app.include_router(resources.router, prefix="/api/resources", tags=["Resources"])
 app.include_router(search.router, prefix="/api/search", tags=["Search"])
+app.include_router(posts.router, prefix="/api/posts", tags=["Posts"])
 
 # WebSocket endpoint
 app.add_api_websocket_route("/ws", websocket_endpoint)
 
-# Serve frontend static files
-app.mount("/", StaticFiles(directory="../frontend", html=True), name="frontend")
-
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy", "service": "mentii-backend"}
+    return {
+        "status": "healthy",
+        "service": "mentii-backend",
+        "auth_cache": auth.principal_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "post_counters": post_counters.stats(),
+        "download_counters": resource_counters.stats(),
+        "trending": trending_engine.stats(),
+        "feed_ranking": feed_ranker.stats(),
+        "recommendations": community_recommender.stats(),
+        "activity": activity_queue.stats(),
+        "response_cache": response_cache.stats(),
+        "write_batches": {"posts": posts.post_writer.stats(), "messages": chat.message_writer.stats()},
+        "db_pools": {"write": engine.pool.status(), "read": read_engine.pool.status()},
+        "replicas": replica_router.stats(),
+        "metrics": metrics.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "load_shedding": load_shedder.stats()
+    }
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Serve frontend static files, mounted last since "/" matches every path
+FRONTEND_DIR = settings.frontend_dir or os.path.join(os.path.dirname(BACKEND_DIR), "frontend")
+if os.path.isdir(FRONTEND_DIR):
+    app.mount("/", StaticFiles(directory=FRONTEND_DIR, html=True), name="frontend")
 
 if __name__ == "__main__":
     import uvicorn
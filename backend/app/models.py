@@ -1,21 +1,33 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Table, JSON, Index, UniqueConstraint
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
 
+# SQLite's CURRENT_TIMESTAMP has no fractional part, store and bind python datetimes
+# the same way so keyset comparisons on (created_at, id) match rows exactly
+Timestamp = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite"
+)
+
 # Association tables
+# The unique (user_id, community_id) index doubles as the membership lookup,
+# community_id gets its own for member lists and fan out
 user_communities = Table(
     'user_communities',
     Base.metadata,
-    Column('user_id', Integer, ForeignKey('users.id')),
-    Column('community_id', Integer, ForeignKey('communities.id'))
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+    Column('community_id', Integer, ForeignKey('communities.id'), nullable=False, index=True),
+    UniqueConstraint('user_id', 'community_id', name='uq_user_communities')
 )
 
 post_likes = Table(
     'post_likes',
     Base.metadata,
-    Column('user_id', Integer, ForeignKey('users.id')),
-    Column('post_id', Integer, ForeignKey('posts.id'))
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+    Column('post_id', Integer, ForeignKey('posts.id'), nullable=False, index=True),
+    UniqueConstraint('user_id', 'post_id', name='uq_post_likes')
 )
 
 class User(Base):
@@ -31,7 +43,7 @@ class User(Base):
     subjects = Column(JSON, nullable=True)  # ADD THIS LINE # Form 1, Form 2, etc.
     avatar_url = Column(String)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
     
     # Relationships
     posts = relationship("Post", back_populates="author")
@@ -40,6 +52,10 @@ class User(Base):
     communities = relationship("Community", secondary=user_communities, back_populates="members")
     liked_posts = relationship("Post", secondary=post_likes, back_populates="liked_by")
 
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
+
 class Post(Base):
     __tablename__ = "posts"
     
@@ -50,9 +66,9 @@ class Post(Base):
     community_id = Column(Integer, ForeignKey("communities.id"))
     subject = Column(String)
     tags = Column(String)  # comma-separated tags
-    like_count = Column(Integer, default=0)
+    like_count = Column(Integer, default=0)  # maintained by EngagementService
     comment_count = Column(Integer, default=0)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
     
     # Relationships
     author = relationship("User", back_populates="posts")
@@ -60,6 +76,11 @@ class Post(Base):
     liked_by = relationship("User", secondary=post_likes, back_populates="liked_posts")
     comments = relationship("Comment", back_populates="post")
 
+    __table_args__ = (
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        Index("ix_posts_community_created_at_id", "community_id", "created_at", "id"),
+    )
+
 class Community(Base):
     __tablename__ = "communities"
     
@@ -72,12 +93,17 @@ class Community(Base):
     banner_color = Column(String, default="#7F5AF0")
     is_teacher_led = Column(Boolean, default=False)
     created_by = Column(Integer, ForeignKey("users.id"))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    member_count = Column(Integer, default=0, server_default="0", nullable=False)  # maintained by CommunityService
+    created_at = Column(Timestamp, server_default=func.now())
     
     # Relationships
     members = relationship("User", secondary=user_communities, back_populates="communities")
     posts = relationship("Post", back_populates="community")
 
+    __table_args__ = (
+        Index("ix_communities_created_at_id", "created_at", "id"),
+    )
+
 class Message(Base):
     __tablename__ = "messages"
     
@@ -86,12 +112,39 @@ class Message(Base):
     sender_id = Column(Integer, ForeignKey("users.id"))
     receiver_id = Column(Integer, ForeignKey("users.id"))
     is_read = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
     
     # Relationships
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_messages")
     receiver = relationship("User", foreign_keys=[receiver_id], back_populates="received_messages")
 
+    # History reads walk one direction of a pair newest first, mark-read flips
+    # (partner -> me) rows, both are range scans on this index
+    __table_args__ = (
+        Index("ix_messages_pair_created_at_id", "sender_id", "receiver_id", "created_at", "id"),
+    )
+
+class Conversation(Base):
+    """Inbox summary per user pair, maintained by ChatService.record_message"""
+    __tablename__ = "conversations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # user_a_id is always the lower of the two ids
+    user_a_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_b_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    last_message_id = Column(Integer, ForeignKey("messages.id"))
+    last_message = Column(Text)
+    last_sender_id = Column(Integer, ForeignKey("users.id"))
+    last_message_at = Column(Timestamp, server_default=func.now())
+    unread_a = Column(Integer, default=0, nullable=False)  # unread messages for user_a
+    unread_b = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_a_id", "user_b_id", name="uq_conversations_pair"),
+        Index("ix_conversations_user_a_last", "user_a_id", "last_message_at"),
+        Index("ix_conversations_user_b_last", "user_b_id", "last_message_at"),
+    )
+
 class Resource(Base):
     __tablename__ = "resources"
     
@@ -104,7 +157,18 @@ class Resource(Base):
     level = Column(String)
     uploaded_by = Column(Integer, ForeignKey("users.id"))
     download_count = Column(Integer, default=0)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Where the bytes live in the storage backend, plus what downloads need to serve them
+    storage_key = Column(String)
+    filename = Column(String)
+    content_type = Column(String)
+    size = Column(Integer)
+    created_at = Column(Timestamp, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_resources_created_at_id", "created_at", "id"),
+        # Listing filters on subject (and level), newest first
+        Index("ix_resources_subject_level_created_at_id", "subject", "level", "created_at", "id"),
+    )
 
 class Comment(Base):
     __tablename__ = "comments"
@@ -113,19 +177,23 @@ class Comment(Base):
     content = Column(Text, nullable=False)
     post_id = Column(Integer, ForeignKey("posts.id"))
     author_id = Column(Integer, ForeignKey("users.id"))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
     
     # Relationships
     post = relationship("Post", back_populates="comments")
     author = relationship("User")
 
+    __table_args__ = (
+        Index("ix_comments_post_created_at_id", "post_id", "created_at", "id"),
+    )
+
 class UserProfile(Base):
     __tablename__ = "user_profiles"
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), unique=True)
     bio = Column(Text)
-    badges = Column(String)  # comma-separated badge names
+    badge_mask = Column(Integer, default=0, server_default="0", nullable=False)  # bits from streak_service.BADGES
     streak_days = Column(Integer, default=0)
     followers_count = Column(Integer, default=0)
     following_count = Column(Integer, default=0)
@@ -1,35 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
-from typing import List
 
 from ..database import get_db
 from ..models import User, UserProfile, Community
 from ..auth import (
-    verify_password, get_password_hash, create_access_token,
-    ACCESS_TOKEN_EXPIRE_MINUTES, get_current_user, get_current_active_user
+    create_access_token, authenticate_user, first_and_release,
+    ACCESS_TOKEN_EXPIRE_MINUTES, get_current_active_user
 )
+from ..services.password_service import password_hasher
+from ..services.community_service import CommunityService
+from ..services.community_recommender import community_recommender
+from ..services.feed_store import get_feed_store
+from ..services.response_cache import response_cache
+from ..websocket import manager, community_room
 from ..schemas import (
-    UserCreate, UserResponse, Token, LoginRequest,
+    UserCreate, UserResponse, Token,
     OnboardingRequest
 )
 
 router = APIRouter()
 
 @router.post("/register", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: Session = Depends(get_db)):
     # Check if user exists
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = await run_in_threadpool(first_and_release, db, db.query(User).filter(User.email == user.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    db_username = db.query(User).filter(User.username == user.username).first()
+    db_username = await run_in_threadpool(first_and_release, db, db.query(User).filter(User.username == user.username))
     if db_username:
         raise HTTPException(status_code=400, detail="Username already taken")
     
-    # Create new user
-    hashed_password = get_password_hash(user.password)
+    # Create new user, bcrypt runs in the password process pool
+    hashed_password = await password_hasher.hash(user.password)
     db_user = User(
         email=user.email,
         username=user.username,
@@ -38,22 +44,23 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         user_type=user.user_type,
         level=user.level
     )
+    await run_in_threadpool(_create_user, db, db_user)
+    response_cache.invalidate("search")
     
+    return db_user
+
+def _create_user(db: Session, db_user: User):
     db.add(db_user)
+    # flush for the id, then user and profile commit together
+    db.flush()
+    db.add(UserProfile(user_id=db_user.id))
     db.commit()
     db.refresh(db_user)
-    
-    # Create user profile
-    profile = UserProfile(user_id=db_user.id)
-    db.add(profile)
-    db.commit()
-    
-    return db_user
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -68,18 +75,26 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/onboarding")
-def onboarding(data: OnboardingRequest, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    # Update user with onboarding data
-    current_user.subjects = ",".join(data.subjects)
+def onboarding(data: OnboardingRequest, background_tasks: BackgroundTasks, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+    # Update user with onboarding data, subjects is a JSON list like signup stores it
+    current_user.subjects = data.subjects
     current_user.level = data.level
     
-    # Join selected communities
-    for community_name in data.communities:
-        community = db.query(Community).filter(Community.name == community_name).first()
-        if community:
-            current_user.communities.append(community)
+    # Join selected communities, resolved in one query
+    community_ids = [community_id for (community_id,) in db.query(Community.id).filter(
+        Community.name.in_(data.communities)
+    )] if data.communities else []
+    communities = CommunityService(db)
+    joined = [community_id for community_id in community_ids if communities.join(current_user.id, community_id)]
     
     db.commit()
+    for community_id in joined:
+        community_recommender.join(current_user.id, community_id)
+        background_tasks.add_task(manager.subscribe_user, current_user.id, community_room(community_id))
+    if joined:
+        # member_count changed
+        response_cache.invalidate("communities", "search")
+        get_feed_store().drop(current_user.id)
     return {"message": "Onboarding completed successfully"}
 
 @router.get("/me", response_model=UserResponse)
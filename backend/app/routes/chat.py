@@ -1,48 +1,104 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, Query
+import json
+from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ..database import get_db
-from ..models import User, Message
-from ..auth import get_current_active_user
-from ..schemas import MessageCreate, MessageResponse
+from ..database import get_async_db, get_async_read_db
+from ..models import Message
+from ..auth import get_current_active_principal, Principal
+from ..schemas import MessageCreate, MessageResponse, ConversationResponse, UserSummary, MarkReadRequest, Page
+from ..utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..utils.serialization import json_response
+from ..config import settings
+from ..services.chat_service import ChatService
+from ..services.write_batcher import WriteBatcher
+from ..services.streak_service import activity_queue
+from ..websocket import manager
 
 router = APIRouter()
 
-@router.get("/conversations")
-def get_conversations(current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    # Get all unique users you've chatted with
-    sent_to = db.query(Message.receiver_id).filter(Message.sender_id == current_user.id).distinct()
-    received_from = db.query(Message.sender_id).filter(Message.receiver_id == current_user.id).distinct()
-    
-    user_ids = set([id[0] for id in sent_to] + [id[0] for id in received_from])
-    
-    conversations = []
-    for user_id in user_ids:
-        user = db.query(User).filter(User.id == user_id).first()
-        if user:
-            last_message = db.query(Message).filter(
-                ((Message.sender_id == current_user.id) & (Message.receiver_id == user_id)) |
-                ((Message.sender_id == user_id) & (Message.receiver_id == current_user.id))
-            ).order_by(Message.created_at.desc()).first()
-            
-            conversations.append({
-                "user": user,
-                "last_message": last_message.content if last_message else "",
-                "unread": False
-            })
-    
-    return conversations
+@router.get("/conversations", response_model=List[ConversationResponse])
+async def get_conversations(current_user: Principal = Depends(get_current_active_principal), db: AsyncSession = Depends(get_async_read_db)):
+    rows = await db.run_sync(lambda session: ChatService(session).get_conversations(current_user.id))
+    return json_response(List[ConversationResponse], [
+        {
+            "id": row.id,
+            "user": {field: getattr(row, f"user_{field}") for field in UserSummary.model_fields},
+            "last_message": row.last_message or "",
+            "last_message_at": row.last_message_at,
+            "unread": row.unread_count > 0,
+            "unread_count": row.unread_count
+        }
+        for row in rows
+    ])
+
+def _store_messages(db: Session, messages: List[Message]):
+    db.add_all(messages)
+    # One multi-row INSERT ... RETURNING for the whole batch
+    db.flush()
+    # Summary rows are updated in the same transaction as the messages
+    chat = ChatService(db)
+    for message in messages:
+        chat.record_message(message)
+
+message_writer = WriteBatcher(_store_messages, settings.write_batch_size, settings.write_batch_delay)
 
-@router.post("/send")
-def send_message(message: MessageCreate, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+@router.post("/send", response_model=MessageResponse)
+async def send_message(message: MessageCreate, background_tasks: BackgroundTasks, current_user: Principal = Depends(get_current_active_principal)):
     db_message = Message(
         content=message.content,
         sender_id=current_user.id,
         receiver_id=message.receiver_id
     )
+    # Committed together with whatever else arrived in the same few milliseconds
+    await message_writer.submit(db_message)
+    activity_queue.record(current_user.id)
+
+    # Push to the receiver's open sockets on any worker once the response is sent
+    event = json.dumps({"type": "message", "message": MessageResponse.model_validate(db_message).model_dump(mode="json")})
+    background_tasks.add_task(manager.send_personal_message, event, db_message.receiver_id)
     
-    db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
-    
-    return db_message
\ No newline at end of file
+    return db_message
+
+@router.get("/{user_id}/messages", response_model=Page[MessageResponse])
+async def get_messages(
+    user_id: int,
+    cursor: Optional[str] = None,
+    since: Optional[int] = Query(None, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """History with `user_id`. With `cursor` (or nothing) pages go newest first.
+    With `since=<message id>` only newer messages come back, oldest first, and
+    next_cursor is the id to pass as the next `since`."""
+    if since is not None and cursor:
+        raise HTTPException(status_code=400, detail="Use either cursor or since")
+
+    if since is not None:
+        messages, has_more = await db.run_sync(
+            lambda session: ChatService(session).get_since(current_user.id, user_id, since, limit)
+        )
+        next_cursor = str(messages[-1].id) if has_more else None
+    else:
+        messages, next_cursor = await db.run_sync(
+            lambda session: ChatService(session).get_history(current_user.id, user_id, cursor, limit)
+        )
+    return json_response(Page[MessageResponse], {"items": messages, "next_cursor": next_cursor})
+
+@router.post("/{user_id}/read")
+async def mark_read(
+    user_id: int,
+    background_tasks: BackgroundTasks,
+    data: Optional[MarkReadRequest] = None,
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    up_to_id = data.up_to_id if data else None
+    updated = await db.run_sync(lambda session: ChatService(session).mark_read(current_user.id, user_id, up_to_id))
+    if updated:
+        # Read receipt for the sender's open sockets
+        event = json.dumps({"type": "read", "user_id": current_user.id, "up_to_id": up_to_id})
+        background_tasks.add_task(manager.send_personal_message, event, user_id)
+    return {"updated": updated}
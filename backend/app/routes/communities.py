@@ -1,27 +1,76 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from ..database import get_db
+from ..database import get_async_db, get_async_read_db
 from ..models import Community, User
-from ..auth import get_current_active_user
-from ..schemas import CommunityResponse
+from ..auth import get_current_active_principal, Principal
+from ..schemas import CommunityResponse, Page, RecommendedCommunity
+from ..utils.pagination import keyset_statement, keyset_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..services.community_service import CommunityService
+from ..services.community_recommender import community_recommender, as_subjects
+from ..services.feed_store import get_feed_store
+from ..services.response_cache import response_cache
+from ..websocket import manager, community_room
 
 router = APIRouter()
 
-@router.get("/", response_model=List[CommunityResponse])
-def get_communities(db: Session = Depends(get_db)):
-    communities = db.query(Community).all()
-    return communities
+@router.get("/", response_model=Page[CommunityResponse])
+async def get_communities(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    async def build():
+        result = await db.execute(keyset_statement(select(Community), Community, cursor, limit))
+        communities, next_cursor = keyset_page(result.scalars(), limit)
+        return {"items": communities, "next_cursor": next_cursor}
+
+    return await response_cache.respond(request, "communities", build, Page[CommunityResponse])
+
+@router.get("/recommended", response_model=List[RecommendedCommunity])
+async def get_recommended_communities(
+    subjects: List[str] = Query([]),
+    level: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=50),
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    # Onboarding passes the choices being made, otherwise the stored profile
+    if not subjects or not level:
+        profile = (await db.execute(select(User.subjects, User.level).filter(User.id == current_user.id))).first()
+        if profile:
+            subjects = subjects or as_subjects(profile.subjects)
+            level = level or profile.level
+
+    ranked = community_recommender.recommend(current_user.id, subjects, level, limit)
+    if not ranked:
+        return []
+    result = await db.execute(select(Community).filter(Community.id.in_([community_id for community_id, _ in ranked])))
+    by_id = {community.id: community for community in result.scalars()}
+    return [
+        RecommendedCommunity(**CommunityResponse.model_validate(by_id[community_id]).model_dump(), score=score)
+        for community_id, score in ranked if community_id in by_id
+    ]
 
 @router.post("/{community_id}/join")
-def join_community(community_id: int, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    community = db.query(Community).filter(Community.id == community_id).first()
+async def join_community(community_id: int, background_tasks: BackgroundTasks, current_user: Principal = Depends(get_current_active_principal), db: AsyncSession = Depends(get_async_db)):
+    community = (await db.execute(
+        select(Community.id, Community.name).filter(Community.id == community_id)
+    )).first()
     if not community:
         raise HTTPException(status_code=404, detail="Community not found")
     
-    if current_user not in community.members:
-        community.members.append(current_user)
-        db.commit()
+    joined = await db.run_sync(lambda s: CommunityService(s).join(current_user.id, community_id))
+    if joined:
+        await db.commit()
+        community_recommender.join(current_user.id, community_id)
+        # member_count changed, search results carry it too
+        response_cache.invalidate("communities", "search")
+        # New community, rebuild the materialized feed on next read
+        get_feed_store().drop(current_user.id)
+        background_tasks.add_task(manager.subscribe_user, current_user.id, community_room(community_id))
     
-    return {"joined": True, "community": community.name}
\ No newline at end of file
+    return {"joined": True, "community": community.name}
@@ -0,0 +1,143 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import List, Optional
+import json
+import logging
+
+from ..database import get_async_db, get_async_read_db
+from ..models import Post, User, Community
+from ..auth import get_current_active_principal, Principal
+from ..schemas import PostCreate, PostResponse, CommentCreate, CommentResponse, Page, UserSummary
+from ..services.feed_service import FeedService
+from ..services.engagement_service import EngagementService
+from ..services.trending_engine import trending_engine
+from ..services.streak_service import activity_queue
+from ..services.response_cache import response_cache
+from ..config import settings
+from ..utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..utils.serialization import json_response, columns_for
+from ..services.write_batcher import WriteBatcher
+from ..websocket import manager, community_room
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def _insert_posts(db: Session, posts: List[Post]):
+    # Only the insert, the batcher commits and retries a failed batch post by post
+    db.add_all(posts)
+
+post_writer = WriteBatcher(_insert_posts, settings.write_batch_size, settings.write_batch_delay)
+
+def _after_publish(db: Session, post: Post):
+    """Author for the response, inbox fan-out and trending, once the post is committed"""
+    # The response is serialized outside the session
+    set_committed_value(post, "author", db.query(User).options(
+        load_only(*columns_for(User, UserSummary))
+    ).filter(User.id == post.author_id).first())
+    try:
+        FeedService(db).fan_out_post(post)
+        trending_engine.add(post.id, post.community_id, post.subject, post.created_at)
+    except Exception:
+        # The post exists, failing the request would only invite a duplicate retry.
+        # Inboxes missing it catch up when they are reseeded
+        logger.exception("fan-out of post %s failed", post.id)
+
+@router.post("/", response_model=PostResponse)
+async def create_post(post: PostCreate, background_tasks: BackgroundTasks, current_user: Principal = Depends(get_current_active_principal), db: AsyncSession = Depends(get_async_db)):
+    community = (await db.execute(select(Community.id).filter(Community.id == post.community_id))).first()
+    if not community:
+        raise HTTPException(status_code=404, detail="Community not found")
+    # Hand the connection back, the batch writer needs one while we wait on it
+    await db.rollback()
+
+    db_post = Post(
+        content=post.content,
+        image_url=post.image_url,
+        author_id=current_user.id,
+        community_id=post.community_id,
+        subject=post.subject,
+        tags=",".join(post.tags) if post.tags else None
+    )
+    # Committed together with whatever else arrived in the same few milliseconds
+    await post_writer.submit(db_post)
+    await db.run_sync(_after_publish, db_post)
+    # Releases the connection, the author stays loaded (a rollback would expire it)
+    await db.close()
+    activity_queue.record(current_user.id)
+    response_cache.invalidate("trending", "search")
+
+    event = json.dumps({"type": "post", "post": PostResponse.model_validate(db_post).model_dump(mode="json")})
+    background_tasks.add_task(manager.send_to_room, event, community_room(db_post.community_id))
+    return db_post
+
+@router.get("/feed", response_model=Page[PostResponse])
+async def get_feed(
+    cursor: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=50),
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    posts, next_cursor = await db.run_sync(
+        lambda session: FeedService(session).get_personalized_feed(current_user.id, cursor=cursor, limit=limit)
+    )
+    return json_response(Page[PostResponse], {"items": posts, "next_cursor": next_cursor})
+
+@router.get("/trending", response_model=List[PostResponse])
+async def get_trending(
+    request: Request,
+    limit: int = Query(10, ge=1, le=50),
+    community_id: Optional[int] = None,
+    subject: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    async def build():
+        return await db.run_sync(
+            lambda session: FeedService(session).get_trending_posts(limit=limit, community_id=community_id, subject=subject)
+        )
+
+    return await response_cache.respond(request, "trending", build, List[PostResponse], ttl=settings.trending_cache_ttl)
+
+async def _get_post_or_404(db: AsyncSession, post_id: int):
+    post = (await db.execute(select(Post.id).filter(Post.id == post_id))).first()
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+def _set_like(db: Session, user_id: int, post_id: int, liked: bool):
+    service = EngagementService(db)
+    if liked:
+        service.like(user_id, post_id)
+    else:
+        service.unlike(user_id, post_id)
+    return {"liked": liked, "like_count": service.count(post_id, "like_count")}
+
+@router.post("/{post_id}/like")
+async def like_post(post_id: int, current_user: Principal = Depends(get_current_active_principal), db: AsyncSession = Depends(get_async_db)):
+    await _get_post_or_404(db, post_id)
+    activity_queue.record(current_user.id)
+    return await db.run_sync(_set_like, current_user.id, post_id, True)
+
+@router.delete("/{post_id}/like")
+async def unlike_post(post_id: int, current_user: Principal = Depends(get_current_active_principal), db: AsyncSession = Depends(get_async_db)):
+    await _get_post_or_404(db, post_id)
+    return await db.run_sync(_set_like, current_user.id, post_id, False)
+
+@router.post("/{post_id}/comments", response_model=CommentResponse)
+async def create_comment(post_id: int, comment: CommentCreate, current_user: Principal = Depends(get_current_active_principal), db: AsyncSession = Depends(get_async_db)):
+    await _get_post_or_404(db, post_id)
+    activity_queue.record(current_user.id)
+    return await db.run_sync(lambda session: EngagementService(session).add_comment(current_user.id, post_id, comment.content))
+
+@router.get("/{post_id}/comments", response_model=Page[CommentResponse])
+async def get_comments(
+    post_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    comments, next_cursor = await db.run_sync(
+        lambda session: EngagementService(session).get_comments(post_id, cursor=cursor, limit=limit)
+    )
+    return json_response(Page[CommentResponse], {"items": comments, "next_cursor": next_cursor})
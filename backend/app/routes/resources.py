@@ -1,27 +1,128 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import RedirectResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import mimetypes
+import os
+import uuid
 
-from ..database import get_db
-from ..models import Community, User
-from ..auth import get_current_active_user
-from ..schemas import CommunityResponse
+from ..database import get_async_db, get_async_read_db
+from ..models import Resource
+from ..auth import get_current_active_principal, Principal
+from ..schemas import ResourceCreate, ResourceResponse, Page
+from ..config import settings
+from ..utils.pagination import keyset_statement, keyset_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..utils.serialization import json_response
+from ..utils.file_response import RangeFileResponse
+from ..services.resource_storage import get_storage, safe_content_type, UploadTooLarge
+from ..services.counter_buffer import resource_counters
+from ..services.streak_service import activity_queue
+from ..services.response_cache import response_cache
 
 router = APIRouter()
 
-@router.get("/", response_model=List[CommunityResponse])
-def get_communities(db: Session = Depends(get_db)):
-    communities = db.query(Community).all()
-    return communities
-
-@router.post("/{community_id}/join")
-def join_community(community_id: int, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    community = db.query(Community).filter(Community.id == community_id).first()
-    if not community:
-        raise HTTPException(status_code=404, detail="Community not found")
-    
-    if current_user not in community.members:
-        community.members.append(current_user)
-        db.commit()
-    
-    return {"joined": True, "community": community.name}
\ No newline at end of file
+@router.get("/", response_model=Page[ResourceResponse])
+async def get_resources(
+    subject: Optional[str] = None,
+    level: Optional[str] = None,
+    file_type: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Newest first, optionally filtered. subject (+ level) is served by
+    ix_resources_subject_level_created_at_id"""
+    stmt = select(Resource)
+    if subject:
+        stmt = stmt.filter(Resource.subject == subject)
+    if level:
+        stmt = stmt.filter(Resource.level == level)
+    if file_type:
+        stmt = stmt.filter(Resource.file_type == file_type)
+    result = await db.execute(keyset_statement(stmt, Resource, cursor, limit))
+    resources, next_cursor = keyset_page(result.scalars(), limit)
+    return json_response(Page[ResourceResponse], {"items": resources, "next_cursor": next_cursor})
+
+@router.post("/", response_model=ResourceResponse)
+async def upload_resource(
+    request: Request,
+    meta: ResourceCreate = Depends(),
+    filename: Optional[str] = None,
+    current_user: Principal = Depends(get_current_active_principal),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """The file is the raw request body (not multipart), the metadata goes in the
+    query string. The body is streamed to storage as it arrives, never held in memory."""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > settings.resource_max_bytes:
+        raise HTTPException(status_code=413, detail="File too large")
+
+    storage = get_storage()
+    filename = os.path.basename(filename) if filename else None
+    extension = os.path.splitext(filename or "")[1].lower()[:16]
+    key = f"{uuid.uuid4().hex}{extension}"
+    content_type = safe_content_type(request.headers.get("content-type") or mimetypes.guess_type(filename or "")[0])
+    try:
+        size = await storage.save(key, request.stream(), settings.resource_max_bytes, content_type)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail="File too large")
+
+    resource = Resource(
+        **meta.model_dump(),
+        uploaded_by=current_user.id,
+        storage_key=key,
+        filename=filename,
+        content_type=content_type,
+        size=size,
+        download_count=0,
+    )
+    try:
+        db.add(resource)
+        await db.flush()
+        resource.file_url = f"/api/resources/{resource.id}/download"
+        await db.commit()
+        await db.refresh(resource)
+    except Exception:
+        await storage.delete(key)
+        raise
+
+    activity_queue.record(current_user.id)
+    response_cache.invalidate("search")
+    return resource
+
+async def _get_resource_or_404(db: AsyncSession, resource_id: int) -> Resource:
+    resource = await db.get(Resource, resource_id)
+    if not resource:
+        raise HTTPException(status_code=404, detail="Resource not found")
+    return resource
+
+@router.get("/{resource_id}", response_model=ResourceResponse)
+async def get_resource(resource_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    return await _get_resource_or_404(db, resource_id)
+
+@router.get("/{resource_id}/download")
+async def download_resource(resource_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    resource = await _get_resource_or_404(db, resource_id)
+    # Downloads can take minutes, don't keep a pooled connection for them
+    db.expunge(resource)
+    await db.rollback()
+    if not resource.storage_key:
+        raise HTTPException(status_code=404, detail="Resource has no file")
+
+    storage = get_storage()
+    url = storage.url(resource.storage_key, resource.filename)
+    if url:
+        resource_counters.add(resource_id, "download_count", 1)
+        return RedirectResponse(url, status_code=307)
+
+    path = storage.path(resource.storage_key)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Resource file missing")
+    # Checked again on the way out, rows stored before the allowlist may carry anything
+    response = RangeFileResponse(path, request.headers, media_type=safe_content_type(resource.content_type),
+                                 filename=resource.filename or resource.storage_key)
+    # Players fetch a file in many ranges, count the one starting at byte 0
+    if response.status_code == 200 or (response.range and response.range[0] == 0):
+        resource_counters.add(resource_id, "download_count", 1)
+    return response
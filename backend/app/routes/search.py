@@ -1,57 +1,57 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from typing import Optional
 
-from ..database import get_db
-from ..models import Post, User, Community, Resource
-from ..auth import get_current_active_user
+from ..config import settings
+from ..database import get_async_read_db
+from ..schemas import SearchResults, PostSummary, UserSummary, CommunitySummary, ResourceSummary
+from ..utils.serialization import columns_for
+from ..services.search_index import get_search_index, SEARCH_FIELDS
+from ..services.response_cache import response_cache
 
 router = APIRouter()
 
-@router.get("/")
-def search(
+SEARCH_SCHEMAS = {
+    "posts": PostSummary,
+    "users": UserSummary,
+    "communities": CommunitySummary,
+    "resources": ResourceSummary,
+}
+
+def _run_search(db: Session, kinds, q: str, cursor: Optional[str], limit: int):
+    index = get_search_index(db.get_bind())
+    results = {}
+    for kind in kinds:
+        model = SEARCH_FIELDS[kind][0]
+        ids, next_cursor = index.search(db, kind, q, cursor=cursor, limit=limit)
+        rows = {}
+        if ids:
+            # Only the summary's columns, no ORM instances
+            stmt = select(*columns_for(model, SEARCH_SCHEMAS[kind])).filter(model.id.in_(ids))
+            rows = {row.id: row for row in db.execute(stmt)}
+        # Keep the index's relevance order
+        results[kind] = {"items": [rows[id] for id in ids if id in rows], "next_cursor": next_cursor}
+    return results
+
+@router.get("/", response_model=SearchResults)
+async def search(
+    request: Request,
     q: str = Query(..., min_length=1),
-    type: str = Query("all", regex="^(all|posts|users|communities|resources)$"),
-    db: Session = Depends(get_db)
+    type: str = Query("all", pattern="^(all|posts|users|communities|resources)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    results = {}
-    
-    if type in ["all", "posts"]:
-        posts = db.query(Post).filter(
-            or_(
-                Post.content.ilike(f"%{q}%"),
-                Post.tags.ilike(f"%{q}%")
-            )
-        ).limit(10).all()
-        results["posts"] = posts
-    
-    if type in ["all", "users"]:
-        users = db.query(User).filter(
-            or_(
-                User.username.ilike(f"%{q}%"),
-                User.full_name.ilike(f"%{q}%")
-            )
-        ).limit(10).all()
-        results["users"] = users
-    
-    if type in ["all", "communities"]:
-        communities = db.query(Community).filter(
-            or_(
-                Community.name.ilike(f"%{q}%"),
-                Community.description.ilike(f"%{q}%"),
-                Community.subject.ilike(f"%{q}%")
-            )
-        ).limit(10).all()
-        results["communities"] = communities
-    
-    if type in ["all", "resources"]:
-        resources = db.query(Resource).filter(
-            or_(
-                Resource.title.ilike(f"%{q}%"),
-                Resource.description.ilike(f"%{q}%"),
-                Resource.subject.ilike(f"%{q}%")
-            )
-        ).limit(10).all()
-        results["resources"] = resources
-    
-    return results
\ No newline at end of file
+    # A cursor belongs to one result type, use the per-type next_cursor to page further
+    if cursor and type == "all":
+        raise HTTPException(status_code=400, detail="cursor requires a specific type")
+
+    kinds = list(SEARCH_FIELDS) if type == "all" else [type]
+
+    async def build():
+        return await db.run_sync(_run_search, kinds, q, cursor, limit)
+
+    # Popular queries repeat. New posts, resources, users and memberships invalidate the namespace
+    return await response_cache.respond(request, "search", build, SearchResults, ttl=settings.search_cache_ttl)
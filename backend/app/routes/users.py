@@ -1,14 +1,32 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
+from ..database import get_async_read_db
 from ..models import User
-from ..auth import get_current_active_user
 from ..schemas import UserResponse
+from ..services.response_cache import response_cache
 
 router = APIRouter()
 
+
+def user_namespace(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user(mapper, connection, target):
+    # Names and profiles show up in user search results too
+    response_cache.invalidate(user_namespace(target.id), "search")
+
+
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    return user
\ No newline at end of file
+async def get_user(user_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    async def build():
+        user = await db.get(User, user_id)
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user
+
+    return await response_cache.respond(request, user_namespace(user_id), build, UserResponse)
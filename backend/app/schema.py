@@ -0,0 +1,37 @@
+"""Schema management. Deploys run `alembic upgrade head` from backend/, with
+settings.auto_migrate on the app does the same once at startup instead."""
+import os
+
+from sqlalchemy import inspect
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What create_all() built before migrations existed
+BASELINE_REVISION = "0001_baseline"
+
+
+def alembic_config(connection=None):
+    # Deferred, alembic is only needed when the schema is actually checked
+    from alembic.config import Config
+
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def ensure_schema(engine):
+    """Upgrade the database to the latest migration, in one transaction.
+
+    Databases created by create_all() (tables but no alembic_version) are
+    stamped at the baseline first and upgraded from there.
+    """
+    from alembic import command
+
+    with engine.begin() as connection:
+        config = alembic_config(connection)
+        tables = set(inspect(connection).get_table_names())
+        if tables and "alembic_version" not in tables:
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
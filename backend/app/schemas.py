@@ -1,7 +1,14 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, field_validator
+from typing import Optional, List, Generic, TypeVar
 from datetime import datetime
 
+T = TypeVar("T")
+
+# Keyset pagination envelope, see utils/pagination.py
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
 # User schemas
 class UserBase(BaseModel):
     email: EmailStr
@@ -26,6 +33,18 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+class UserSummary(BaseModel):
+    """Public user fields embedded in posts, search results and conversations"""
+    id: int
+    username: str
+    full_name: Optional[str] = None
+    avatar_url: Optional[str] = None
+    user_type: Optional[str] = None
+    level: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
 # Auth schemas
 class Token(BaseModel):
     access_token: str
@@ -60,11 +79,19 @@ class PostResponse(PostBase):
     like_count: int
     comment_count: int
     created_at: datetime
-    author: UserResponse
+    author: UserSummary
     
     class Config:
         from_attributes = True
 
+    @field_validator("tags", mode="before")
+    @classmethod
+    def split_tags(cls, v):
+        # Post.tags is stored comma-separated
+        if isinstance(v, str):
+            return [tag for tag in v.split(",") if tag]
+        return v
+
 # Comment schemas
 class CommentBase(BaseModel):
     content: str
@@ -100,6 +127,9 @@ class CommunityResponse(CommunityBase):
     class Config:
         from_attributes = True
 
+class RecommendedCommunity(CommunityResponse):
+    score: float
+
 # Resource schemas
 class ResourceBase(BaseModel):
     title: str
@@ -114,6 +144,9 @@ class ResourceCreate(ResourceBase):
 class ResourceResponse(ResourceBase):
     id: int
     file_url: str
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+    size: Optional[int] = None
     download_count: int
     uploaded_by: int
     created_at: datetime
@@ -138,4 +171,59 @@ class MessageResponse(BaseModel):
     created_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class MarkReadRequest(BaseModel):
+    up_to_id: Optional[int] = None  # everything when omitted
+
+class ConversationResponse(BaseModel):
+    id: int
+    user: UserSummary
+    last_message: str
+    last_message_at: datetime
+    unread: bool
+    unread_count: int
+
+# Search schemas, built from column selections rather than full rows
+class PostSummary(BaseModel):
+    id: int
+    content: Optional[str] = None
+    author_id: int
+    community_id: Optional[int] = None
+    subject: Optional[str] = None
+    like_count: int = 0
+    comment_count: int = 0
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class CommunitySummary(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    subject: Optional[str] = None
+    level: Optional[str] = None
+    member_count: int
+
+    class Config:
+        from_attributes = True
+
+class ResourceSummary(BaseModel):
+    id: int
+    title: str
+    description: Optional[str] = None
+    file_type: Optional[str] = None
+    subject: Optional[str] = None
+    level: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class SearchResults(BaseModel):
+    """Only the requested types are set"""
+    posts: Optional[Page[PostSummary]] = None
+    users: Optional[Page[UserSummary]] = None
+    communities: Optional[Page[CommunitySummary]] = None
+    resources: Optional[Page[ResourceSummary]] = None
@@ -0,0 +1,134 @@
+from typing import Optional
+
+from sqlalchemy import case, or_, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from ..database import dialect_insert
+from ..models import Conversation, Message, User
+from ..schemas import MessageResponse, UserSummary
+from ..utils.pagination import keyset_statement, keyset_page, DEFAULT_PAGE_SIZE
+from ..utils.serialization import columns_for
+
+
+class ChatService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record_message(self, message: Message, sent_at=None, unread: bool = True):
+        """Upsert the pair's conversation summary for a new (flushed) message.
+
+        Runs in the caller's transaction, the unread counter is bumped in SQL so
+        concurrent sends never lose an increment.
+        """
+        user_a, user_b = sorted((message.sender_id, message.receiver_id))
+        to_a = 1 if unread and message.receiver_id == user_a else 0
+        to_b = 1 if unread and message.receiver_id == user_b else 0
+        # Messages to yourself never count as unread
+        if user_a == user_b:
+            to_a = to_b = 0
+
+        stmt = dialect_insert(self.db)(Conversation).values(
+            user_a_id=user_a,
+            user_b_id=user_b,
+            last_message_id=message.id,
+            last_message=message.content,
+            last_sender_id=message.sender_id,
+            last_message_at=sent_at if sent_at is not None else func.now(),
+            unread_a=to_a,
+            unread_b=to_b,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_a_id", "user_b_id"],
+            set_={
+                "last_message_id": stmt.excluded.last_message_id,
+                "last_message": stmt.excluded.last_message,
+                "last_sender_id": stmt.excluded.last_sender_id,
+                "last_message_at": stmt.excluded.last_message_at,
+                "unread_a": Conversation.unread_a + to_a,
+                "unread_b": Conversation.unread_b + to_b,
+            },
+        )
+        self.db.execute(stmt)
+
+    def get_conversations(self, user_id: int):
+        """Inbox rows in one indexed query, only the columns the inbox shows.
+
+        Partner columns are prefixed with "user_" (user_id, user_username, ...).
+        """
+        partner_id = case((Conversation.user_a_id == user_id, Conversation.user_b_id), else_=Conversation.user_a_id)
+        unread = case((Conversation.user_a_id == user_id, Conversation.unread_a), else_=Conversation.unread_b)
+        partner_columns = [column.label(f"user_{column.key}") for column in columns_for(User, UserSummary)]
+        return self.db.query(
+            Conversation.id, Conversation.last_message, Conversation.last_message_at,
+            unread.label("unread_count"), *partner_columns
+        ).join(
+            User, User.id == partner_id
+        ).filter(
+            or_(Conversation.user_a_id == user_id, Conversation.user_b_id == user_id)
+        ).order_by(Conversation.last_message_at.desc(), Conversation.id.desc()).all()
+
+    def _directions(self, user_id: int, partner_id: int):
+        return [(user_id, partner_id)] if user_id == partner_id else [(user_id, partner_id), (partner_id, user_id)]
+
+    def _direction(self, sender_id: int, receiver_id: int):
+        return self.db.query(*columns_for(Message, MessageResponse)).filter(
+            Message.sender_id == sender_id, Message.receiver_id == receiver_id
+        )
+
+    def get_history(self, user_id: int, partner_id: int, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE):
+        """Messages between two users, newest first, keyset paged.
+
+        Each direction is its own range scan on ix_messages_pair_created_at_id, the
+        two short lists are merged here instead of asking the database to sort an OR.
+        """
+        rows = []
+        for sender_id, receiver_id in self._directions(user_id, partner_id):
+            rows.extend(keyset_statement(self._direction(sender_id, receiver_id), Message, cursor, limit).all())
+        rows.sort(key=lambda row: (row.created_at, row.id), reverse=True)
+        return keyset_page(rows, limit)
+
+    def get_since(self, user_id: int, partner_id: int, since_id: int, limit: int = DEFAULT_PAGE_SIZE):
+        """Messages after `since_id`, oldest first, for clients catching up after a reconnect.
+
+        Returns (messages, has_more), the next call passes the last id as since.
+        """
+        rows = []
+        for sender_id, receiver_id in self._directions(user_id, partner_id):
+            rows.extend(self._direction(sender_id, receiver_id).filter(
+                Message.id > since_id
+            ).order_by(Message.id).limit(limit + 1).all())
+        rows.sort(key=lambda row: row.id)
+        return rows[:limit], len(rows) > limit
+
+    def mark_read(self, user_id: int, partner_id: int, up_to_id: Optional[int] = None) -> int:
+        """Mark messages from `partner_id` to `user_id` read in one UPDATE and take
+        them off the conversation's unread counter. Commits, returns rows changed."""
+        stmt = update(Message).filter(
+            Message.sender_id == partner_id,
+            Message.receiver_id == user_id,
+            Message.is_read.is_(False),
+        )
+        if up_to_id is not None:
+            stmt = stmt.filter(Message.id <= up_to_id)
+        updated = self.db.execute(stmt.values(is_read=True)).rowcount
+        if updated:
+            user_a, user_b = sorted((user_id, partner_id))
+            unread = Conversation.unread_a if user_id == user_a else Conversation.unread_b
+            self.db.execute(update(Conversation).filter(
+                Conversation.user_a_id == user_a, Conversation.user_b_id == user_b
+            ).values({unread: case((unread > updated, unread - updated), else_=0)}))
+        self.db.commit()
+        return updated
+
+    def backfill(self, batch_size: int = 1000):
+        """Build conversation summaries from existing messages, oldest first"""
+        last_id = 0
+        while True:
+            batch = self.db.query(Message).filter(Message.id > last_id).order_by(Message.id).limit(batch_size).all()
+            if not batch:
+                break
+            for message in batch:
+                self.record_message(message, sent_at=message.created_at, unread=not message.is_read)
+            last_id = batch[-1].id
+        self.db.commit()
@@ -0,0 +1,249 @@
+"""Community recommendations, every community scored for a user in one pass.
+
+Each community is a feature row: subject and level one-hots, then size,
+recent activity and teacher-led. A user's profile (subjects, level) becomes a
+weight vector over the same columns, so the content score for every community
+is one matrix-vector product. On top of that, co-membership: how often people
+in the user's communities are also in each other community, cosine-normalized
+so the biggest communities don't win everything. Most pairs of communities
+share nobody, so co-membership counts are kept sparse (CSR arrays, memory grows
+with the pairs that do share members, not with communities squared). New
+students with no memberships get the content score alone.
+
+The matrices live in memory and are rebuilt from the database every
+`refresh_interval`, joins update them in place in between (and, like trending,
+only in the worker that served the join until the next rebuild).
+"""
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+
+from ..config import settings
+from ..database import ReadSessionLocal
+from ..models import Community, Post, user_communities
+
+logger = logging.getLogger(__name__)
+
+# Contribution of each signal to the final score
+WEIGHTS = {
+    "subject": 1.0,  # split across the user's subjects
+    "level": 0.5,
+    "size": 0.3,
+    "activity": 0.4,
+    "teacher_led": 0.2,
+    "co_membership": 1.5,
+}
+
+# Trailing feature columns, after the subject and level one-hots
+SIZE, ACTIVITY, TEACHER_LED = range(-3, 0)
+
+
+def as_subjects(value) -> List[str]:
+    """User.subjects is a JSON list, older onboarding stored a comma separated string"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [subject.strip() for subject in value.split(",") if subject.strip()]
+    return list(value)
+
+
+class CommunityRecommender:
+    def __init__(self, refresh_interval: float, activity_days: int):
+        self.refresh_interval = refresh_interval
+        self.activity_days = activity_days
+        self.ids = None  # community id per row
+        self.features = None  # (communities, columns) float32
+        self.members = None  # member count per row, float32
+        # Co-membership in CSR form: row i shares co_counts[k] members with
+        # co_columns[k] for k in co_indptr[i]:co_indptr[i + 1], the diagonal left out
+        self.co_indptr = None
+        self.co_columns = None
+        self.co_counts = None
+        self._joined_pairs: Dict[int, Dict[int, int]] = {}  # row -> {row: count}, joins since the load
+        self._rows: Dict[int, int] = {}  # community id -> row
+        self._subjects: Dict[str, int] = {}  # subject -> column
+        self._levels: Dict[str, int] = {}  # level -> column
+        self._memberships: Dict[int, Set[int]] = {}  # user id -> rows
+        self._size_scale = 1.0
+        self._lock = Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.loaded_at: Optional[float] = None
+        self.joins = 0
+
+    def load(self, communities: Iterable[tuple], memberships: Iterable[tuple], activity: Dict[int, int]):
+        """Rebuild from (id, subject, level, is_teacher_led) rows, (user_id, community_id)
+        pairs and recent posts per community. Size comes from the memberships"""
+        import numpy as np
+
+        communities = list(communities)
+        n = len(communities)
+        rows = {community[0]: row for row, community in enumerate(communities)}
+        subjects = {s: i for i, s in enumerate(sorted({c[1] for c in communities if c[1]}))}
+        levels = {l: len(subjects) + i for i, l in enumerate(sorted({c[2] for c in communities if c[2]}))}
+
+        features = np.zeros((n, len(subjects) + len(levels) + 3), dtype=np.float32)
+        ids = np.fromiter((c[0] for c in communities), dtype=np.int64, count=n)
+        if n:
+            subject_rows = [(row, subjects[c[1]]) for row, c in enumerate(communities) if c[1]]
+            level_rows = [(row, levels[c[2]]) for row, c in enumerate(communities) if c[2]]
+            for pairs in (subject_rows, level_rows):
+                if pairs:
+                    features[tuple(np.array(pairs).T)] = 1
+            features[:, TEACHER_LED] = [bool(c[3]) for c in communities]
+            posts = np.log1p(np.array([activity.get(c[0], 0) for c in communities], dtype=np.float32))
+            features[:, ACTIVITY] = posts / max(float(posts.max()), 1.0)
+
+        # Membership pairs as parallel arrays, grouped by user
+        pairs = np.array([(u, rows[c]) for u, c in memberships if c in rows], dtype=np.int64).reshape(-1, 2)
+        pairs = pairs[np.argsort(pairs[:, 0], kind="stable")]
+        users, starts, counts = np.unique(pairs[:, 0], return_index=True, return_counts=True)
+
+        # co[i, j] = users in both i and j. Every membership is paired with each of
+        # its user's other memberships, then the (i, j) pairs are counted by sorting
+        # their i * n + j keys, which also puts them in CSR order
+        group_size = np.repeat(counts, counts)
+        left = np.repeat(np.arange(len(pairs)), group_size)
+        offsets = np.arange(len(left)) - np.repeat(np.cumsum(group_size) - group_size, group_size)
+        right = np.repeat(np.repeat(starts, counts), group_size) + offsets
+        left, right = pairs[left, 1], pairs[right, 1]
+        different = left != right
+        keys, co_counts = np.unique(left[different] * n + right[different], return_counts=True)
+        co_indptr = np.searchsorted(keys, np.arange(n + 1, dtype=np.int64) * n)
+        co_columns = keys % n
+        co_counts = co_counts.astype(np.float32)
+
+        members = np.bincount(pairs[:, 1], minlength=n).astype(np.float32)
+        size_scale = max(math.log1p(float(members.max())) if n else 0.0, 1.0)
+        features[:, SIZE] = np.log1p(members) / size_scale
+
+        memberships = {
+            int(user): set(group.tolist())
+            for user, group in zip(users, np.split(pairs[:, 1], starts[1:]))
+        } if len(users) else {}
+
+        with self._lock:
+            self.ids, self.features, self.members = ids, features, members
+            self.co_indptr, self.co_columns, self.co_counts = co_indptr, co_columns, co_counts
+            self._joined_pairs = {}
+            self._rows, self._subjects, self._levels = rows, subjects, levels
+            self._memberships, self._size_scale = memberships, size_scale
+            self.loaded_at = time.time()
+
+    def join(self, user_id: int, community_id: int):
+        """Count a new membership, right after it is committed"""
+        with self._lock:
+            row = self._rows.get(community_id)
+            # Communities created since the last rebuild show up with the next one
+            if row is None:
+                return
+            joined = self._memberships.setdefault(user_id, set())
+            if row in joined:
+                return
+            self.joins += 1
+            # The CSR arrays stay as loaded, new pairs are counted on the side
+            for other in joined:
+                for a, b in ((row, other), (other, row)):
+                    shared = self._joined_pairs.setdefault(a, {})
+                    shared[b] = shared.get(b, 0) + 1
+            self.members[row] += 1
+            joined.add(row)
+            self.features[row, SIZE] = math.log1p(float(self.members[row])) / self._size_scale
+
+    def recommend(self, user_id: int, subjects: List[str], level: Optional[str], limit: int) -> List[Tuple[int, float]]:
+        """[(community_id, score)] best first, communities the user is in left out"""
+        import numpy as np
+
+        with self._lock:
+            if self.ids is None or not len(self.ids):
+                return []
+            weights = np.zeros(self.features.shape[1], dtype=np.float32)
+            columns = [self._subjects[s] for s in subjects if s in self._subjects]
+            if columns:
+                weights[columns] = WEIGHTS["subject"] / len(columns)
+            if level in self._levels:
+                weights[self._levels[level]] = WEIGHTS["level"]
+            weights[SIZE] = WEIGHTS["size"]
+            weights[ACTIVITY] = WEIGHTS["activity"]
+            weights[TEACHER_LED] = WEIGHTS["teacher_led"]
+            scores = self.features @ weights
+
+            joined = list(self._memberships.get(user_id, ()))
+            if joined:
+                members = self.members
+                similarity = np.zeros_like(scores)
+                for row in joined:
+                    start, end = self.co_indptr[row], self.co_indptr[row + 1]
+                    overlap = np.zeros_like(scores)
+                    overlap[self.co_columns[start:end]] = self.co_counts[start:end]
+                    for other, count in self._joined_pairs.get(row, {}).items():
+                        overlap[other] += count
+                    # Cosine between this community of the user's and every other one
+                    norms = np.sqrt(members[row] * members)
+                    similarity += np.divide(overlap, norms, out=np.zeros_like(overlap), where=norms > 0)
+                scores += WEIGHTS["co_membership"] * similarity / len(joined)
+                scores[joined] = -np.inf
+
+            candidates = int(np.isfinite(scores).sum())
+            limit = min(limit, candidates)
+            if limit <= 0:
+                return []
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(int(self.ids[row]), round(float(scores[row]), 4)) for row in top]
+
+    def refresh(self, db):
+        """Reload communities, memberships and recent activity from the database"""
+        since = datetime.utcnow() - timedelta(days=self.activity_days)
+        self.load(
+            db.query(
+                Community.id, Community.subject, Community.level, Community.is_teacher_led
+            ).order_by(Community.id).all(),
+            db.execute(select(user_communities.c.user_id, user_communities.c.community_id)),
+            dict(db.query(Post.community_id, func.count()).filter(
+                Post.created_at >= since, Post.community_id.isnot(None)
+            ).group_by(Post.community_id).all()),
+        )
+
+    def _refresh_once(self):
+        db = ReadSessionLocal()
+        try:
+            self.refresh(db)
+        finally:
+            db.close()
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(self._refresh_once)
+            except Exception:
+                logger.exception("community matrices not rebuilt, recommending from the last load")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "communities": 0 if self.ids is None else len(self.ids),
+                "co_member_pairs": 0 if self.co_counts is None else len(self.co_counts),
+                "users": len(self._memberships),
+                "joins": self.joins,
+                "loaded_at": self.loaded_at,
+            }
+
+
+community_recommender = CommunityRecommender(settings.recommend_refresh_interval, settings.recommend_activity_days)
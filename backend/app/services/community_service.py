@@ -0,0 +1,47 @@
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from ..database import dialect_insert
+from ..models import Community, user_communities
+
+
+class CommunityService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def join(self, user_id: int, community_id: int) -> bool:
+        """Add a membership and bump member_count, False if already a member.
+
+        Runs in the caller's transaction. The unique constraint decides races, so
+        two concurrent joins can't both count.
+        """
+        stmt = dialect_insert(self.db)(user_communities).values(
+            user_id=user_id, community_id=community_id
+        ).on_conflict_do_nothing(index_elements=["user_id", "community_id"])
+        if self.db.execute(stmt).rowcount == 0:
+            return False
+        self.db.execute(update(Community).filter(Community.id == community_id).values(
+            member_count=Community.member_count + 1
+        ))
+        return True
+
+    def leave(self, user_id: int, community_id: int) -> bool:
+        deleted = self.db.execute(user_communities.delete().filter(
+            user_communities.c.user_id == user_id,
+            user_communities.c.community_id == community_id
+        )).rowcount
+        if not deleted:
+            return False
+        self.db.execute(update(Community).filter(Community.id == community_id).values(
+            member_count=Community.member_count - 1
+        ))
+        return True
+
+    def recount(self):
+        """Rebuild every member_count from user_communities (backfill / repair)"""
+        members = select(func.count()).select_from(user_communities).filter(
+            user_communities.c.community_id == Community.id
+        ).scalar_subquery()
+        self.db.execute(update(Community).values(member_count=members))
+        self.db.commit()
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from collections import defaultdict
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, update
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import Post, Resource
+
+logger = logging.getLogger(__name__)
+
+
+class CounterBuffer:
+    """Coalesces counter increments in memory and applies them in batches.
+
+    A viral post gets one UPDATE per flush instead of one per like, so writers
+    never queue on its row lock. Deltas are additive, every worker can run its
+    own buffer. Counts in the database lag by up to `interval` seconds.
+    """
+
+    def __init__(self, model, columns: Tuple[str, ...], interval: float):
+        self.table = model.__table__
+        self.columns = columns
+        self.interval = interval
+        self._deltas: Dict[int, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(columns, 0))
+        self._lock = Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.rows_flushed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def add(self, row_id: int, column: str, delta: int):
+        with self._lock:
+            self._deltas[row_id][column] += delta
+
+    def pending(self, row_id: int, column: str) -> int:
+        with self._lock:
+            deltas = self._deltas.get(row_id)
+            return deltas[column] if deltas else 0
+
+    def flush(self, db) -> int:
+        """Apply and clear the buffered deltas in one executemany, returns rows touched"""
+        with self._lock:
+            deltas, self._deltas = self._deltas, defaultdict(lambda: dict.fromkeys(self.columns, 0))
+        # Bind names can't clash with the SET columns, hence the d_ prefix
+        params = [
+            {"row_id": row_id, **{f"d_{column}": delta for column, delta in values.items()}}
+            for row_id, values in deltas.items() if any(values.values())
+        ]
+        if not params:
+            return 0
+        stmt = update(self.table).where(self.table.c.id == bindparam("row_id")).values({
+            column: self.table.c[column] + bindparam(f"d_{column}") for column in self.columns
+        })
+        try:
+            db.execute(stmt, params)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put them back for the next round rather than losing counts
+            for row in params:
+                for column in self.columns:
+                    self.add(row["row_id"], column, row[f"d_{column}"])
+            raise
+        self.flushes += 1
+        self.rows_flushed += len(params)
+        return len(params)
+
+    def _flush_once(self):
+        db = SessionLocal()
+        try:
+            return self.flush(db)
+        finally:
+            db.close()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await run_in_threadpool(self._flush_once)
+            except Exception:
+                logger.exception("could not apply %s counter deltas, they stay buffered", self.table.name)
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await run_in_threadpool(self._flush_once)
+
+    def stats(self) -> dict:
+        with self._lock:
+            buffered = len(self._deltas)
+        return {
+            "enabled": self.enabled,
+            "buffered_rows": buffered,
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+        }
+
+
+post_counters = CounterBuffer(Post, ("like_count", "comment_count"), settings.counter_flush_interval)
+
+# Downloads are always batched, a file being fetched in a loop is a single UPDATE per flush
+resource_counters = CounterBuffer(Resource, ("download_count",), settings.download_flush_interval)
@@ -0,0 +1,72 @@
+from typing import Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from ..database import dialect_insert
+from ..models import Comment, Post, post_likes
+from ..utils.pagination import keyset_paginate, DEFAULT_PAGE_SIZE
+from .counter_buffer import post_counters
+from .trending_engine import trending_engine
+
+
+class EngagementService:
+    """Likes and comments. Counters are only ever changed with relative
+    UPDATEs (or through the delta buffer), never read-modify-write."""
+
+    def __init__(self, db: Session, counters=None):
+        self.db = db
+        self.counters = counters or post_counters
+
+    def _bump(self, post_id: int, column: str, delta: int):
+        if not self.counters.enabled:
+            self.db.execute(update(Post).filter(Post.id == post_id).values({column: getattr(Post, column) + delta}))
+
+    def _commit(self, post_id: int, column: str, delta: int):
+        self.db.commit()
+        # Buffered deltas only once the row change is durable
+        if self.counters.enabled:
+            self.counters.add(post_id, column, delta)
+        trending_engine.record(post_id, column, delta)
+
+    def count(self, post_id: int, column: str) -> int:
+        """Current counter including increments not flushed yet"""
+        stored = self.db.query(getattr(Post, column)).filter(Post.id == post_id).scalar() or 0
+        return stored + (self.counters.pending(post_id, column) if self.counters.enabled else 0)
+
+    def like(self, user_id: int, post_id: int) -> bool:
+        """Like a post and commit, False if it was already liked"""
+        stmt = dialect_insert(self.db)(post_likes).values(
+            user_id=user_id, post_id=post_id
+        ).on_conflict_do_nothing(index_elements=["user_id", "post_id"])
+        if self.db.execute(stmt).rowcount == 0:
+            self.db.rollback()
+            return False
+        self._bump(post_id, "like_count", 1)
+        self._commit(post_id, "like_count", 1)
+        return True
+
+    def unlike(self, user_id: int, post_id: int) -> bool:
+        deleted = self.db.execute(post_likes.delete().filter(
+            post_likes.c.user_id == user_id,
+            post_likes.c.post_id == post_id
+        )).rowcount
+        if not deleted:
+            self.db.rollback()
+            return False
+        self._bump(post_id, "like_count", -1)
+        self._commit(post_id, "like_count", -1)
+        return True
+
+    def add_comment(self, user_id: int, post_id: int, content: str) -> Comment:
+        comment = Comment(content=content, post_id=post_id, author_id=user_id)
+        self.db.add(comment)
+        self.db.flush()
+        self._bump(post_id, "comment_count", 1)
+        self._commit(post_id, "comment_count", 1)
+        self.db.refresh(comment)
+        return comment
+
+    def get_comments(self, post_id: int, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE):
+        """Newest first, keyset paged on ix_comments_post_created_at_id"""
+        return keyset_paginate(self.db.query(Comment).filter(Comment.post_id == post_id), Comment, cursor, limit)
@@ -1,35 +1,183 @@
-from sqlalchemy.orm import Session
-from ..models import Post, User
-from datetime import datetime, timedelta
+import math
+import time
+from sqlalchemy.orm import Session, selectinload
+from ..models import Community, Post, User, user_communities
+from ..config import settings
+from .feed_store import get_feed_store
+from .feed_ranker import feed_ranker
+from .trending_engine import trending_engine, community_board, subject_board, GLOBAL_BOARD
+from ..utils.pagination import encode_cursor, decode_cursor, encode_window_cursor, decode_window_cursor
+from ..utils.serialization import columns_for
+from ..schemas import UserSummary
+from typing import List, Optional
+
+def _author_summary():
+    # Only the columns PostResponse.author (UserSummary) serializes
+    return selectinload(Post.author).load_only(*columns_for(User, UserSummary))
+
 
 class FeedService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, store=None):
         self.db = db
-    
-    def get_personalized_feed(self, user_id: int, page: int = 1, limit: int = 10):
-        """Get personalized feed for user based on their communities and interests"""
-        user = self.db.query(User).filter(User.id == user_id).first()
-        
-        if not user:
+        self.store = store or get_feed_store()
+
+    def _community_sizes(self, community_ids):
+        """Member count per community, from the maintained counter"""
+        if not community_ids:
+            return {}
+        rows = self.db.query(Community.id, Community.member_count).filter(Community.id.in_(community_ids)).all()
+        return {community_id: count for community_id, count in rows}
+
+    def _split_communities(self, user_id: int):
+        """Split a user's communities into fanned-out and celebrity (read-time merged) ones"""
+        community_ids = [row[0] for row in self.db.query(user_communities.c.community_id).filter(
+            user_communities.c.user_id == user_id
+        )]
+        sizes = self._community_sizes(community_ids)
+        small, large = [], []
+        for community_id in community_ids:
+            if sizes.get(community_id, 0) > settings.feed_fanout_threshold:
+                large.append(community_id)
+            else:
+                small.append(community_id)
+        return small, large
+
+    def fan_out_post(self, post: Post):
+        """Push a new post into the inbox of every member of its community (fan-out-on-write).
+
+        Celebrity-sized communities are skipped, their posts are pulled at read time instead.
+        """
+        if post.community_id is None:
+            return 0
+        if self._community_sizes([post.community_id]).get(post.community_id, 0) > settings.feed_fanout_threshold:
+            return 0
+        member_ids = [row[0] for row in self.db.query(user_communities.c.user_id).filter(
+            user_communities.c.community_id == post.community_id
+        )]
+        self.store.push(member_ids, post.id)
+        return len(member_ids)
+
+    def _seed_inbox(self, user_id: int, community_ids):
+        """Rebuild a user's inbox from the database, e.g. after a restart or a new join"""
+        post_ids = []
+        if community_ids:
+            post_ids = [row[0] for row in self.db.query(Post.id).filter(
+                Post.community_id.in_(community_ids)
+            ).order_by(Post.id.desc()).limit(self.store.max_size)]
+        self.store.seed(user_id, post_ids)
+
+    def invalidate(self, user_id: int):
+        """Drop a user's inbox so it gets rebuilt on next read (call after joining/leaving)"""
+        self.store.drop(user_id)
+
+    def _candidate_ids(self, user_id: int, small, large, before_id: Optional[int], count: int) -> List[int]:
+        """The newest `count` post ids below `before_id` from the user's communities"""
+        # Post ids grow with created_at, so the inbox is walked by id
+        post_ids = self.store.range(user_id, before_id, count)
+        if len(post_ids) < count and small:
+            # The inbox only keeps the newest feed_inbox_size posts, older ones come
+            # from the database below its tail (an empty result ends the feed)
+            tail = post_ids[-1] if post_ids else before_id
+            older = self.db.query(Post.id).filter(Post.community_id.in_(small))
+            if tail is not None:
+                older = older.filter(Post.id < tail)
+            post_ids += [row[0] for row in older.order_by(Post.id.desc()).limit(count - len(post_ids))]
+        if large:
+            # Merge the materialized inbox with the newest posts of celebrity communities
+            pulled = self.db.query(Post.id).filter(Post.community_id.in_(large))
+            if before_id is not None:
+                pulled = pulled.filter(Post.id < before_id)
+            pulled_ids = [row[0] for row in pulled.order_by(Post.id.desc()).limit(count)]
+            post_ids = sorted(set(post_ids) | set(pulled_ids), reverse=True)[:count]
+        return post_ids
+
+    def _load_page(self, post_ids: List[int]) -> List[Post]:
+        # Authors are loaded up front, serialization must not lazy load (async sessions can't)
+        posts = {p.id: p for p in self.db.query(Post).options(_author_summary()).filter(Post.id.in_(post_ids))}
+        # Deleted posts may linger in inboxes, skip them
+        return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+    def get_personalized_feed(self, user_id: int, cursor: Optional[str] = None, limit: int = 10):
+        """Get personalized feed for user based on their communities and interests.
+
+        Returns (posts, next_cursor). Ranked by relevance when feed_rank_candidates
+        is set, newest first with the shared keyset cursor format otherwise.
+        """
+        small, large = self._split_communities(user_id)
+        if not small and not large:
+            return [], None
+
+        if not self.store.has_inbox(user_id):
+            self._seed_inbox(user_id, small)
+
+        if settings.feed_rank_candidates:
+            return self._ranked_feed(user_id, small, large, cursor, limit)
+
+        before_id = decode_cursor(cursor)[1] if cursor else None
+        # One extra id tells us whether another page exists
+        post_ids = self._candidate_ids(user_id, small, large, before_id, limit + 1)
+        has_more = len(post_ids) > limit
+        post_ids = post_ids[:limit]
+        if not post_ids:
+            return [], None
+        page = self._load_page(post_ids)
+
+        next_cursor = None
+        if has_more and page:
+            next_cursor = encode_cursor(page[-1].created_at, page[-1].id)
+        return page, next_cursor
+
+    def _ranked_feed(self, user_id: int, small, large, cursor: Optional[str], limit: int):
+        """Pages through windows of the newest feed_rank_candidates posts, each ranked
+        by relevance. The cursor pins the window and the time recency is scored at,
+        so every page of a window ranks the same candidates the same way; the next
+        window starts below the oldest candidate of this one."""
+        size = settings.feed_rank_candidates
+        if cursor:
+            before_id, as_of, last_score, last_id = decode_window_cursor(cursor)
+            after = (last_score, last_id) if last_id else None
+        else:
+            before_id, as_of, after = None, time.time(), None
+
+        while True:
+            window = feed_ranker.windows.get((user_id, before_id, as_of)) if before_id else None
+            if window is None:
+                # One extra id tells us whether an older window exists
+                candidates = self._candidate_ids(user_id, small, large, before_id, size + 1)
+                if not candidates:
+                    return [], None
+                # Posts published while paging wait for a fresh first page
+                before_id = before_id or candidates[0] + 1
+                ids, scores = feed_ranker.rank(self.db, user_id, candidates[:size], as_of)
+                window = (ids, scores, candidates[size - 1] if len(candidates) > size else None)
+                feed_ranker.windows.set((user_id, before_id, as_of), window)
+            ids, scores, older_than = window
+            post_ids, page_scores, more = feed_ranker.page(ids, scores, after, limit)
+            if post_ids or older_than is None:
+                break
+            # Window used up exactly on the last page, carry on with the next one
+            before_id, after = older_than, None
+
+        next_cursor = None
+        if more:
+            next_cursor = encode_window_cursor(before_id, as_of, page_scores[-1], post_ids[-1])
+        elif older_than is not None:
+            next_cursor = encode_window_cursor(older_than, as_of, math.inf, 0)
+        return self._load_page(post_ids), next_cursor
+
+    def get_trending_posts(self, limit: int = 10, community_id: Optional[int] = None, subject: Optional[str] = None):
+        """Top posts from the precomputed trending boards, global unless a community or subject is given"""
+        if trending_engine.loaded_at is None:
+            # Background refresh hasn't run yet in this process
+            trending_engine.refresh(self.db)
+        if community_id is not None:
+            board = community_board(community_id)
+        elif subject:
+            board = subject_board(subject)
+        else:
+            board = GLOBAL_BOARD
+        post_ids = trending_engine.top(limit, board)
+        if not post_ids:
             return []
-        
-        # Get posts from user's communities, ordered by engagement
-        posts = self.db.query(Post).filter(
-            Post.community_id.in_([c.id for c in user.communities])
-        ).order_by(
-            Post.created_at.desc()
-        ).offset((page - 1) * limit).limit(limit).all()
-        
-        return posts
-    
-    def get_trending_posts(self, limit: int = 10):
-        """Get trending posts (most liked in last 24 hours)"""
-        yesterday = datetime.utcnow() - timedelta(days=1)
-        
-        posts = self.db.query(Post).filter(
-            Post.created_at >= yesterday
-        ).order_by(
-            Post.like_count.desc()
-        ).limit(limit).all()
-        
-        return posts
\ No newline at end of file
+        posts = {p.id: p for p in self.db.query(Post).options(_author_summary()).filter(Post.id.in_(post_ids))}
+        return [posts[post_id] for post_id in post_ids if post_id in posts]
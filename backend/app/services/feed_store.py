@@ -0,0 +1,140 @@
+from collections import deque
+from itertools import dropwhile, islice
+from threading import Lock
+from typing import Deque, Dict, Iterable, List, Optional
+
+from ..config import settings
+
+
+def _insert_sorted(inbox: Deque[int], post_id: int):
+    """Insert into a full-or-not bounded deque kept in descending order, dropping the oldest"""
+    if not inbox or post_id > inbox[0]:
+        inbox.appendleft(post_id)
+        return
+    # Out of order arrivals are a few positions from the front, scan from there
+    for index, existing in enumerate(inbox):
+        if existing == post_id:
+            return
+        if existing < post_id:
+            break
+    else:
+        index = len(inbox)
+    if len(inbox) == inbox.maxlen:
+        if index == len(inbox):
+            return
+        inbox.pop()
+    inbox.insert(index, post_id)
+
+
+class InMemoryFeedStore:
+    """Bounded per-user inboxes of post ids, newest first (single process only).
+
+    Pushes usually land at the front, but fan-out runs per request once a batch is
+    committed, so a post can arrive after a newer one and is slotted into place.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._inboxes: Dict[int, Deque[int]] = {}
+        self._lock = Lock()
+
+    def has_inbox(self, user_id: int) -> bool:
+        return user_id in self._inboxes
+
+    def push(self, user_ids: Iterable[int], post_id: int):
+        with self._lock:
+            for user_id in user_ids:
+                inbox = self._inboxes.get(user_id)
+                # Users without an inbox get seeded from the database on first read
+                if inbox is not None:
+                    _insert_sorted(inbox, post_id)
+
+    def seed(self, user_id: int, post_ids: List[int]):
+        with self._lock:
+            self._inboxes[user_id] = deque(post_ids[:self.max_size], maxlen=self.max_size)
+
+    def range(self, user_id: int, before_id: Optional[int], limit: int) -> List[int]:
+        """Up to `limit` post ids older than `before_id` (newest first)"""
+        inbox = self._inboxes.get(user_id)
+        if not inbox:
+            return []
+        # Inboxes are short and bounded, skipping to the cursor is cheap
+        ids = iter(inbox)
+        if before_id is not None:
+            ids = dropwhile(lambda post_id: post_id >= before_id, ids)
+        return list(islice(ids, limit))
+
+    def drop(self, user_id: int):
+        with self._lock:
+            self._inboxes.pop(user_id, None)
+
+
+class RedisFeedStore:
+    """Same interface as InMemoryFeedStore, backed by one Redis sorted set per user.
+
+    Post ids are used as scores so cursor reads are a single ZREVRANGEBYSCORE.
+    """
+
+    # Only touch inboxes that were already seeded, then trim to the newest max_size
+    PUSH_SCRIPT = """
+    if redis.call('EXISTS', KEYS[1]) == 1 then
+        redis.call('ZADD', KEYS[1], ARGV[1], ARGV[1])
+        redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -(tonumber(ARGV[2]) + 1))
+    end
+    """
+
+    def __init__(self, url: str, max_size: int, prefix: str = "mentii:feed:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.max_size = max_size
+        self.prefix = prefix
+        self._push = self.client.register_script(self.PUSH_SCRIPT)
+
+    def _key(self, user_id: int) -> str:
+        return f"{self.prefix}{user_id}"
+
+    def has_inbox(self, user_id: int) -> bool:
+        return bool(self.client.exists(self._key(user_id)))
+
+    def push(self, user_ids: Iterable[int], post_id: int):
+        pipe = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            self._push(keys=[self._key(user_id)], args=[post_id, self.max_size], client=pipe)
+        pipe.execute()
+
+    def seed(self, user_id: int, post_ids: List[int]):
+        key = self._key(user_id)
+        pipe = self.client.pipeline()
+        pipe.delete(key)
+        # Score 0 placeholder keeps empty inboxes marked as seeded
+        members = {post_id: post_id for post_id in post_ids[:self.max_size]} or {0: 0}
+        pipe.zadd(key, members)
+        pipe.execute()
+
+    def range(self, user_id: int, before_id: Optional[int], limit: int) -> List[int]:
+        upper = f"({before_id}" if before_id is not None else "+inf"
+        ids = self.client.zrevrangebyscore(self._key(user_id), upper, "(0", start=0, num=limit)
+        return [int(post_id) for post_id in ids]
+
+    def drop(self, user_id: int):
+        self.client.delete(self._key(user_id))
+
+
+_feed_store = None
+
+
+def get_feed_store():
+    global _feed_store
+    if _feed_store is None:
+        if settings.redis_url:
+            _feed_store = RedisFeedStore(settings.redis_url, settings.feed_inbox_size)
+        else:
+            _feed_store = InMemoryFeedStore(settings.feed_inbox_size)
+    return _feed_store
+
+
+def set_feed_store(store: Optional[object]):
+    """Swap the feed backend (e.g. for tests), None resets to the configured default"""
+    global _feed_store
+    _feed_store = store
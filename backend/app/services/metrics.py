@@ -0,0 +1,331 @@
+"""Request and SQL instrumentation, served on /api/metrics in Prometheus text format.
+
+MetricsMiddleware times every HTTP request per route template. SQLAlchemy cursor
+hooks on every engine charge statements and DB time to the request that ran them
+through a context variable, which follows the request into the threadpool and into
+the async engines' greenlets. The same statement run again and again in one request
+is flagged as a likely N+1. Numbers are per process, each worker serves its own.
+"""
+import bisect
+import contextvars
+import logging
+import time
+from collections import defaultdict
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import compile_path
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Statements run outside any request (flushers, refreshes, migrations)
+BACKGROUND = "background"
+UNMATCHED = "unmatched"
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label tuple"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.series: Dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, labels: tuple, value: float):
+        row = self.series.get(labels)
+        if row is None:
+            row = self.series[labels] = [0] * (len(self.buckets) + 2)
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            row[index] += 1
+        row[-2] += value
+        row[-1] += 1
+
+    def render(self, name: str, label_names: Tuple[str, ...]) -> List[str]:
+        lines = []
+        for labels, row in sorted(self.series.items()):
+            base = _labels(label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{base},le="+Inf"}} {row[-1]}')
+            lines.append(f"{name}_sum{{{base}}} {row[-2]}")
+            lines.append(f"{name}_count{{{base}}} {row[-1]}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: tuple) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+class RouteTable:
+    """Request path -> route template, for labels that don't explode with ids.
+
+    Built from the OpenAPI paths, which are full templates however the routers
+    were included, in registration order like the router itself matches them.
+    Anything outside the schema (static files, typos) is "unmatched".
+    """
+
+    def __init__(self):
+        self.routes: Optional[List[Tuple[object, frozenset, str]]] = None
+
+    def build(self, app):
+        routes = []
+        for template, operations in app.openapi().get("paths", {}).items():
+            regex, _, _ = compile_path(template)
+            routes.append((regex, frozenset(method.upper() for method in operations), template))
+        self.routes = routes
+
+    def lookup(self, app, method: str, path: str) -> str:
+        if self.routes is None:
+            self.build(app)
+        if method == "HEAD":
+            method = "GET"
+        fallback = UNMATCHED
+        for regex, methods, template in self.routes:
+            if regex.match(path):
+                if method in methods:
+                    return template
+                if fallback is UNMATCHED:
+                    fallback = template  # answered with 405
+        return fallback
+
+
+class RequestStats:
+    """SQL run on behalf of one request"""
+
+    __slots__ = ("route", "statements", "db_time", "open")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.open = True
+        self.statements: Dict[str, list] = {}  # sql -> [count, seconds]
+        self.db_time = 0.0
+
+    def record(self, statement: str, elapsed: float):
+        entry = self.statements.get(statement)
+        if entry is None:
+            self.statements[statement] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+        self.db_time += elapsed
+
+    @property
+    def count(self) -> int:
+        return sum(entry[0] for entry in self.statements.values())
+
+    def most_repeated(self) -> Optional[Tuple[str, int]]:
+        if not self.statements:
+            return None
+        statement, (count, _) = max(self.statements.items(), key=lambda item: item[1][0])
+        return statement, count
+
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+class Metrics:
+    def __init__(self, n_plus_one_threshold: int, slow_request_ms: float):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.slow_request_seconds = slow_request_ms / 1000
+        self.latency = Histogram(LATENCY_BUCKETS)  # (method, route)
+        self.statements_per_request = Histogram(STATEMENT_BUCKETS)  # (route,)
+        self.requests: Dict[tuple, int] = defaultdict(int)  # (method, route, status)
+        self.in_flight: Dict[tuple, int] = defaultdict(int)  # (method, route)
+        self.db_statements: Dict[str, int] = defaultdict(int)  # route
+        self.db_seconds: Dict[str, float] = defaultdict(float)  # route
+        self.n_plus_one: Dict[str, int] = defaultdict(int)  # route
+        self.n_plus_one_seen: Dict[str, Tuple[str, int]] = {}  # route -> (statement, repeats), last flagged
+        self.routes = RouteTable()
+        self._lock = Lock()
+        self._hooked = False
+
+    # SQL accounting
+
+    def install(self, engine_class=Engine):
+        """Hook every engine, async ones included (they run on a sync Engine)"""
+        if self._hooked:
+            return
+        event.listen(engine_class, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine_class, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine_class, "handle_error", _handle_error)
+        self._hooked = True
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("metrics_started")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        stats = _current.get()
+        # Tasks started lazily inside a request (the write batchers) keep its
+        # context after it has finished, their statements are background work
+        if stats is not None and stats.open:
+            stats.record(statement, elapsed)
+        else:
+            # Flusher threads and the event loop both land here
+            with self._lock:
+                self.db_statements[BACKGROUND] += 1
+                self.db_seconds[BACKGROUND] += elapsed
+
+    # Requests
+
+    def begin(self, method: str, route: str) -> Tuple[RequestStats, contextvars.Token]:
+        self.in_flight[(method, route)] += 1
+        stats = RequestStats(route)
+        return stats, _current.set(stats)
+
+    def end(self, method: str, stats: RequestStats, token: contextvars.Token, status: int, elapsed: float):
+        _current.reset(token)
+        stats.open = False
+        route = stats.route
+        self.in_flight[(method, route)] -= 1
+        self.requests[(method, route, status)] += 1
+        self.latency.observe((method, route), elapsed)
+        count = stats.count
+        self.statements_per_request.observe((route,), count)
+        with self._lock:
+            self.db_statements[route] += count
+            self.db_seconds[route] += stats.db_time
+
+        repeated = stats.most_repeated()
+        if repeated is not None and repeated[1] >= self.n_plus_one_threshold:
+            self.n_plus_one[route] += 1
+            if route not in self.n_plus_one_seen:
+                logger.warning("possible N+1 on %s %s: %dx %s", method, route, repeated[1], _one_line(repeated[0]))
+            self.n_plus_one_seen[route] = repeated
+
+        if self.slow_request_seconds and elapsed >= self.slow_request_seconds:
+            self._log_slow(method, route, status, elapsed, stats)
+
+    def _log_slow(self, method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+        lines = [
+            f"slow request {method} {route} -> {status} in {elapsed * 1000:.1f}ms, "
+            f"{stats.count} statements, {stats.db_time * 1000:.1f}ms in the database"
+        ]
+        by_time = sorted(stats.statements.items(), key=lambda item: -item[1][1])
+        for statement, (count, seconds) in by_time:
+            lines.append(f"  {seconds * 1000:8.1f}ms {count:>4}x  {_one_line(statement)}")
+        logger.warning("\n".join(lines))
+
+    # Exposition
+
+    def render(self) -> str:
+        lines = [
+            "# HELP mentii_http_requests_total Requests served, by route template and status.",
+            "# TYPE mentii_http_requests_total counter",
+        ]
+        for labels, value in sorted(self.requests.items()):
+            lines.append(f"mentii_http_requests_total{{{_labels(('method', 'route', 'status'), labels)}}} {value}")
+
+        lines += [
+            "# HELP mentii_http_request_duration_seconds Time to the end of the response body.",
+            "# TYPE mentii_http_request_duration_seconds histogram",
+        ]
+        lines += self.latency.render("mentii_http_request_duration_seconds", ("method", "route"))
+
+        lines += [
+            "# HELP mentii_http_requests_in_flight Requests being served right now.",
+            "# TYPE mentii_http_requests_in_flight gauge",
+        ]
+        for labels, value in sorted(self.in_flight.items()):
+            lines.append(f"mentii_http_requests_in_flight{{{_labels(('method', 'route'), labels)}}} {value}")
+
+        lines += [
+            "# HELP mentii_db_statements_per_request SQL statements one request ran.",
+            "# TYPE mentii_db_statements_per_request histogram",
+        ]
+        lines += self.statements_per_request.render("mentii_db_statements_per_request", ("route",))
+
+        with self._lock:
+            statements = sorted(self.db_statements.items())
+            seconds = sorted(self.db_seconds.items())
+        lines += [
+            "# HELP mentii_db_statements_total SQL statements executed, background is outside any request.",
+            "# TYPE mentii_db_statements_total counter",
+        ]
+        lines += [f'mentii_db_statements_total{{route="{_escape(route)}"}} {value}' for route, value in statements]
+        lines += [
+            "# HELP mentii_db_seconds_total Time spent executing SQL.",
+            "# TYPE mentii_db_seconds_total counter",
+        ]
+        lines += [f'mentii_db_seconds_total{{route="{_escape(route)}"}} {value}' for route, value in seconds]
+
+        lines += [
+            "# HELP mentii_db_n_plus_one_total Requests that ran one statement at least n_plus_one_threshold times.",
+            "# TYPE mentii_db_n_plus_one_total counter",
+        ]
+        lines += [f'mentii_db_n_plus_one_total{{route="{_escape(route)}"}} {value}' for route, value in sorted(self.n_plus_one.items())]
+        return "\n".join(lines) + "\n"
+
+    def stats(self) -> dict:
+        return {
+            "requests": sum(self.requests.values()),
+            "in_flight": sum(self.in_flight.values()),
+            "n_plus_one": {route: {"repeats": count, "statement": _one_line(statement)}
+                           for route, (statement, count) in self.n_plus_one_seen.items()},
+        }
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # A stack, a statement can run while another one's rows are still being fetched
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute won't run for a failed statement
+    started = exception_context.connection.info.get("metrics_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def _one_line(statement: str, limit: int = 300) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+
+class MetricsMiddleware:
+    """Plain ASGI rather than @app.middleware, so streamed bodies are timed to
+    their last chunk and nothing is buffered"""
+
+    def __init__(self, app, metrics: "Metrics"):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self.metrics.routes.lookup(scope["app"], method, scope["path"])
+        # Inner middleware (rate limits) reuse it instead of matching again
+        scope["route_template"] = route
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        stats, token = self.metrics.begin(method, route)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.end(method, stats, token, status, time.perf_counter() - started)
+
+
+metrics = Metrics(settings.n_plus_one_threshold, settings.slow_request_ms)
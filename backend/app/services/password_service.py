@@ -0,0 +1,96 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from ..config import settings
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """Built on first use (in each pool process), passlib isn't needed to import the app.
+
+    Changing bcrypt_rounds marks older hashes as needing an update, they get
+    rehashed on the user's next successful login."""
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+
+
+def _lower_priority():
+    # Pool processes yield the CPU to request handling when cores are scarce
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+
+def _hash(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    if hashed_password is None:
+        # Unknown user, burn the same time as a real check
+        get_pwd_context().dummy_verify()
+        return False, None
+    return get_pwd_context().verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs bcrypt in a dedicated process pool so it never blocks the event loop or
+    the request threadpool. At most `max_pending` jobs are admitted, the rest get a
+    503 straight away instead of queueing behind a login storm."""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        # workers=0 keeps bcrypt in the default threadpool (previous behaviour)
+        if self._executor is None and self.workers > 0:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_lower_priority)
+        return self._executor
+
+    async def _submit(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many sign-in attempts right now, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """(valid, new_hash), new_hash is set when the stored hash uses outdated parameters"""
+        return await self._submit(_verify_and_update, password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+password_hasher = PasswordHasher(settings.password_workers, settings.password_max_pending)
@@ -0,0 +1,325 @@
+"""Per-client rate limits and overload shedding, in front of the routes.
+
+Rate limits are token buckets per (rule, client). A rule names a route template,
+`POST /api/auth/login=10/m:5` allows 10 a minute with bursts of 5. The client is
+the token's subject when the request carries a valid bearer token, its IP
+otherwise. Buckets live in process, or in Redis when redis_url is set so every
+worker shares them. Login has a second bucket per submitted username, checked by
+the route once the form is parsed: a whole school shares one IP, a password
+guesser has to name the account.
+
+Shedding answers 503 before a request starts when the worker is already
+drowning: too many requests in flight, too many waiting for a threadpool thread,
+or a median handler latency over recent requests so far above target that a
+growing share of new requests is turned away. Latency is timed from the end of
+the request body, a slow upload says nothing about how loaded the worker is,
+and a median needs most of the window slow before one outlier moves it.
+Failing fast beats letting everything time out.
+"""
+import math
+import random
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+import orjson
+
+from ..config import settings
+from ..utils.ttl_cache import TTLCache
+from .metrics import metrics
+
+PERIODS = {"s": 1, "m": 60, "h": 3600}
+
+# Never limited or shed, monitoring has to keep working under load
+EXEMPT_PATHS = ("/api/health", "/api/metrics")
+
+
+class Rule:
+    __slots__ = ("name", "rate", "burst")
+
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.rate = rate  # tokens per second
+        self.burst = burst
+
+    def __repr__(self):
+        return f"Rule({self.name!r}, rate={self.rate:g}/s, burst={self.burst:g})"
+
+
+def parse_limit(name: str, limit: str) -> Rule:
+    """`COUNT/PERIOD[:BURST]` -> Rule"""
+    count, _, rest = limit.strip().partition("/")
+    period, _, burst = rest.partition(":")
+    if period not in PERIODS:
+        raise ValueError(f"bad rate limit: {limit!r}")
+    return Rule(name, float(count) / PERIODS[period], float(burst or count))
+
+
+def parse_rules(spec: str) -> Dict[Tuple[str, str], Rule]:
+    """`METHOD /route/template=COUNT/PERIOD[:BURST], ...` -> {(method, template): Rule}.
+
+    PERIOD is s, m or h, BURST defaults to COUNT. `*=...` applies to every route
+    without a rule of its own.
+    """
+    rules = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        target, _, limit = item.rpartition("=")
+        if not target or limit.partition("/")[2].partition(":")[0] not in PERIODS:
+            raise ValueError(f"bad rate limit rule: {item!r}")
+        method, _, template = target.strip().partition(" ")
+        key = ("*", "*") if method == "*" else (method.upper(), template.strip())
+        rules[key] = parse_limit(" ".join(key) if method != "*" else "*", limit)
+    return rules
+
+
+class InMemoryBucketStore:
+    """Per-process buckets, each worker enforces the limit on its own"""
+
+    def __init__(self, maxsize: int):
+        # A bucket idle long enough to refill is the same as no bucket, let it expire
+        self.buckets = TTLCache(maxsize=maxsize, ttl=3600)
+
+    async def take(self, key: str, rule: Rule) -> Tuple[bool, float]:
+        """(allowed, seconds until a token is available)"""
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key) or (rule.burst, now)
+        tokens = min(rule.burst, tokens + (now - updated) * rule.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.buckets.set(key, (tokens, now), rule.burst / rule.rate)
+        return allowed, 0.0 if allowed else (1 - tokens) / rule.rate
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "buckets": len(self.buckets)}
+
+
+# Refill and take in one round trip, on Redis' clock so workers agree
+TAKE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed, wait = 0, (1 - tokens) / rate
+if tokens >= 1 then
+    tokens, allowed, wait = tokens - 1, 1, 0
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return {allowed, tostring(wait)}
+"""
+
+
+class RedisBucketStore:
+    """Buckets shared by every worker. Redis trouble lets requests through,
+    an outage shouldn't take the API down with it"""
+
+    def __init__(self, url: str, prefix: str = "mentii:ratelimit:"):
+        import redis.asyncio as redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.take_script = self.client.register_script(TAKE_SCRIPT)
+        self.errors = 0
+
+    async def take(self, key: str, rule: Rule) -> Tuple[bool, float]:
+        try:
+            allowed, wait = await self.take_script(keys=[self.prefix + key], args=[rule.rate, rule.burst])
+        except Exception:
+            self.errors += 1
+            return True, 0.0
+        return bool(allowed), float(wait)
+
+    async def close(self):
+        await self.client.aclose()
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "errors": self.errors}
+
+
+class LoadShedder:
+    """Admission control on in-flight requests, threadpool backlog and latency"""
+
+    def __init__(self, max_in_flight: int, max_queue: int, target_latency_ms: float, window: int):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.target = target_latency_ms / 1000
+        self.samples = deque(maxlen=window)  # handler latencies of recent requests, seconds
+        self.latency = 0.0  # their median, once half the window is filled
+        self.in_flight = 0
+        self.shed = {"in_flight": 0, "queue": 0, "latency": 0}
+
+    def shed_probability(self) -> float:
+        if not self.target or self.latency <= self.target:
+            return 0.0
+        # Twice the target sheds 90%, a trickle still gets through to measure recovery
+        return min(0.9, (self.latency - self.target) / self.target * 0.9)
+
+    def reject_reason(self) -> Optional[str]:
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return "in_flight"
+        if self.max_queue:
+            waiting = anyio.to_thread.current_default_thread_limiter().statistics().tasks_waiting
+            if waiting >= self.max_queue:
+                return "queue"
+        if random.random() < self.shed_probability():
+            return "latency"
+        return None
+
+    def observe(self, seconds: float):
+        samples = self.samples
+        samples.append(seconds)
+        # A few hundred floats, sorting them costs less than the request did
+        if len(samples) * 2 >= samples.maxlen:
+            self.latency = sorted(samples)[len(samples) // 2]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "latency_ms": round(self.latency * 1000, 1),
+            "shed_probability": round(self.shed_probability(), 2),
+            "shed": dict(self.shed),
+        }
+
+
+class RateLimiter:
+    def __init__(self, rules: Dict[Tuple[str, str], Rule], store, trust_forwarded: bool = False,
+                 login_rule: Optional[Rule] = None):
+        self.rules = rules
+        self.store = store
+        self.trust_forwarded = trust_forwarded
+        self.login_rule = login_rule
+        self.limited: Dict[str, int] = {}
+
+    def rule_for(self, method: str, route: str) -> Optional[Rule]:
+        rule = self.rules.get((method, route))
+        return rule if rule is not None else self.rules.get(("*", "*"))
+
+    def client_key(self, scope) -> str:
+        headers = dict(scope.get("headers") or ())
+        authorization = headers.get(b"authorization", b"").decode("latin-1")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer" and token:
+            # Deferred like everywhere else, jose costs startup time
+            from ..auth import decode_token_subject
+
+            subject = decode_token_subject(token)
+            if subject:
+                return f"user:{subject}"
+        if self.trust_forwarded and b"x-forwarded-for" in headers:
+            return "ip:" + headers[b"x-forwarded-for"].decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def check(self, scope, method: str, route: str) -> Tuple[Optional[Rule], float]:
+        """(the rule that refused the request, seconds to wait), (None, 0) when allowed"""
+        rule = self.rule_for(method, route)
+        if rule is None:
+            return None, 0.0
+        return await self._take(rule, self.client_key(scope))
+
+    async def check_login(self, username: str) -> Tuple[Optional[Rule], float]:
+        """Like check(), on the per-username login bucket"""
+        if self.login_rule is None:
+            return None, 0.0
+        return await self._take(self.login_rule, f"username:{username.strip().lower()}")
+
+    async def _take(self, rule: Rule, client: str) -> Tuple[Optional[Rule], float]:
+        allowed, wait = await self.store.take(f"{rule.name}|{client}", rule)
+        if allowed:
+            return None, 0.0
+        self.limited[rule.name] = self.limited.get(rule.name, 0) + 1
+        return rule, wait
+
+    def stats(self) -> dict:
+        return {"rules": len(self.rules), "limited": dict(self.limited), **self.store.stats()}
+
+
+async def _reject(send, status: int, detail: str, retry_after: float, headers: List[Tuple[bytes, bytes]] = ()):
+    body = orjson.dumps({"detail": detail})
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    """Plain ASGI, a refused request never reaches routing or a DB session"""
+
+    def __init__(self, app, limiter: RateLimiter, shedder: LoadShedder):
+        self.app = app
+        self.limiter = limiter
+        self.shedder = shedder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        shedder = self.shedder
+        reason = shedder.reject_reason()
+        if reason is not None:
+            shedder.shed[reason] += 1
+            await _reject(send, 503, "Server is busy, please retry shortly", 1)
+            return
+
+        method = scope["method"]
+        route = scope.get("route_template") or metrics.routes.lookup(scope["app"], method, scope["path"])
+        rule, wait = await self.limiter.check(scope, method, route)
+        if rule is not None:
+            await _reject(send, 429, "Too many requests", wait,
+                          [(b"ratelimit-policy", f"{rule.burst:g};w={rule.burst / rule.rate:g}".encode())])
+            return
+
+        started = time.perf_counter()
+
+        async def receive_wrapper():
+            nonlocal started
+            message = await receive()
+            # Restart the clock once the body is in, uploads are timed by the client's link
+            if message["type"] == "http.request" and not message.get("more_body", False):
+                started = time.perf_counter()
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                shedder.observe(time.perf_counter() - started)
+            await send(message)
+
+        shedder.in_flight += 1
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            shedder.in_flight -= 1
+
+
+def _create_store():
+    if settings.redis_url:
+        return RedisBucketStore(settings.redis_url)
+    return InMemoryBucketStore(settings.rate_limit_max_keys)
+
+
+rate_limiter = RateLimiter(
+    parse_rules(settings.rate_limit_rules) if settings.rate_limit_enabled else {},
+    _create_store(),
+    settings.rate_limit_trust_forwarded,
+    parse_limit("POST /api/auth/login username", settings.rate_limit_login_per_username)
+    if settings.rate_limit_enabled and settings.rate_limit_login_per_username else None,
+)
+load_shedder = LoadShedder(
+    settings.shed_max_in_flight, settings.shed_max_queue, settings.shed_latency_ms, settings.shed_latency_window
+)
@@ -0,0 +1,119 @@
+import asyncio
+import itertools
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from ..utils.ttl_cache import TTLCache
+
+# Seconds of replay lag. A replica that has applied everything it received is
+# current even if the primary has been idle (old replay timestamp)
+PG_LAG_SQL = text("""
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+""")
+
+
+class Replica:
+    def __init__(self, name: str, engine, async_engine):
+        self.name = name
+        self.engine = engine
+        self.async_engine = async_engine
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        self.AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+        self.healthy = True
+        self.lag: Optional[float] = None
+        self.error: Optional[str] = None
+        self.reads = 0
+
+    def stats(self) -> dict:
+        return {"healthy": self.healthy, "lag": self.lag, "error": self.error, "reads": self.reads}
+
+
+class ReplicaRouter:
+    """Spreads reads over healthy replicas, writes always go to the primary.
+
+    A client that just wrote (keyed by its Authorization header) reads from the
+    primary for `sticky_seconds` so it sees its own writes. A background check
+    marks replicas unhealthy when they stop answering or fall more than `max_lag`
+    seconds behind, reads skip them until they recover. With no replicas (or
+    none healthy) pick() returns None and reads use the primary.
+    """
+
+    def __init__(self, replicas: List[Replica], sticky_seconds: float, max_lag: float, check_interval: float):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._recent_writers = TTLCache(maxsize=100000, ttl=sticky_seconds)
+        self._turn = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        self.primary_reads = 0
+        self.sticky_reads = 0
+
+    def mark_write(self, key: Optional[str]):
+        if key and self.replicas:
+            self._recent_writers.set(key, True)
+
+    def pick(self, key: Optional[str] = None) -> Optional[Replica]:
+        if not self.replicas:
+            return None
+        if key and self._recent_writers.get(key):
+            self.sticky_reads += 1
+            return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            self.primary_reads += 1
+            return None
+        replica = healthy[next(self._turn) % len(healthy)]
+        replica.reads += 1
+        return replica
+
+    async def _lag(self, replica: Replica) -> float:
+        async with replica.async_engine.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                return float((await conn.execute(PG_LAG_SQL)).scalar() or 0)
+            # Nothing to measure on other databases, a live connection is all we check
+            await conn.execute(text("SELECT 1"))
+            return 0.0
+
+    async def _check(self, replica: Replica):
+        try:
+            lag = await asyncio.wait_for(self._lag(replica), self.check_interval)
+        except Exception as exc:
+            replica.healthy, replica.lag, replica.error = False, None, repr(exc)
+            return
+        replica.lag, replica.error = lag, None
+        replica.healthy = lag <= self.max_lag
+
+    async def check(self):
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check()
+
+    async def start(self):
+        if self.replicas and self._task is None:
+            await self.check()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for replica in self.replicas:
+            await replica.async_engine.dispose()
+            replica.engine.dispose()
+
+    def stats(self) -> dict:
+        return {
+            "replicas": {replica.name: replica.stats() for replica in self.replicas},
+            "primary_reads": self.primary_reads,
+            "sticky_reads": self.sticky_reads,
+        }
@@ -0,0 +1,166 @@
+import os
+from typing import AsyncIterator, Optional
+from urllib.parse import quote
+
+from fastapi.concurrency import run_in_threadpool
+
+from ..config import settings
+
+
+ALLOWED_CONTENT_TYPES = frozenset(
+    item.strip().lower() for item in settings.resource_content_types.split(",") if item.strip()
+)
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def safe_content_type(value: Optional[str]) -> str:
+    """The upload's content type if it is on the allowlist, application/octet-stream otherwise.
+    The client picks it, served back as-is it could turn a file into a page on our origin"""
+    media_type = (value or "").split(";")[0].strip().lower()
+    return media_type if media_type in ALLOWED_CONTENT_TYPES else "application/octet-stream"
+
+
+class LocalStorage:
+    """Files on local disk under `root`. The download route serves them itself,
+    with Range support and sendfile where the server offers it."""
+
+    def __init__(self, root: str, write_buffer: int = 1 << 20):
+        self.root = root
+        self.write_buffer = write_buffer
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def url(self, key: str, filename: Optional[str] = None) -> Optional[str]:
+        return None
+
+    async def save(self, key: str, chunks: AsyncIterator[bytes], max_bytes: int, content_type: Optional[str] = None) -> int:
+        """Stream `chunks` to disk, returns the size. Writes go through the threadpool
+        in `write_buffer` sized pieces and land under the final name only when complete."""
+        path = self.path(key)
+        partial = path + ".part"
+        f = await run_in_threadpool(open, partial, "wb")
+        size = 0
+        buffer = bytearray()
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                buffer += chunk
+                if len(buffer) >= self.write_buffer:
+                    await run_in_threadpool(f.write, buffer)
+                    buffer.clear()
+            if buffer:
+                await run_in_threadpool(f.write, buffer)
+            await run_in_threadpool(f.close)
+            os.replace(partial, path)
+        except BaseException:
+            f.close()
+            os.remove(partial)
+            raise
+        return size
+
+    async def delete(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3Storage:
+    """S3 or an S3-compatible store (endpoint_url for MinIO etc.).
+
+    Uploads stream up as a multipart upload while the request body arrives,
+    downloads redirect to a short-lived presigned URL and S3 handles Range.
+    """
+
+    part_size = 8 * 1024 * 1024  # S3 wants at least 5MB for every part but the last
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None, url_ttl: int = 300):
+        import boto3
+
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.url_ttl = url_ttl
+
+    def path(self, key: str) -> Optional[str]:
+        return None
+
+    def url(self, key: str, filename: Optional[str] = None) -> Optional[str]:
+        params = {
+            "Bucket": self.bucket,
+            "Key": self.prefix + key,
+            "ResponseContentDisposition": f"attachment; filename*=utf-8''{quote(filename or key)}",
+        }
+        return self.client.generate_presigned_url("get_object", Params=params, ExpiresIn=self.url_ttl)
+
+    async def save(self, key: str, chunks: AsyncIterator[bytes], max_bytes: int, content_type: Optional[str] = None) -> int:
+        object_key = self.prefix + key
+        extra = {"ContentType": content_type} if content_type else {}
+        upload = await run_in_threadpool(
+            self.client.create_multipart_upload, Bucket=self.bucket, Key=object_key, **extra
+        )
+        upload_id = upload["UploadId"]
+        parts = []
+        size = 0
+        buffer = bytearray()
+
+        async def upload_part(body: bytes):
+            number = len(parts) + 1
+            result = await run_in_threadpool(
+                self.client.upload_part,
+                Bucket=self.bucket, Key=object_key, UploadId=upload_id, PartNumber=number, Body=body,
+            )
+            parts.append({"ETag": result["ETag"], "PartNumber": number})
+
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                buffer += chunk
+                if len(buffer) >= self.part_size:
+                    await upload_part(bytes(buffer))
+                    buffer.clear()
+            if buffer or not parts:
+                await upload_part(bytes(buffer))
+            await run_in_threadpool(
+                self.client.complete_multipart_upload,
+                Bucket=self.bucket, Key=object_key, UploadId=upload_id, MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            await run_in_threadpool(
+                self.client.abort_multipart_upload, Bucket=self.bucket, Key=object_key, UploadId=upload_id
+            )
+            raise
+        return size
+
+    async def delete(self, key: str):
+        await run_in_threadpool(self.client.delete_object, Bucket=self.bucket, Key=self.prefix + key)
+
+
+_storage = None
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        if settings.resource_storage == "s3":
+            _storage = S3Storage(
+                settings.resource_s3_bucket, settings.resource_s3_prefix, settings.resource_s3_endpoint_url
+            )
+        else:
+            _storage = LocalStorage(settings.resource_storage_path)
+    return _storage
+
+
+def set_storage(storage):
+    """Swap the storage backend (e.g. for tests), None resets to the configured default"""
+    global _storage
+    _storage = storage
@@ -0,0 +1,153 @@
+import hashlib
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import orjson
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from ..config import settings
+from ..utils.serialization import dump_json
+from ..utils.ttl_cache import TTLCache
+
+# (etag, body)
+Entry = Tuple[str, bytes]
+
+
+class InMemoryCacheBackend:
+    """Per-process response cache, bounded LRU with TTL"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generations: Dict[str, int] = {}
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[Entry]:
+        return self.entries.get(key)
+
+    def set(self, key: str, entry: Entry, ttl: float):
+        self.entries.set(key, entry, ttl)
+
+    def generation(self, namespace: str) -> int:
+        return self._generations.get(namespace, 0)
+
+    def bump(self, namespace: str):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+
+class RedisCacheBackend:
+    """Shared by every worker, an invalidation on one is seen by all"""
+
+    def __init__(self, url: str, prefix: str = "mentii:cache:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Entry]:
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        etag, _, body = raw.partition(b"\n")
+        return etag.decode(), body
+
+    def set(self, key: str, entry: Entry, ttl: float):
+        etag, body = entry
+        self.client.set(self.prefix + key, etag.encode() + b"\n" + body, px=int(ttl * 1000))
+
+    def generation(self, namespace: str) -> int:
+        return int(self.client.get(f"{self.prefix}gen:{namespace}") or 0)
+
+    def bump(self, namespace: str):
+        self.client.incr(f"{self.prefix}gen:{namespace}")
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+
+class ResponseCache:
+    """Caches serialized JSON responses of read-heavy GET routes.
+
+    Entries are keyed by namespace generation + path + query string. Writes call
+    invalidate(namespace), which bumps the generation so every old entry becomes
+    unreachable at once and then ages out. Responses carry an ETag of the body,
+    a matching If-None-Match is answered with 304 straight from the cache.
+    """
+
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def _key(self, namespace: str, request: Request) -> str:
+        query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+        return f"{namespace}:{self.backend.generation(namespace)}:{request.url.path}?{query}"
+
+    def _serialize(self, data, response_model) -> bytes:
+        if response_model is None:
+            return orjson.dumps(jsonable_encoder(data))
+        return dump_json(response_model, data)
+
+    def _respond(self, request: Request, entry: Entry) -> Response:
+        etag, body = entry
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _matches(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def respond(
+        self,
+        request: Request,
+        namespace: str,
+        build: Callable[[], Awaitable[Any]],
+        response_model=None,
+        ttl: Optional[float] = None,
+    ) -> Response:
+        """Serve from cache, otherwise await build(), serialize it through
+        `response_model` and cache the body. Exceptions from build() (404s etc.)
+        pass through uncached."""
+        key = self._key(namespace, request)
+        entry = self.backend.get(key)
+        if entry is not None:
+            self.hits += 1
+            return self._respond(request, entry)
+
+        self.misses += 1
+        body = self._serialize(await build(), response_model)
+        entry = (_etag(body), body)
+        ttl = self.ttl if ttl is None else ttl
+        if getattr(request.state, "replica", None):
+            # Built from a replica that may be behind an invalidation, don't keep it long
+            ttl = min(ttl, settings.replica_max_lag_seconds)
+        self.backend.set(key, entry, ttl)
+        return self._respond(request, entry)
+
+    def invalidate(self, *namespaces: str):
+        for namespace in namespaces:
+            self.backend.bump(namespace)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "not_modified": self.not_modified}
+
+
+def _create_cache():
+    if settings.redis_url:
+        return ResponseCache(RedisCacheBackend(settings.redis_url), settings.response_cache_ttl)
+    return ResponseCache(
+        InMemoryCacheBackend(settings.response_cache_size, settings.response_cache_ttl), settings.response_cache_ttl
+    )
+
+response_cache = _create_cache()
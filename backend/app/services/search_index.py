@@ -0,0 +1,202 @@
+import re
+from contextlib import nullcontext
+from typing import List, Optional, Tuple
+
+from sqlalchemy import or_, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from ..models import Post, User, Community, Resource
+from ..utils.pagination import keyset_paginate, encode_rank_cursor, decode_rank_cursor
+
+# Searchable columns per result type
+SEARCH_FIELDS = {
+    "posts": (Post, ["content", "tags"]),
+    "users": (User, ["username", "full_name"]),
+    "communities": (Community, ["name", "description", "subject"]),
+    "resources": (Resource, ["title", "description", "subject"]),
+}
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(q: str) -> List[str]:
+    return TOKEN_RE.findall(q.lower())
+
+
+def _begin(bind):
+    """engine.begin(), or a connection that is already in a transaction (migrations) as is"""
+    if isinstance(bind, Connection):
+        return nullcontext(bind)
+    return bind.begin()
+
+
+class LikeSearchIndex:
+    """Unindexed ILIKE '%q%' scan, newest first. Fallback for other databases and benchmark baseline"""
+
+    name = "like"
+
+    def install(self, engine):
+        pass
+
+    def rebuild(self, engine):
+        pass
+
+    def search(self, db: Session, kind: str, q: str, cursor: Optional[str] = None, limit: int = 10) -> Tuple[List[int], Optional[str]]:
+        model, fields = SEARCH_FIELDS[kind]
+        query = db.query(model.id, model.created_at).filter(
+            or_(*[getattr(model, field).ilike(f"%{q}%") for field in fields])
+        )
+        rows, next_cursor = keyset_paginate(query, model, cursor, limit)
+        return [row.id for row in rows], next_cursor
+
+
+class SQLiteSearchIndex:
+    """FTS5 external-content tables kept in sync by triggers, ranked with bm25()"""
+
+    name = "fts5"
+
+    def _table(self, kind: str) -> str:
+        return f"{kind}_fts"
+
+    def install(self, engine):
+        with _begin(engine) as conn:
+            for kind, (model, fields) in SEARCH_FIELDS.items():
+                table, source = self._table(kind), model.__tablename__
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table}
+                ).first()
+                cols = ", ".join(fields)
+                new_cols = ", ".join(f"new.{f}" for f in fields)
+                old_cols = ", ".join(f"old.{f}" for f in fields)
+                # prefix='2 3' keeps short type-ahead prefixes on an index lookup
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+                    f"{cols}, content='{source}', content_rowid='id', prefix='2 3')"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON {source} BEGIN "
+                    f"INSERT INTO {table}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON {source} BEGIN "
+                    f"INSERT INTO {table}({table}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END"
+                ))
+                # Only re-index when searchable text changes, not on counter updates
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF {cols} ON {source} BEGIN "
+                    f"INSERT INTO {table}({table}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+                    f"INSERT INTO {table}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+                ))
+                if not exists:
+                    conn.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+
+    def rebuild(self, engine):
+        with _begin(engine) as conn:
+            for kind in SEARCH_FIELDS:
+                table = self._table(kind)
+                conn.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+
+    def _match(self, q: str) -> Optional[str]:
+        tokens = tokenize(q)
+        if not tokens:
+            return None
+        # Quote every term, the last one is a prefix for type-ahead
+        terms = [f'"{token}"' for token in tokens]
+        terms[-1] += "*"
+        return " ".join(terms)
+
+    def search(self, db: Session, kind: str, q: str, cursor: Optional[str] = None, limit: int = 10) -> Tuple[List[int], Optional[str]]:
+        match = self._match(q)
+        if match is None:
+            return [], None
+        table = self._table(kind)
+        params = {"match": match, "limit": limit + 1}
+        after = ""
+        if cursor:
+            score, params["id"] = decode_rank_cursor(cursor)
+            params["rank"] = -score
+            after = "AND (rank > :rank OR (rank = :rank AND rowid > :id))"
+        # rank is bm25(), lower-is-better: every match is scored and FTS5 keeps the top
+        # LIMIT as it goes. Negated on the way out so every backend ranks by score DESC
+        rows = db.execute(text(
+            f"SELECT rowid AS id, -rank AS score FROM {table} "
+            f"WHERE {table} MATCH :match {after} ORDER BY rank, rowid LIMIT :limit"
+        ), params).all()
+        return _page(rows, limit)
+
+
+class PostgresSearchIndex:
+    """Generated tsvector columns with GIN indexes, ranked with ts_rank_cd()"""
+
+    name = "tsvector"
+    config = "simple"
+
+    def install(self, engine):
+        with _begin(engine) as conn:
+            for kind, (model, fields) in SEARCH_FIELDS.items():
+                source = model.__tablename__
+                document = " || ' ' || ".join(f"coalesce({f}, '')" for f in fields)
+                # Generated columns stay in sync on insert/update without triggers
+                conn.execute(text(
+                    f"ALTER TABLE {source} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                    f"GENERATED ALWAYS AS (to_tsvector('{self.config}', {document})) STORED"
+                ))
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{source}_search_vector ON {source} USING GIN (search_vector)"
+                ))
+
+    def rebuild(self, engine):
+        pass
+
+    def _tsquery(self, q: str) -> Optional[str]:
+        tokens = tokenize(q)
+        if not tokens:
+            return None
+        tokens[-1] += ":*"
+        return " & ".join(tokens)
+
+    def search(self, db: Session, kind: str, q: str, cursor: Optional[str] = None, limit: int = 10) -> Tuple[List[int], Optional[str]]:
+        tsquery = self._tsquery(q)
+        if tsquery is None:
+            return [], None
+        source = SEARCH_FIELDS[kind][0].__tablename__
+        params = {"tsquery": tsquery, "limit": limit + 1}
+        after = ""
+        if cursor:
+            params["score"], params["id"] = decode_rank_cursor(cursor)
+            after = "WHERE score < :score OR (score = :score AND id > :id)"
+        # The GIN index finds every match, all of them are ranked and a top-N sort
+        # keeps the page, so older rows compete on relevance like new ones
+        rows = db.execute(text(
+            f"SELECT id, score FROM ("
+            f"SELECT id, ts_rank_cd(search_vector, query)::float8 AS score "
+            f"FROM {source}, to_tsquery('{self.config}', :tsquery) query WHERE search_vector @@ query"
+            f") ranked {after} ORDER BY score DESC, id LIMIT :limit"
+        ), params).all()
+        return _page(rows, limit)
+
+
+def _page(rows, limit: int):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_rank_cursor(rows[-1].score, rows[-1].id)
+    return [row.id for row in rows], next_cursor
+
+
+_indexes = {}
+
+
+def get_search_index(engine):
+    """Pick the search backend for the engine's dialect"""
+    index = _indexes.get(engine)
+    if index is None:
+        if engine.dialect.name == "sqlite":
+            index = SQLiteSearchIndex()
+        elif engine.dialect.name == "postgresql":
+            index = PostgresSearchIndex()
+        else:
+            index = LikeSearchIndex()
+        _indexes[engine] = index
+    return index
@@ -1,64 +1,173 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from threading import Lock
+from typing import Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, update
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+
+from ..config import settings
+from ..database import SessionLocal, dialect_insert
+from ..models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+# name -> (bit in UserProfile.badge_mask, streak days needed)
+BADGES = {
+    "7-day-streak": (1 << 0, 7),
+    "30-day-streak": (1 << 1, 30),
+}
+
+
+def badge_names(mask: int) -> List[str]:
+    return [name for name, (bit, _) in BADGES.items() if mask & bit]
+
+
+def has_badge(mask: int, name: str) -> bool:
+    return bool(mask & BADGES[name][0])
+
 
 class StreakService:
+    """Set-based streak and badge updates for a batch of active users"""
+
     def __init__(self, db: Session):
         self.db = db
-    
-    def update_streak(self, user_id: int):
-        """Update user's learning streak"""
-        from ..models import UserProfile
-        
-        profile = self.db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
-        
-        if not profile:
-            return 0
-        
-        today = datetime.utcnow().date()
-        last_active = profile.last_active.date() if profile.last_active else None
-        
-        if last_active:
-            days_since_last_active = (today - last_active).days
-            
-            if days_since_last_active == 1:
-                # Consecutive day
-                profile.streak_days += 1
-            elif days_since_last_active > 1:
-                # Streak broken
-                profile.streak_days = 1
-            # Same day, do nothing
-        else:
-            # First activity
-            profile.streak_days = 1
-        
-        profile.last_active = datetime.utcnow()
+
+    def _ensure_profiles(self, user_ids: List[int]):
+        stmt = dialect_insert(self.db)(UserProfile).values([
+            {"user_id": user_id, "streak_days": 0, "last_active": None} for user_id in user_ids
+        ]).on_conflict_do_nothing(index_elements=["user_id"])
+        self.db.execute(stmt)
+
+    def apply_day(self, day: date, user_ids: List[int], active_at: datetime):
+        """One UPDATE for every user active on `day`.
+
+        Same day keeps the streak, the day after extends it, later resets it to 1.
+        Profiles already ahead of `day` (events replayed out of order) are left alone.
+        """
+        start = datetime.combine(day, time.min)
+        end = start + timedelta(days=1)
+        previous = start - timedelta(days=1)
+        last_active = UserProfile.last_active
+        self.db.execute(update(UserProfile).filter(UserProfile.user_id.in_(user_ids)).values(
+            streak_days=case(
+                (last_active.is_(None), 1),
+                # Fresh profiles get last_active = now() on creation
+                (UserProfile.streak_days == 0, 1),
+                (last_active >= end, UserProfile.streak_days),
+                (last_active >= start, UserProfile.streak_days),
+                (last_active >= previous, UserProfile.streak_days + 1),
+                else_=1,
+            ),
+            last_active=case((last_active >= end, last_active), else_=active_at),
+        ))
+
+    def award_badges(self, user_ids: List[int]):
+        """One UPDATE per badge, only touching profiles that just crossed the threshold"""
+        for bit, days in BADGES.values():
+            self.db.execute(update(UserProfile).filter(
+                UserProfile.user_id.in_(user_ids),
+                UserProfile.streak_days >= days,
+                UserProfile.badge_mask.op("&")(bit) == 0,
+            ).values(badge_mask=UserProfile.badge_mask.op("|")(bit)))
+
+    def process(self, activity: Dict[date, Dict[int, datetime]]):
+        """Apply {day: {user_id: latest activity that day}} in a single transaction"""
+        if not activity:
+            return
+        user_ids = list({user_id for users in activity.values() for user_id in users})
+        self._ensure_profiles(user_ids)
+        # Oldest day first, a user active either side of midnight extends their streak
+        for day in sorted(activity):
+            users = activity[day]
+            self.apply_day(day, list(users), max(users.values()))
+        self.award_badges(user_ids)
         self.db.commit()
-        
-        return profile.streak_days
-    
-    def check_for_badges(self, user_id: int):
-        """Check and award badges based on streak"""
-        from ..models import UserProfile
-        
-        profile = self.db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
-        
-        if not profile:
-            return []
-        
-        badges = []
-        current_badges = profile.badges.split(",") if profile.badges else []
-        
-        # Streak badges
-        if profile.streak_days >= 7 and "7-day-streak" not in current_badges:
-            badges.append("7-day-streak")
-        
-        if profile.streak_days >= 30 and "30-day-streak" not in current_badges:
-            badges.append("30-day-streak")
-        
-        # Update badges if new ones earned
-        if badges:
-            all_badges = current_badges + badges
-            profile.badges = ",".join(all_badges)
-            self.db.commit()
-        
-        return badges
\ No newline at end of file
+
+
+class ActivityQueue:
+    """Collects user activity in memory, a background job folds it into
+    streaks and badges every `interval` seconds.
+
+    Only the latest timestamp per user per day matters, so repeated actions
+    cost a dict write. Every worker drains its own queue, the UPDATEs are
+    idempotent within a day.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending: Dict[int, Dict[date, datetime]] = {}
+        self._lock = Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.users_processed = 0
+
+    def record(self, user_id: int, at: Optional[datetime] = None):
+        at = at or datetime.utcnow()
+        with self._lock:
+            days = self._pending.setdefault(user_id, {})
+            if at > days.get(at.date(), datetime.min):
+                days[at.date()] = at
+
+    def drain(self) -> Dict[date, Dict[int, datetime]]:
+        """Take everything queued, as {day: {user_id: latest activity}}"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        by_day: Dict[date, Dict[int, datetime]] = defaultdict(dict)
+        for user_id, days in pending.items():
+            for day, at in days.items():
+                by_day[day][user_id] = at
+        return by_day
+
+    def flush(self, db: Session) -> int:
+        activity = self.drain()
+        try:
+            StreakService(db).process(activity)
+        except Exception:
+            db.rollback()
+            # Keep the events for the next round
+            for users in activity.values():
+                for user_id, at in users.items():
+                    self.record(user_id, at)
+            raise
+        processed = sum(len(users) for users in activity.values())
+        if processed:
+            self.batches += 1
+            self.users_processed += processed
+        return processed
+
+    def _flush_once(self):
+        db = SessionLocal()
+        try:
+            return self.flush(db)
+        finally:
+            db.close()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await run_in_threadpool(self._flush_once)
+            except Exception:
+                logger.exception("streak batch failed, its activity is queued again")
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await run_in_threadpool(self._flush_once)
+
+    def stats(self) -> dict:
+        with self._lock:
+            queued = len(self._pending)
+        return {"queued_users": queued, "batches": self.batches, "users_processed": self.users_processed}
+
+
+activity_queue = ActivityQueue(settings.activity_flush_interval)
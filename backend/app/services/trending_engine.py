@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sortedcontainers import SortedList
+
+from ..config import settings
+from ..database import ReadSessionLocal
+from ..models import Post
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_BOARD = "global"
+
+# Points per counter, a comment is worth more attention than a like
+WEIGHTS = {"like_count": 1, "comment_count": 2}
+
+
+def community_board(community_id: int) -> str:
+    return f"community:{community_id}"
+
+
+def subject_board(subject: str) -> str:
+    return f"subject:{subject}"
+
+
+def _timestamp(created_at: datetime) -> float:
+    # SQLite hands back naive UTC datetimes
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at.timestamp()
+
+
+class Leaderboard:
+    """Post ids kept sorted by score, highest first. Updates and top-K reads are
+    O(log n), SortedList avoids shifting one huge list on every rescore."""
+
+    def __init__(self):
+        self._scores: Dict[int, float] = {}
+        self._order = SortedList()  # (-score, -post_id), newer wins ties
+
+    @classmethod
+    def build(cls, scores: Dict[int, float]) -> "Leaderboard":
+        board = cls()
+        board._scores = scores
+        board._order = SortedList((-score, -post_id) for post_id, score in scores.items())
+        return board
+
+    def set(self, post_id: int, score: float):
+        old = self._scores.get(post_id)
+        if old == score:
+            return
+        if old is not None:
+            self._order.remove((-old, -post_id))
+        self._scores[post_id] = score
+        self._order.add((-score, -post_id))
+
+    def top(self, limit: int) -> List[int]:
+        return [-neg_id for _, neg_id in self._order.islice(0, limit)]
+
+    def __len__(self):
+        return len(self._scores)
+
+
+class TrendingEngine:
+    """Time-decayed trending scores, global and per community/subject.
+
+    Uses Reddit-"hot" style gravity: score = log2(1 + points) + created / half_life.
+    A post one half-life newer needs half the points to rank the same. The score
+    never changes with the clock, only with points, so an event rescores a single
+    post and the boards stay sorted between events. Age is handled by dropping
+    posts older than the window.
+
+    Events only update the local process. Every `refresh_interval` the boards
+    are rebuilt from the posts table, which is also how other workers' likes are
+    picked up.
+    """
+
+    def __init__(self, half_life_hours: float, window_hours: float, refresh_interval: float):
+        self.half_life = half_life_hours * 3600
+        self.window = window_hours * 3600
+        self.refresh_interval = refresh_interval
+        # post_id -> [boards, created timestamp, points]
+        self._posts: Dict[int, list] = {}
+        self._boards: Dict[str, Leaderboard] = {}
+        self._lock = Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.loaded_at: Optional[float] = None
+        self.events = 0
+
+    def score(self, points: int, created: float) -> float:
+        return math.log2(1 + max(points, 0)) + created / self.half_life
+
+    def _boards_for(self, community_id: Optional[int], subject: Optional[str]) -> Tuple[str, ...]:
+        boards = [GLOBAL_BOARD]
+        if community_id is not None:
+            boards.append(community_board(community_id))
+        if subject:
+            boards.append(subject_board(subject))
+        return tuple(boards)
+
+    def _place(self, post_id: int, entry: list):
+        score = self.score(entry[2], entry[1])
+        for board in entry[0]:
+            self._boards.setdefault(board, Leaderboard()).set(post_id, score)
+
+    def add(self, post_id: int, community_id: Optional[int], subject: Optional[str], created_at: datetime, points: int = 0):
+        """Track a post, e.g. right after it is published"""
+        created = _timestamp(created_at)
+        if created < time.time() - self.window:
+            return
+        with self._lock:
+            entry = [self._boards_for(community_id, subject), created, points]
+            self._posts[post_id] = entry
+            self._place(post_id, entry)
+
+    def record(self, post_id: int, column: str, delta: int):
+        """Apply a counter change (like/unlike/comment) to a tracked post"""
+        with self._lock:
+            self.events += 1
+            entry = self._posts.get(post_id)
+            # Posts outside the window aren't tracked, nothing to rescore
+            if entry is None:
+                return
+            entry[2] += WEIGHTS.get(column, 0) * delta
+            self._place(post_id, entry)
+
+    def top(self, limit: int, board: str = GLOBAL_BOARD) -> List[int]:
+        with self._lock:
+            leaderboard = self._boards.get(board)
+            return leaderboard.top(limit) if leaderboard else []
+
+    def load(self, rows: Iterable[tuple]):
+        """Rebuild every board from (id, community_id, subject, created_at, like_count, comment_count) rows"""
+        posts, scores = {}, {}
+        for post_id, community_id, subject, created_at, likes, comments in rows:
+            entry = [
+                self._boards_for(community_id, subject),
+                _timestamp(created_at),
+                WEIGHTS["like_count"] * (likes or 0) + WEIGHTS["comment_count"] * (comments or 0),
+            ]
+            posts[post_id] = entry
+            score = self.score(entry[2], entry[1])
+            for board in entry[0]:
+                scores.setdefault(board, {})[post_id] = score
+        boards = {board: Leaderboard.build(board_scores) for board, board_scores in scores.items()}
+        with self._lock:
+            self._posts, self._boards = posts, boards
+            self.loaded_at = time.time()
+
+    def refresh(self, db):
+        """Reload the posts inside the window from the database"""
+        since = datetime.utcfromtimestamp(time.time() - self.window)
+        self.load(db.query(
+            Post.id, Post.community_id, Post.subject, Post.created_at, Post.like_count, Post.comment_count
+        ).filter(Post.created_at >= since))
+
+    def _refresh_once(self):
+        db = ReadSessionLocal()
+        try:
+            self.refresh(db)
+        finally:
+            db.close()
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(self._refresh_once)
+            except Exception:
+                logger.exception("trending rebuild failed, the previous boards stay up")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "posts": len(self._posts),
+                "boards": len(self._boards),
+                "events": self.events,
+                "loaded_at": self.loaded_at,
+            }
+
+
+trending_engine = TrendingEngine(
+    settings.trending_half_life_hours, settings.trending_window_hours, settings.trending_refresh_interval
+)
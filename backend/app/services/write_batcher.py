@@ -0,0 +1,153 @@
+import asyncio
+import contextvars
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from ..database import AsyncSessionLocal
+
+
+def _reset_identity(obj):
+    """Forget the primary key a failed flush assigned, so the object inserts cleanly again"""
+    state = inspect(obj, raiseerr=False)
+    if state is None:
+        return
+    for column in state.mapper.primary_key:
+        setattr(obj, state.mapper.get_property_by_column(column).key, None)
+
+
+class WriteBatcher:
+    """Group commit for hot inserts.
+
+    Callers `await submit(obj)`. Objects arriving within `max_delay` seconds (or
+    until `max_batch` are waiting) are added by `flush(session, objects)` and
+    committed here in one transaction, SQLAlchemy sends them as a single multi-row
+    INSERT ... RETURNING, and each caller gets its own object back with the id
+    filled in. `flush` must not commit or do work after the transaction, that
+    belongs to the caller once submit() returns: a failing batch is rolled back
+    and retried one object per transaction so only the bad one errors.
+    """
+
+    def __init__(self, flush: Callable[[Session, List[Any]], None], max_batch: int, max_delay: float):
+        self.flush = flush
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._has_items: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._stopping = False
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._has_items = asyncio.Event()
+            self._full = asyncio.Event()
+            # Started from whichever request submits first, but it isn't part of that
+            # request: an empty context keeps its batches off that request's metrics
+            self._task = contextvars.Context().run(loop.create_task, self._run())
+
+    async def submit(self, obj):
+        self._ensure_running()
+        future = self._loop.create_future()
+        self._pending.append((obj, future))
+        self._has_items.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        return await future
+
+    async def _write(self, objects: List[Any]):
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.run_sync(self.flush, objects)
+                await db.commit()
+            except Exception:
+                # Rolled back before the session closes, so objects it inserted go
+                # back to transient rather than detached with a key that was never kept
+                await db.rollback()
+                raise
+
+    async def _flush_batch(self, batch: List[Tuple[Any, asyncio.Future]]):
+        try:
+            await self._write([obj for obj, _ in batch])
+        except Exception:
+            if len(batch) == 1:
+                raise
+            for obj, future in batch:
+                _reset_identity(obj)
+                try:
+                    await self._write([obj])
+                except Exception as exc:
+                    if not future.done():
+                        future.set_exception(exc)
+                else:
+                    if not future.done():
+                        future.set_result(obj)
+            return
+        for obj, future in batch:
+            if not future.done():
+                future.set_result(obj)
+
+    async def _run(self):
+        while True:
+            if self._stopping and not self._pending:
+                return
+            await self._has_items.wait()
+            if len(self._pending) < self.max_batch and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            if not self._pending:
+                self._has_items.clear()
+            if len(self._pending) < self.max_batch:
+                self._full.clear()
+            if not batch:
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            try:
+                await self._flush_batch(batch)
+            except Exception as exc:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    async def stop(self):
+        """Write the batch in flight and whatever is still queued, then stop the flusher.
+
+        Not a cancel: a batch cut off mid-write would leave its callers waiting forever.
+        """
+        self._stopping = True
+        try:
+            if self._task is not None and not self._task.done():
+                # Skip the batching delay, nothing else is coming
+                self._has_items.set()
+                self._full.set()
+                await self._task
+            elif self._pending:
+                await self._run()
+        finally:
+            self._stopping = False
+            self._task = None
+            leftover, self._pending = self._pending, []
+            for _, future in leftover:
+                if not future.done():
+                    future.set_exception(RuntimeError("write batcher stopped before the write"))
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "largest_batch": self.largest_batch,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,95 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """Opaque cursor pointing just past the (created_at, id) of the last item of a page"""
+    raw = f"{created_at.isoformat()}|{id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_rank_cursor(score: float, id: int) -> str:
+    """Cursor for relevance-ordered results, (score, id) of the last item of a page"""
+    raw = f"{score!r}|{id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_rank_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        score, id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return float(score), int(id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_window_cursor(before_id: int, as_of: float, score: float, id: int) -> str:
+    """Cursor for results ranked inside a window of candidates: the window's exclusive
+    upper id, the time it was scored at and (score, id) of the last item of a page"""
+    raw = f"{before_id}|{as_of!r}|{score!r}|{id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_window_cursor(cursor: str) -> Tuple[int, float, float, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        before_id, as_of, score, id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return int(before_id), float(as_of), float(score), int(id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(model, cursor: Optional[str]):
+    """WHERE clause selecting rows strictly after the cursor in (created_at DESC, id DESC) order"""
+    if not cursor:
+        return None
+    created_at, id = decode_cursor(cursor)
+    return or_(
+        model.created_at < created_at,
+        and_(model.created_at == created_at, model.id < id)
+    )
+
+
+def keyset_statement(query, model, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE):
+    """Add the keyset filter, ordering and limit (+1 to detect a next page) to a
+    Query or select(), for callers that execute it themselves (e.g. AsyncSession)"""
+    criteria = keyset_filter(model, cursor)
+    if criteria is not None:
+        query = query.filter(criteria)
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+
+def keyset_page(rows, limit: int):
+    """Trim the extra row fetched by keyset_statement, returns (items, next_cursor)"""
+    rows = list(rows)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return rows, next_cursor
+
+
+def keyset_paginate(query, model, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE):
+    """Apply keyset paging to `query`, returns (items, next_cursor).
+
+    Ordering is newest first on (created_at, id), which the composite indexes in
+    models.py cover, so every page costs the same regardless of depth.
+    """
+    return keyset_page(keyset_statement(query, model, cursor, limit).all(), limit)
@@ -1,37 +1,267 @@
-from fastapi import WebSocket, WebSocketDisconnect, Depends
-from typing import Dict, List
+from fastapi import WebSocket, WebSocketDisconnect, Query, status
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, Optional, Set
 import json
 import asyncio
+import logging
+
+from .config import settings
+from .database import ReadSessionLocal
+from .models import User, user_communities
+from .auth import decode_token_subject
+
+logger = logging.getLogger(__name__)
+
+
+def community_room(community_id: int) -> str:
+    return f"community:{community_id}"
+
+
+class Connection:
+    """One socket with its own bounded send queue, drained by a dedicated task"""
+
+    def __init__(self, websocket: WebSocket, user_id: int, manager: "ConnectionManager"):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.manager = manager
+        self.rooms: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.ws_send_queue_size)
+        self.sender: Optional[asyncio.Task] = None
+        self.closed = False
+
+    def start(self):
+        self.sender = asyncio.create_task(self._drain())
+
+    def enqueue(self, message: str):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Slow consumer, drop it rather than buffering without bound
+            self.manager.evict(self)
+
+    def stop(self):
+        # The flag and the wake-up, not just cancel(): on 3.11 wait_for() swallows a
+        # cancel that lands as the send completes, and the task would wait forever
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+        if self.sender and self.sender is not asyncio.current_task():
+            self.sender.cancel()
+
+    async def _drain(self):
+        try:
+            while not self.closed:
+                message = await self.queue.get()
+                if message is None or self.closed:
+                    return
+                await asyncio.wait_for(self.websocket.send_text(message), settings.ws_send_timeout)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            self.manager.evict(self)
+
+    async def close(self, code: int = status.WS_1000_NORMAL_CLOSURE):
+        self.stop()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+
+class InMemoryBackplane:
+    """Single-process backplane, events go straight back to the local manager"""
 
-class ConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[int, WebSocket] = {}
-        self.room_connections: Dict[str, List[WebSocket]] = {}
+        self.handler = None
+
+    async def start(self, handler):
+        self.handler = handler
+
+    async def stop(self):
+        self.handler = None
+
+    async def publish(self, event: dict):
+        if self.handler:
+            self.handler(event)
+
+
+class RedisBackplane:
+    """Pub/sub over Redis so every uvicorn worker sees every event.
+
+    A lost subscription is retried with backoff, events published while this
+    worker is unsubscribed don't reach its sockets.
+    """
+
+    retry_delay = 0.5  # seconds, doubled per failed attempt
+    max_retry_delay = 30.0
+
+    def __init__(self, url: str, channel: str = "mentii:ws"):
+        import redis.asyncio as redis
+
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+        self.listener: Optional[asyncio.Task] = None
 
-    async def connect(self, websocket: WebSocket, user_id: int):
+    async def start(self, handler):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(self.channel)
+        self.listener = asyncio.create_task(self._listen(pubsub, handler))
+
+    async def _listen(self, pubsub, handler):
+        delay = self.retry_delay
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                    await pubsub.subscribe(self.channel)
+                    logger.info("resubscribed to %s", self.channel)
+                delay = self.retry_delay
+                async for message in pubsub.listen():
+                    try:
+                        handler(json.loads(message["data"]))
+                    except Exception:
+                        # One bad event, the subscription itself is fine
+                        logger.exception("could not dispatch backplane event %r", message.get("data"))
+            except Exception:
+                logger.exception("lost the %s subscription, retrying in %.1fs", self.channel, delay)
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+            pubsub = None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+
+    async def stop(self):
+        if self.listener:
+            self.listener.cancel()
+        await self.client.aclose()
+
+    async def publish(self, event: dict):
+        await self.client.publish(self.channel, json.dumps(event))
+
+
+class ConnectionManager:
+    def __init__(self, backplane=None):
+        self.active_connections: Dict[int, Set[Connection]] = {}
+        self.room_connections: Dict[str, Set[Connection]] = {}
+        self.backplane = backplane or InMemoryBackplane()
+
+    async def start(self):
+        await self.backplane.start(self._dispatch)
+
+    async def stop(self):
+        await self.backplane.stop()
+        for connections in list(self.active_connections.values()):
+            for connection in list(connections):
+                await connection.close(status.WS_1001_GOING_AWAY)
+
+    async def connect(self, websocket: WebSocket, user_id: int, rooms=()) -> Connection:
         await websocket.accept()
-        self.active_connections[user_id] = websocket
+        connection = Connection(websocket, user_id, self)
+        self.active_connections.setdefault(user_id, set()).add(connection)
+        for room in rooms:
+            self.join(connection, room)
+        connection.start()
+        return connection
+
+    def disconnect(self, connection: Connection):
+        connections = self.active_connections.get(connection.user_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self.active_connections[connection.user_id]
+        for room in list(connection.rooms):
+            self.leave(connection, room)
+        connection.stop()
+
+    def evict(self, connection: Connection):
+        self.disconnect(connection)
+        asyncio.ensure_future(connection.close(status.WS_1013_TRY_AGAIN_LATER))
 
-    def disconnect(self, user_id: int):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
+    def join(self, connection: Connection, room: str):
+        self.room_connections.setdefault(room, set()).add(connection)
+        connection.rooms.add(room)
+
+    def leave(self, connection: Connection, room: str):
+        members = self.room_connections.get(room)
+        if members is not None:
+            members.discard(connection)
+            if not members:
+                del self.room_connections[room]
+        connection.rooms.discard(room)
+
+    def _dispatch(self, event: dict):
+        """Deliver an event to the sockets held by this process"""
+        if event["target"] == "subscribe":
+            for connection in list(self.active_connections.get(event["key"], ())):
+                self.join(connection, event["data"])
+            return
+        if event["target"] == "user":
+            targets = self.active_connections.get(event["key"], ())
+        elif event["target"] == "room":
+            targets = self.room_connections.get(event["key"], ())
+        else:
+            targets = [c for connections in self.active_connections.values() for c in connections]
+        # Copy first, enqueue() may evict and mutate the sets
+        for connection in list(targets):
+            connection.enqueue(event["data"])
 
     async def send_personal_message(self, message: str, user_id: int):
-        if user_id in self.active_connections:
-            await self.active_connections[user_id].send_text(message)
+        await self.backplane.publish({"target": "user", "key": user_id, "data": message})
+
+    async def send_to_room(self, message: str, room: str):
+        await self.backplane.publish({"target": "room", "key": room, "data": message})
+
+    async def subscribe_user(self, user_id: int, room: str):
+        """Add a room to every open socket of a user, on whichever worker holds them"""
+        await self.backplane.publish({"target": "subscribe", "key": user_id, "data": room})
 
     async def broadcast(self, message: str):
-        for connection in self.active_connections.values():
-            await connection.send_text(message)
+        await self.backplane.publish({"target": "all", "key": None, "data": message})
+
+
+def _create_manager():
+    if settings.redis_url:
+        return ConnectionManager(RedisBackplane(settings.redis_url))
+    return ConnectionManager()
+
+manager = _create_manager()
+
+
+def _load_principal(username: str):
+    """(user id, community rooms) for an active user, None otherwise"""
+    db = ReadSessionLocal()
+    try:
+        user = db.query(User.id, User.is_active).filter(User.username == username).first()
+        if user is None or not user.is_active:
+            return None
+        community_ids = [row[0] for row in db.query(user_communities.c.community_id).filter(
+            user_communities.c.user_id == user.id
+        )]
+        return user.id, [community_room(community_id) for community_id in community_ids]
+    finally:
+        db.close()
+
 
-manager = ConnectionManager()
+async def websocket_endpoint(websocket: WebSocket, token: Optional[str] = Query(None)):
+    # Browsers can't set headers on websockets, the access token comes as ?token=
+    username = decode_token_subject(token) if token else None
+    principal = await run_in_threadpool(_load_principal, username) if username else None
+    if principal is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
 
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
+    user_id, rooms = principal
+    connection = await manager.connect(websocket, user_id, rooms)
     try:
         while True:
             data = await websocket.receive_text()
-            # Echo back for now
-            await websocket.send_text(f"Message received: {data}")
+            if data == "ping":
+                connection.enqueue("pong")
     except WebSocketDisconnect:
-        pass
\ No newline at end of file
+        pass
+    finally:
+        manager.disconnect(connection)
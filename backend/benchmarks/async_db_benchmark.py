@@ -0,0 +1,132 @@
+"""Requests/sec of sync (threadpool) vs async (AsyncSession) handlers for the same
+queries, in-process over ASGI at high concurrency.
+
+Run from backend/:
+
+    python -m benchmarks.async_db_benchmark --concurrency 200
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.harness import load_app, summarize
+
+
+def add_variants(app):
+    """Mount sync and async twins of the feed and community listing queries"""
+    from fastapi import APIRouter, Depends
+    from sqlalchemy import select
+
+    from app.database import get_db, get_async_db
+    from app.models import Community
+    from app.schemas import CommunityResponse, Page, PostResponse
+    from app.services.feed_service import FeedService
+    from app.utils.pagination import keyset_paginate, keyset_page, keyset_statement
+
+    bench = APIRouter()
+
+    @bench.get("/bench/sync/feed", response_model=Page[PostResponse])
+    def sync_feed(db=Depends(get_db)):
+        items, next_cursor = FeedService(db).get_personalized_feed(1, limit=20)
+        return {"items": items, "next_cursor": next_cursor}
+
+    @bench.get("/bench/async/feed", response_model=Page[PostResponse])
+    async def async_feed(db=Depends(get_async_db)):
+        items, next_cursor = await db.run_sync(lambda s: FeedService(s).get_personalized_feed(1, limit=20))
+        return {"items": items, "next_cursor": next_cursor}
+
+    @bench.get("/bench/sync/communities", response_model=Page[CommunityResponse])
+    def sync_communities(db=Depends(get_db)):
+        items, next_cursor = keyset_paginate(db.query(Community), Community, None, 20)
+        return {"items": items, "next_cursor": next_cursor}
+
+    @bench.get("/bench/async/communities", response_model=Page[CommunityResponse])
+    async def async_communities(db=Depends(get_async_db)):
+        result = await db.execute(keyset_statement(select(Community), Community, None, 20))
+        items, next_cursor = keyset_page(result.scalars(), 20)
+        return {"items": items, "next_cursor": next_cursor}
+
+    # Ahead of the static files mount, which matches every path
+    app.router.routes[0:0] = bench.routes
+
+
+def seed(communities: int, posts: int):
+    from app.database import SessionLocal
+    from app.models import Community, Post, User
+
+    db = SessionLocal()
+    user = User(username="reader", email="reader@example.com", hashed_password="x")
+    db.add(user)
+    rows = [Community(name=f"c{i}", description="", subject="Math", level="Form 3") for i in range(communities)]
+    user.communities.extend(rows[:5])
+    db.add_all(rows)
+    db.flush()
+    db.add_all([
+        Post(content=f"post {i}", author_id=user.id, community_id=rows[i % 5].id, subject="Math")
+        for i in range(posts)
+    ])
+    db.commit()
+    db.close()
+
+
+async def measure(client, path: str, concurrency: int, requests: int, deadline: float = None):
+    samples, errors = [], 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+            except Exception:
+                # Pool timeouts surface as exceptions through the ASGI transport
+                errors += 1
+                continue
+            if response.status_code == 200:
+                samples.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    workers = asyncio.gather(*[worker() for _ in range(concurrency)])
+    try:
+        await asyncio.wait_for(workers, deadline)
+    except asyncio.TimeoutError:
+        # Stalled, count everything that didn't finish as failed
+        errors = requests - len(samples)
+    return samples, time.perf_counter() - start, errors
+
+
+async def run(app, args):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for name in ("feed", "communities"):
+            # async first, a stalled sync run can leave the pool exhausted for a while
+            for mode in ("async", "sync"):
+                path = f"/bench/{mode}/{name}"
+                await measure(client, path, 10, 50)  # warm up pools and caches
+                samples, elapsed, errors = await measure(client, path, args.concurrency, args.requests, args.deadline)
+                print(summarize(f"{mode} {name}", samples, elapsed, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--communities", type=int, default=500)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--deadline", type=float, default=60.0, help="seconds before a run counts as stalled")
+    args = parser.parse_args()
+
+    app = load_app()
+    add_variants(app)
+    seed(args.communities, args.posts)
+    asyncio.run(run(app, args))
+
+
+if __name__ == "__main__":
+    main()
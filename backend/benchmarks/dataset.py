@@ -0,0 +1,213 @@
+"""Synthetic Mentii data at a chosen scale, bulk inserted into an empty, migrated database.
+
+The same scale and seed always produce the same rows. Community membership and
+activity are skewed the way real ones are: a few communities hold most members
+and posts, a few posts collect most likes and comments. Ids are assigned here so
+that post and message ids grow with created_at, like they do in production.
+
+    python -m benchmarks.dataset --scale medium   # fill an empty database_url and exit
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+from sqlalchemy import insert
+
+SCALES = {
+    #          users, communities,     posts,  comments,     likes, threads, messages per thread
+    "tiny":   (  200,          10,     1_000,     2_000,     5_000,      50, 10),
+    "small":  (2_000,          50,    20_000,    40_000,   100_000,     500, 20),
+    "medium": (20_000,        300,   200_000,   400_000, 1_000_000,   5_000, 20),
+    "large":  (100_000,     2_000, 1_000_000, 2_000_000, 5_000_000,  25_000, 40),
+}
+
+PASSWORD = "password"  # every generated user's
+
+SUBJECTS = ["Math", "Physics", "Chemistry", "Biology", "English", "Kiswahili", "History", "Geography"]
+LEVELS = ["Form 1", "Form 2", "Form 3", "Form 4"]
+WORDS = (
+    "algebra calculus geometry physics chemistry biology history geography literature "
+    "english kiswahili revision exam homework question answer notes chapter topic form "
+    "equation reaction cell energy motion map poem essay grammar practice quiz teacher "
+    "photosynthesis fractions probability vectors electricity magnetism osmosis enzymes"
+).split()
+
+BATCH = 10_000
+
+
+def _skewed_weights(n: int, exponent: float = 1.1) -> List[float]:
+    # Zipf: the k-th most popular gets 1/k^s of the attention
+    return [1 / (k ** exponent) for k in range(1, n + 1)]
+
+
+def _text(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choices(WORDS, k=rng.randint(low, high)))
+
+
+def _insert(conn, table, rows: List[dict]):
+    for start in range(0, len(rows), BATCH):
+        conn.execute(insert(table), rows[start:start + BATCH])
+
+
+def generate(engine, scale: str = "small", seed: int = 42, days: int = 30) -> Dict:
+    """Fill the database, returns row counts, timings and the chat threads created"""
+    from app.models import Comment, Community, Conversation, Message, Post, User, UserProfile, post_likes, user_communities
+    from app.services.password_service import get_pwd_context
+
+    users, communities, posts, comments, likes, threads, per_thread = SCALES[scale]
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    start = now - timedelta(days=days)
+    span = (now - start).total_seconds()
+    started = time.perf_counter()
+
+    # Hashing is the slow part of signup, one hash serves everyone
+    hashed = get_pwd_context().hash(PASSWORD)
+    user_rows = [
+        {
+            "id": i, "email": f"user{i}@example.com", "username": f"user{i}", "full_name": f"User {i}",
+            "hashed_password": hashed, "user_type": "teacher" if i % 25 == 0 else "student",
+            "level": rng.choice(LEVELS), "subjects": rng.sample(SUBJECTS, 2), "is_active": True,
+            "created_at": start + timedelta(seconds=rng.random() * span),
+        }
+        for i in range(1, users + 1)
+    ]
+    profile_rows = [
+        {"id": i, "user_id": i, "bio": _text(rng, 3, 12), "badge_mask": 0,
+         "streak_days": rng.randint(0, 40), "followers_count": 0, "following_count": 0}
+        for i in range(1, users + 1)
+    ]
+
+    # Membership: each user joins a handful of communities, picked by popularity
+    popularity = _skewed_weights(communities)
+    community_ids = list(range(1, communities + 1))
+    members: Dict[int, List[int]] = {c: [] for c in community_ids}
+    membership_rows = []
+    for user_id in range(1, users + 1):
+        for community_id in set(rng.choices(community_ids, popularity, k=rng.randint(1, 8))):
+            members[community_id].append(user_id)
+            membership_rows.append({"user_id": user_id, "community_id": community_id})
+    community_rows = [
+        {
+            "id": c, "name": f"{SUBJECTS[c % len(SUBJECTS)]} {LEVELS[c % len(LEVELS)]} #{c}",
+            "description": _text(rng, 5, 20), "subject": SUBJECTS[c % len(SUBJECTS)],
+            "level": LEVELS[c % len(LEVELS)], "icon": "📘", "banner_color": "#7F5AF0",
+            "is_teacher_led": c % 5 == 0, "created_by": rng.randint(1, users),
+            "member_count": len(members[c]), "created_at": start,
+        }
+        for c in community_ids
+    ]
+
+    # Posts land where the members are, ids in created_at order
+    post_times = sorted(start + timedelta(seconds=rng.random() * span) for _ in range(posts))
+    post_communities = rng.choices(community_ids, popularity, k=posts)
+    post_rows = []
+    for i, (created_at, community_id) in enumerate(zip(post_times, post_communities), 1):
+        pool = members[community_id]
+        post_rows.append({
+            "id": i, "content": _text(rng, 8, 40), "author_id": rng.choice(pool) if pool else rng.randint(1, users),
+            "community_id": community_id, "subject": community_rows[community_id - 1]["subject"],
+            "tags": ",".join(rng.sample(WORDS, 2)), "like_count": 0, "comment_count": 0, "created_at": created_at,
+        })
+
+    # A few posts take most of the engagement
+    post_ids = list(range(1, posts + 1))
+    attention = [rng.paretovariate(1.2) for _ in post_ids]
+    comment_rows = []
+    for post_id in rng.choices(post_ids, attention, k=comments):
+        post = post_rows[post_id - 1]
+        post["comment_count"] += 1
+        created_at = min(now, post["created_at"] + timedelta(seconds=rng.random() * 86400))
+        comment_rows.append({"content": _text(rng, 3, 20), "post_id": post_id,
+                             "author_id": rng.randint(1, users), "created_at": created_at})
+    comment_rows.sort(key=lambda row: row["created_at"])
+    for i, row in enumerate(comment_rows, 1):
+        row["id"] = i
+    liked = set()
+    for post_id in rng.choices(post_ids, attention, k=likes):
+        pair = (rng.randint(1, users), post_id)
+        if pair not in liked:
+            liked.add(pair)
+            post_rows[post_id - 1]["like_count"] += 1
+    like_rows = [{"user_id": user_id, "post_id": post_id} for user_id, post_id in liked]
+
+    # Chat threads: back-and-forth between pairs, everything read but the last message
+    pairs = set()
+    while len(pairs) < min(threads, users * (users - 1) // 2):
+        a, b = rng.sample(range(1, users + 1), 2)
+        pairs.add((min(a, b), max(a, b)))
+    pairs = sorted(pairs)
+    message_rows = []
+    for a, b in pairs:
+        at = start + timedelta(seconds=rng.random() * span)
+        for _ in range(max(1, int(rng.expovariate(1 / per_thread)))):
+            at = min(now, at + timedelta(seconds=rng.expovariate(1 / 120)))
+            sender, receiver = (a, b) if rng.random() < 0.5 else (b, a)
+            message_rows.append({"content": _text(rng, 2, 15), "sender_id": sender, "receiver_id": receiver,
+                                 "is_read": True, "created_at": at})
+    message_rows.sort(key=lambda row: row["created_at"])
+    last: Dict[Tuple[int, int], dict] = {}
+    for i, row in enumerate(message_rows, 1):
+        row["id"] = i
+        last[tuple(sorted((row["sender_id"], row["receiver_id"])))] = row
+    conversation_rows = []
+    for (a, b), row in sorted(last.items()):
+        row["is_read"] = False
+        conversation_rows.append({
+            "user_a_id": a, "user_b_id": b, "last_message_id": row["id"], "last_message": row["content"],
+            "last_sender_id": row["sender_id"], "last_message_at": row["created_at"],
+            "unread_a": int(row["receiver_id"] == a), "unread_b": int(row["receiver_id"] == b),
+        })
+    generated = time.perf_counter() - started
+
+    with engine.begin() as conn:
+        _insert(conn, User.__table__, user_rows)
+        _insert(conn, UserProfile.__table__, profile_rows)
+        _insert(conn, Community.__table__, community_rows)
+        _insert(conn, user_communities, membership_rows)
+        _insert(conn, Post.__table__, post_rows)
+        _insert(conn, Comment.__table__, comment_rows)
+        _insert(conn, post_likes, like_rows)
+        _insert(conn, Message.__table__, message_rows)
+        _insert(conn, Conversation.__table__, conversation_rows)
+
+    return {
+        "scale": scale,
+        "seed": seed,
+        "rows": {
+            "users": len(user_rows), "communities": len(community_rows), "memberships": len(membership_rows),
+            "posts": len(post_rows), "comments": len(comment_rows), "likes": len(like_rows),
+            "messages": len(message_rows), "conversations": len(conversation_rows),
+        },
+        "largest_community": max(len(ids) for ids in members.values()),
+        "generate_seconds": round(generated, 2),
+        "insert_seconds": round(time.perf_counter() - started - generated, 2),
+        "threads": pairs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from sqlalchemy import func, select
+
+    from app.database import engine
+    from app.models import User
+    from app.schema import ensure_schema
+
+    ensure_schema(engine)
+    with engine.connect() as conn:
+        if conn.scalar(select(func.count()).select_from(User)):
+            parser.error("the database already has users, point database_url at an empty one")
+    summary = generate(engine, args.scale, args.seed)
+    summary.pop("threads")
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
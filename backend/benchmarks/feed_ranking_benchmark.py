@@ -0,0 +1,127 @@
+"""Cost of the feed ranking stage per request, by number of candidates.
+
+For 200, 1,000 and 5,000 candidates it times
+- score: FeedRanker.score plus ordering the window, on synthetic columns
+- python loop: the same formula one post at a time, then a sort
+- stage: FeedRanker.rank against a seeded database, the columns query included
+  (profile cached), what the first page of a window pays
+- page: slicing a ranked window after a cursor, what its following pages pay
+
+Run from backend/:
+
+    python -m benchmarks.feed_ranking_benchmark --scale small --limit 20
+"""
+import argparse
+import math
+import random
+import time
+
+from benchmarks.harness import load_app, percentile
+
+SUBJECTS = ["Math", "Biology", "Chemistry", "Physics", "English", "History", "Geography", "Kiswahili"]
+
+
+def make_columns(rng, candidates: int, now: float):
+    import numpy as np
+
+    return {
+        "id": np.arange(candidates, 0, -1, dtype=np.int64),
+        "created": np.array([now - rng.random() * 7 * 86400 for _ in range(candidates)]),
+        "likes": np.array([int(rng.paretovariate(1.2)) - 1 for _ in range(candidates)], dtype=np.float64),
+        "comments": np.array([int(rng.paretovariate(1.5)) - 1 for _ in range(candidates)], dtype=np.float64),
+        "subject": np.array([rng.choice(SUBJECTS) for _ in range(candidates)], dtype=object),
+        "author": np.array([rng.randint(1, 2000) for _ in range(candidates)], dtype=np.int64),
+    }
+
+
+def loop_rank(ranker, rows, subjects, affinity, now: float, limit: int):
+    # What ranking looks like without arrays: a score per post object, then sort
+    weights = ranker.weights
+    scored = []
+    for post_id, created, likes, comments, subject, author in rows:
+        score = weights["recency"] * 2 ** (-max(now - created, 0) / ranker.half_life)
+        score += weights["likes"] * math.log1p(max(likes, 0))
+        score += weights["comments"] * math.log1p(max(comments, 0))
+        score += weights["subject"] * (subject in subjects)
+        score += weights["affinity"] * math.log1p(affinity.get(author, 0))
+        scored.append((score, post_id))
+    scored.sort(reverse=True)
+    return scored[:limit]
+
+
+def time_calls(fn, calls: int):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(name: str, candidates: int, samples):
+    us = [s * 1e6 for s in samples]
+    print(f"{name:<12} {candidates:>6} candidates  p50={percentile(us, 50):>10.1f}us p99={percentile(us, 99):>10.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--candidates", default="200,1000,5000")
+    parser.add_argument("--scale", default="small", help="dataset for the stage timings, needs as many posts as candidates")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.candidates.split(",")]
+
+    load_app()
+    import numpy as np
+    from sqlalchemy import func, select
+
+    from app.database import ReadSessionLocal, engine
+    from app.models import Post, post_likes
+    from app.services.feed_ranker import feed_ranker
+    from benchmarks.dataset import generate
+
+    rng = random.Random(42)
+    now = time.time()
+    subjects = ["Physics", "Math"]
+    affinity = {author: rng.randint(1, 20) for author in rng.sample(range(1, 2000), 50)}
+    authors = np.array(sorted(affinity), dtype=np.int64)
+    author_likes = np.array([affinity[author] for author in sorted(affinity)], dtype=np.float64)
+
+    def order(ids, scores):
+        return np.lexsort((-ids, -scores))
+
+    for size in sizes:
+        columns = make_columns(rng, size, now)
+        report("score", size, time_calls(lambda: order(
+            columns["id"], feed_ranker.score(columns, subjects, authors, author_likes, now)), args.calls))
+        rows = list(zip(*(columns[name].tolist() for name in ("id", "created", "likes", "comments", "subject", "author"))))
+        report("python loop", size, time_calls(
+            lambda: loop_rank(feed_ranker, rows, set(subjects), affinity, now, args.limit), args.calls))
+
+    summary = generate(engine, args.scale)
+    print(f"seeded {args.scale}: {summary['rows']['posts']} posts")
+    db = ReadSessionLocal()
+    try:
+        # The user who liked the most, so affinity has something to match
+        user_id = db.execute(select(post_likes.c.user_id).group_by(post_likes.c.user_id)
+                             .order_by(func.count().desc()).limit(1)).scalar()
+        newest = [row[0] for row in db.query(Post.id).order_by(Post.id.desc()).limit(max(sizes))]
+        feed_ranker.profile(db, user_id)
+        for size in sizes:
+            if size > len(newest):
+                print(f"stage        {size:>6} candidates  skipped, {args.scale} has {len(newest)} posts")
+                continue
+            candidates = newest[:size]
+            report("stage", size, time_calls(
+                lambda: feed_ranker.rank(db, user_id, candidates, now), max(1, args.calls // 4)))
+            ids, scores = feed_ranker.rank(db, user_id, candidates, now)
+            middle = len(ids) // 2
+            report("page", size, time_calls(
+                lambda: feed_ranker.page(ids, scores, (scores[middle], ids[middle]), args.limit), args.calls))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Shared helpers for benchmarks that drive the real app in-process."""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(workdir: str = None):
+    """Import app.main against a throwaway, migrated database.
+
+    The app opens ./mentii.db relative to the working directory, so run it from
+    a scratch directory instead of the repo.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix="mentii-bench-")
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    os.chdir(workdir)
+
+    from app.main import app
+    from app.database import engine
+    from app.schema import ensure_schema
+
+    # Benchmarks seed before the lifespan runs
+    ensure_schema(engine)
+    return app
+
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name: str, samples, elapsed: float, errors: int = 0) -> str:
+    """One line of throughput and latency (samples in seconds)"""
+    ms = [s * 1000 for s in samples]
+    mean = statistics.mean(ms) if ms else 0.0
+    return (
+        f"{name:<14} n={len(ms):<6} rps={len(ms) / elapsed:>8.1f} "
+        f"p50={percentile(ms, 50):>8.2f}ms p99={percentile(ms, 99):>8.2f}ms "
+        f"mean={mean:>8.2f}ms errors={errors}"
+    )
+
+
+class ASGIWebSocket:
+    """In-process websocket client, httpx's ASGI transport only speaks HTTP"""
+
+    def __init__(self, app, path: str, query_string: str = ""):
+        self.app = app
+        self.scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "http_version": "1.1", "scheme": "ws",
+            "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query_string.encode(),
+            "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+            "subprotocols": [],
+        }
+        self.to_app: asyncio.Queue = asyncio.Queue()
+        self.from_app: asyncio.Queue = asyncio.Queue()
+        self.task = None
+
+    async def connect(self):
+        self.to_app.put_nowait({"type": "websocket.connect"})
+        self.task = asyncio.create_task(self.app(self.scope, self.to_app.get, self.from_app.put))
+        message = await self.from_app.get()
+        if message["type"] != "websocket.accept":
+            raise ConnectionError(f"websocket refused: {message}")
+        return self
+
+    async def receive_text(self) -> str:
+        message = await self.from_app.get()
+        if message["type"] == "websocket.close":
+            raise ConnectionError(f"websocket closed: {message.get('code')}")
+        return message.get("text") or message["bytes"].decode()
+
+    async def send_text(self, text: str):
+        self.to_app.put_nowait({"type": "websocket.receive", "text": text})
+
+    async def close(self):
+        self.to_app.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        if self.task:
+            await asyncio.wait_for(self.task, 5)
@@ -0,0 +1,359 @@
+"""Scripted load against the real app on a synthetic dataset, results saved as JSON.
+
+Seeds a scratch database with benchmarks.dataset, starts the app's lifespan and
+drives it in-process: HTTP through httpx's ASGI transport, websockets through
+harness.ASGIWebSocket. Scenarios:
+
+- login_storm: everyone logs in at once, then loads /me
+- feed_scroll: readers open the feed and page down it
+- chat_burst: pairs trade a burst of messages while the receiver listens on /ws
+- search_typeahead: search on every keystroke of a word
+
+Each reports throughput, p50/p95/p99 and SQL statements per request (from
+app.services.metrics). Runs are saved under benchmarks/results/, --compare puts
+a previous one next to the new numbers. Run from backend/:
+
+    python -m benchmarks.loadgen --scale small
+    python -m benchmarks.loadgen --scale small --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from benchmarks.dataset import PASSWORD, SCALES, WORDS, generate
+from benchmarks.harness import BACKEND_DIR, ASGIWebSocket, load_app, percentile
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+
+def latency_summary(samples) -> dict:
+    ms = [s * 1000 for s in samples]
+    return {
+        "p50": round(percentile(ms, 50), 2),
+        "p95": round(percentile(ms, 95), 2),
+        "p99": round(percentile(ms, 99), 2),
+        "mean": round(statistics.mean(ms), 2) if ms else 0.0,
+        "max": round(max(ms), 2) if ms else 0.0,
+    }
+
+
+class Recorder:
+    """Latency and status of every request one scenario makes"""
+
+    def __init__(self, client):
+        self.client = client
+        self.requests = 0
+        self.samples = []
+        self.statuses = Counter()
+        self.errors = 0
+
+    async def call(self, method: str, url: str, **kwargs):
+        self.requests += 1
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except Exception:
+            self.errors += 1
+            return None
+        self.samples.append(time.perf_counter() - start)
+        self.statuses[response.status_code] += 1
+        if response.status_code >= 400:
+            self.errors += 1
+            return None
+        return response
+
+
+def sql_snapshot():
+    """(requests, statements) per route so far, from the metrics middleware"""
+    from app.services.metrics import BACKGROUND, metrics
+
+    requests = Counter()
+    for (_, route, _), count in list(metrics.requests.items()):
+        requests[route] += count
+    statements = Counter({route: count for route, count in list(metrics.db_statements.items()) if route != BACKGROUND})
+    return requests, statements
+
+
+def sql_summary(before, after) -> dict:
+    requests = after[0] - before[0]
+    statements = after[1] - before[1]
+    total = sum(requests.values())
+    return {
+        "sql_per_request": round(sum(statements.values()) / total, 2) if total else None,
+        "routes": {
+            route: {"requests": count, "sql_per_request": round(statements[route] / count, 2)}
+            for route, count in sorted(requests.items())
+        },
+    }
+
+
+async def each(count: int, concurrency: int, fn):
+    """Run fn(0..count-1) with at most `concurrency` in flight"""
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with gate:
+            await fn(i)
+
+    await asyncio.gather(*(one(i) for i in range(count)))
+
+
+def bearer(user_id: int) -> dict:
+    from app.auth import create_access_token
+
+    return {"Authorization": "Bearer " + create_access_token({"sub": f"user{user_id}"})}
+
+
+async def login_storm(run, rec: Recorder):
+    user_ids = run.rng.sample(range(1, run.rows["users"] + 1), min(run.args.logins, run.rows["users"]))
+
+    async def user(i):
+        response = await rec.call("POST", "/api/auth/login", params={"username": f"user{user_ids[i]}", "password": PASSWORD})
+        if response is not None:
+            token = response.json()["access_token"]
+            await rec.call("GET", "/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+
+    await each(len(user_ids), run.args.concurrency, user)
+
+
+async def feed_scroll(run, rec: Recorder):
+    user_ids = run.rng.sample(range(1, run.rows["users"] + 1), min(run.args.readers, run.rows["users"]))
+
+    async def reader(i):
+        headers, cursor = bearer(user_ids[i]), None
+        for _ in range(run.args.pages):
+            params = {"limit": 10, **({"cursor": cursor} if cursor else {})}
+            response = await rec.call("GET", "/api/posts/feed", params=params, headers=headers)
+            if response is None:
+                return
+            cursor = response.json()["next_cursor"]
+            if not cursor:
+                return
+
+    await each(len(user_ids), run.args.concurrency, reader)
+
+
+async def chat_burst(run, rec: Recorder):
+    pairs = run.rng.sample(run.threads, min(run.args.pairs, len(run.threads)))
+    deliveries, lost = [], 0
+
+    async def pair(i):
+        nonlocal lost
+        sender, receiver = pairs[i]
+        headers = bearer(sender)
+        token = bearer(receiver)["Authorization"].split()[1]
+        socket = await ASGIWebSocket(run.app, "/ws", f"token={token}").connect()
+        sent = {}
+
+        async def listen():
+            while len(sent) < run.args.messages or any(at is not None for at in sent.values()):
+                event = json.loads(await socket.receive_text())
+                message = event.get("message") or {}
+                at = sent.get(message.get("content"))
+                if event.get("type") == "message" and at is not None:
+                    deliveries.append(time.perf_counter() - at)
+                    sent[message["content"]] = None
+
+        listener = asyncio.create_task(listen())
+        for n in range(run.args.messages):
+            content = f"burst {i}-{n} {run.rng.choice(WORDS)}"
+            sent[content] = time.perf_counter()
+            await rec.call("POST", "/api/chat/send", json={"receiver_id": receiver, "content": content}, headers=headers)
+        try:
+            await asyncio.wait_for(listener, run.args.delivery_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            listener.cancel()
+        lost += sum(1 for at in sent.values() if at is not None)
+        await socket.close()
+
+        # The receiver catches up: inbox, the new messages, mark them read
+        receiver_headers = bearer(receiver)
+        await rec.call("GET", "/api/chat/conversations", headers=receiver_headers)
+        await rec.call("GET", f"/api/chat/{sender}/messages", params={"limit": 20}, headers=receiver_headers)
+        await rec.call("POST", f"/api/chat/{sender}/read", headers=receiver_headers)
+
+    await each(len(pairs), run.args.concurrency, pair)
+    return {"delivery_ms": latency_summary(deliveries), "delivered": len(deliveries), "lost": lost}
+
+
+async def search_typeahead(run, rec: Recorder):
+    words = [word for word in WORDS if len(word) >= 5]
+
+    async def typist(i):
+        word = run.rng.choice(words)
+        for end in range(1, len(word) + 1):
+            await rec.call("GET", "/api/search/", params={"q": word[:end], "type": "all", "limit": 5})
+
+    await each(run.args.typists, run.args.concurrency, typist)
+
+
+SCENARIOS = {
+    "login_storm": login_storm,
+    "feed_scroll": feed_scroll,
+    "chat_burst": chat_burst,
+    "search_typeahead": search_typeahead,
+}
+
+
+class Run:
+    def __init__(self, app, client, dataset, args):
+        self.app = app
+        self.client = client
+        self.rows = dataset["rows"]
+        self.threads = dataset["threads"]
+        self.args = args
+        self.rng = random.Random(args.seed)
+
+
+async def run_scenarios(app, dataset, args) -> dict:
+    import httpx
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            run = Run(app, client, dataset, args)
+            for name in args.scenarios:
+                rec = Recorder(client)
+                before = sql_snapshot()
+                start = time.perf_counter()
+                extra = await SCENARIOS[name](run, rec) or {}
+                elapsed = time.perf_counter() - start
+                results[name] = {
+                    "requests": rec.requests,
+                    "errors": rec.errors,
+                    "statuses": {str(code): count for code, count in sorted(rec.statuses.items())},
+                    "seconds": round(elapsed, 3),
+                    "throughput": round(len(rec.samples) / elapsed, 1) if elapsed else 0.0,
+                    "latency_ms": latency_summary(rec.samples),
+                    **sql_summary(before, sql_snapshot()),
+                    **extra,
+                }
+                print(report_line(name, results[name]))
+    return results
+
+
+def report_line(name: str, result: dict) -> str:
+    latency = result["latency_ms"]
+    sql = result["sql_per_request"]
+    return (
+        f"{name:<17} n={result['requests']:<6} rps={result['throughput']:>8.1f} "
+        f"p50={latency['p50']:>8.2f}ms p95={latency['p95']:>8.2f}ms p99={latency['p99']:>8.2f}ms "
+        f"sql/req={sql if sql is not None else '-':>5} errors={result['errors']}"
+    )
+
+
+def compare(previous: dict, current: dict):
+    def change(old, new):
+        if not old or new is None:
+            return ""
+        return f"({(new - old) / old * 100:+.0f}%)"
+
+    print(f"\nvs {previous['meta']['started_at']} ({previous['meta'].get('git_commit') or 'unknown commit'}, "
+          f"scale {previous['dataset']['scale']})")
+    for name, new in current["scenarios"].items():
+        old = previous["scenarios"].get(name)
+        if old is None:
+            continue
+        print(f"{name:<17} rps {old['throughput']:>8.1f} -> {new['throughput']:>8.1f} {change(old['throughput'], new['throughput']):<7} "
+              f"p95 {old['latency_ms']['p95']:>8.2f} -> {new['latency_ms']['p95']:>8.2f}ms {change(old['latency_ms']['p95'], new['latency_ms']['p95']):<7} "
+              f"sql/req {old['sql_per_request']} -> {new['sql_per_request']}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma separated, run in this order")
+    parser.add_argument("--concurrency", type=int, default=50, help="simulated users active at once")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--readers", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=5, help="feed pages each reader scrolls")
+    parser.add_argument("--pairs", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=10, help="messages per pair")
+    parser.add_argument("--delivery-timeout", type=float, default=10.0, help="seconds to wait for websocket delivery")
+    parser.add_argument("--typists", type=int, default=200)
+    parser.add_argument("--rate-limits", action="store_true",
+                        help="keep rate limits and load shedding on, every simulated user shares one IP here")
+    parser.add_argument("--bcrypt-rounds", type=int, help="override settings.bcrypt_rounds for the login storm")
+    parser.add_argument("--out", help=f"result file, defaults to a new one in {RESULTS_DIR}")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    # load_app() moves into a scratch directory
+    args.out = os.path.abspath(args.out) if args.out else None
+    args.compare = os.path.abspath(args.compare) if args.compare else None
+    # Settings are read when app.config is imported
+    if args.bcrypt_rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    if not args.rate_limits:
+        # Measure the app, not the admission control in front of it
+        os.environ.update(RATE_LIMIT_ENABLED="false", SHED_MAX_IN_FLIGHT="0", SHED_MAX_QUEUE="0", SHED_LATENCY_MS="0")
+
+    started_at = datetime.now(timezone.utc)
+    app = load_app()
+    from app.config import settings
+    from app.database import engine
+
+    dataset = generate(engine, args.scale, args.seed)
+    print(f"dataset {args.scale}: {dataset['rows']} in {dataset['generate_seconds'] + dataset['insert_seconds']:.1f}s")
+    scenarios = asyncio.run(run_scenarios(app, dataset, args))
+
+    dataset.pop("threads")
+    result = {
+        "meta": {
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("out", "compare")},
+            "settings": {
+                "database": engine.dialect.name,
+                "sqlite_profile": settings.sqlite_profile,
+                "bcrypt_rounds": settings.bcrypt_rounds,
+                "password_workers": settings.password_workers,
+                "redis": bool(settings.redis_url),
+                "metrics_enabled": settings.metrics_enabled,
+                "rate_limit_enabled": settings.rate_limit_enabled,
+                "shed_latency_ms": settings.shed_latency_ms,
+                "shed_latency_window": settings.shed_latency_window,
+            },
+        },
+        "dataset": dataset,
+        "scenarios": scenarios,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{started_at:%Y%m%d-%H%M%S}-{args.scale}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"saved {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Login storm against concurrent feed reads, in-process over ASGI.
+
+Run from backend/, compare bcrypt in the threadpool with the process pool:
+
+    python -m benchmarks.login_benchmark --password-workers 0
+    python -m benchmarks.login_benchmark --password-workers 4
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.harness import load_app, summarize
+
+
+async def hammer(client, request, samples, errors, deadline):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await request(client)
+        if response.status_code == 200:
+            samples.append(time.perf_counter() - start)
+        else:
+            errors.append(response.status_code)
+
+
+async def run(app, args):
+    import httpx
+    from app.auth import create_access_token
+
+    login_samples, login_errors = [], []
+    feed_samples, feed_errors = [], []
+    feed_headers = {"Authorization": f"Bearer {create_access_token({'sub': 'reader'})}"}
+
+    async def login(client):
+        n = int(time.perf_counter() * 1000) % args.users
+        return await client.post("/api/auth/login", params={"username": f"student{n}", "password": "password"})
+
+    async def feed(client):
+        return await client.get("/api/posts/feed", headers=feed_headers)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        deadline = time.perf_counter() + args.duration
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[hammer(client, login, login_samples, login_errors, deadline) for _ in range(args.logins)],
+            *[hammer(client, feed, feed_samples, feed_errors, deadline) for _ in range(args.readers)],
+        )
+        elapsed = time.perf_counter() - start
+
+    print(summarize("login", login_samples, elapsed, len(login_errors)))
+    print(f"{'':<14} rejected with 503: {login_errors.count(503)}")
+    print(summarize("feed", feed_samples, elapsed, len(feed_errors)))
+
+
+def seed(args):
+    from app.database import SessionLocal
+    from app.models import Community, Post, User
+    from app.services.password_service import get_pwd_context
+
+    db = SessionLocal()
+    hashed = get_pwd_context().hash("password")
+    community = Community(name="Bench", description="", subject="Math", level="Form 3")
+    reader = User(username="reader", email="reader@example.com", hashed_password=hashed)
+    community.members.append(reader)
+    db.add_all([community, reader])
+    db.add_all([
+        User(username=f"student{i}", email=f"student{i}@example.com", hashed_password=hashed)
+        for i in range(args.users)
+    ])
+    db.flush()
+    db.add_all([
+        Post(content=f"post {i}", author_id=reader.id, community_id=community.id, subject="Math")
+        for i in range(200)
+    ])
+    db.commit()
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--password-workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--logins", type=int, default=32, help="concurrent login clients")
+    parser.add_argument("--readers", type=int, default=8, help="concurrent feed readers")
+    parser.add_argument("--max-pending", type=int, default=None, help="admission limit, defaults to settings")
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    app = load_app()
+    from app.services.password_service import password_hasher
+    password_hasher.workers = args.password_workers
+    if args.max_pending is not None:
+        password_hasher.max_pending = args.max_pending
+
+    seed(args)
+    try:
+        asyncio.run(run(app, args))
+    finally:
+        password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Compare the FTS5 search index with the old ILIKE scan.
+
+Run from backend/:
+
+    python -m benchmarks.search_benchmark --posts 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.models import Post
+from app.services.search_index import LikeSearchIndex, SQLiteSearchIndex
+
+WORDS = (
+    "algebra calculus geometry physics chemistry biology history geography literature "
+    "english kiswahili revision exam homework question answer notes chapter topic form "
+    "equation reaction cell energy motion map poem essay grammar practice quiz teacher"
+).split()
+
+QUERIES = ["calculus", "chem", "exam question", "photosynthesis", "ge"]
+
+
+def populate(engine, posts: int, batch: int = 20000):
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        for start in range(0, posts, batch):
+            rows = [
+                {
+                    "content": " ".join(rng.choices(WORDS, k=rng.randint(8, 30))),
+                    "tags": ",".join(rng.sample(WORDS, 2)),
+                    "author_id": rng.randint(1, 1000),
+                    "community_id": rng.randint(1, 50),
+                    "subject": rng.choice(WORDS),
+                }
+                for _ in range(min(batch, posts - start))
+            ]
+            conn.execute(Post.__table__.insert(), rows)
+
+
+def timed(index, db, q: str, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        index.search(db, "posts", q, limit=10)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run(create_engine(f"sqlite:///{os.path.join(tmp, 'search_bench.db')}"), args)
+
+
+def run(engine, args):
+    Base.metadata.create_all(bind=engine)
+
+    start = time.perf_counter()
+    populate(engine, args.posts)
+    print(f"inserted {args.posts} posts in {time.perf_counter() - start:.1f}s")
+
+    fts = SQLiteSearchIndex()
+    start = time.perf_counter()
+    # Installing after the bulk load builds the index in one pass
+    fts.install(engine)
+    print(f"built FTS5 index in {time.perf_counter() - start:.1f}s")
+
+    like = LikeSearchIndex()
+    print(f"{'query':<16}{'ilike p50 ms':>14}{'ilike max':>12}{'fts5 p50 ms':>14}{'fts5 max':>12}")
+    with Session(engine) as db:
+        for q in QUERIES:
+            like_p50, like_max = timed(like, db, q, args.repeat)
+            fts_p50, fts_max = timed(fts, db, q, args.repeat)
+            print(f"{q:<16}{like_p50:>14.2f}{like_max:>12.2f}{fts_p50:>14.2f}{fts_max:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Encode time per 1,000 feed items for each serialization path.
+
+- fastapi+json: validate, model_dump(mode="json"), jsonable_encoder, json.dumps,
+  which is what a route returning ORM objects used to cost
+- fastapi+orjson: the same with orjson doing the final encode (ORJSONResponse)
+- adapter: precompiled TypeAdapter, ORM objects straight to JSON bytes
+- adapter rows: flat summary schema validated from column-selection rows
+
+No database, objects are built in memory. Run from backend/:
+
+    python -m benchmarks.serialization_benchmark --items 1000
+"""
+import argparse
+import json
+import time
+from collections import namedtuple
+from datetime import datetime
+from typing import List
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from app.models import Post, User
+from app.schemas import Page, PostResponse, PostSummary
+from app.utils.serialization import dump_json
+
+
+def make_posts(items: int):
+    now = datetime.utcnow()
+    authors = [
+        User(id=i, username=f"user{i}", email=f"user{i}@example.com", full_name=f"User {i}",
+             user_type="student", level="Form 3", subjects=["Math"], is_active=True, created_at=now)
+        for i in range(50)
+    ]
+    return [
+        Post(id=i, content="Revision notes for the calculus exam " * 4, author_id=i % 50, author=authors[i % 50],
+             community_id=i % 7, subject="Math", tags="calculus,exam", like_count=i, comment_count=i // 3,
+             created_at=now)
+        for i in range(items)
+    ]
+
+
+def make_rows(posts):
+    # SQLAlchemy Rows are named tuples as far as pydantic is concerned
+    SummaryRow = namedtuple("SummaryRow", list(PostSummary.model_fields))
+    return [SummaryRow(*(getattr(post, name) for name in SummaryRow._fields)) for post in posts]
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    posts = make_posts(args.items)
+    rows = make_rows(posts)
+    page = {"items": posts, "next_cursor": None}
+
+    def fastapi_json():
+        value = Page[PostResponse].model_validate(page, from_attributes=True)
+        return json.dumps(jsonable_encoder(value.model_dump(mode="json"))).encode()
+
+    def fastapi_orjson():
+        value = Page[PostResponse].model_validate(page, from_attributes=True)
+        return orjson.dumps(value.model_dump(mode="json"))
+
+    paths = [
+        ("fastapi+json", fastapi_json),
+        ("fastapi+orjson", fastapi_orjson),
+        ("adapter", lambda: dump_json(Page[PostResponse], page)),
+        ("adapter rows", lambda: dump_json(List[PostSummary], rows)),
+    ]
+    per = 1000 / args.items
+    for name, fn in paths:
+        size = len(fn())
+        print(f"{name:<16} {timed(fn, args.repeat) * 1000 * per:>8.2f}ms per 1,000 items ({size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Read throughput while writes happen, stock SQLite vs the WAL profile.
+
+Reader threads page the newest posts while writer threads insert batches of posts,
+each profile against its own fresh database file, through the same engine
+factories the app uses (so "wal" gets the pragmas, one writer connection and a
+read-only pool). Run from backend/:
+
+    python -m benchmarks.sqlite_concurrency_benchmark --readers 8 --writers 2 --seconds 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from benchmarks.harness import BACKEND_DIR, summarize
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from app.database import Base, create_db_engine
+from app.models import Community, Post, User
+
+
+def seed(engine, posts: int):
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"username": "writer", "email": "writer@example.com", "hashed_password": "x"}])
+        conn.execute(insert(Community), [{"name": "c0", "description": "", "subject": "Math", "level": "Form 3"}])
+        conn.execute(insert(Post), [
+            {"content": f"post {i}", "author_id": 1, "community_id": 1, "subject": "Math", "created_at": now}
+            for i in range(posts)
+        ])
+
+
+def run(profile: str, args) -> None:
+    path = os.path.join(tempfile.mkdtemp(prefix="mentii-sqlite-"), "bench.db")
+    url = f"sqlite:///{path}"
+    write_engine = create_db_engine(url, profile=profile)
+    read_engine = create_db_engine(url, read_only=True, profile=profile) if profile == "wal" else write_engine
+    seed(write_engine, args.posts)
+
+    query = select(Post.id, Post.content, Post.created_at).order_by(Post.created_at.desc(), Post.id.desc()).limit(20)
+    deadline = time.perf_counter() + args.seconds
+    reads, writes = [], []
+    errors = {"read": 0, "write": 0}
+    lock = threading.Lock()
+
+    def reader():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                with read_engine.connect() as conn:
+                    conn.execute(query).all()
+            except Exception:
+                with lock:
+                    errors["read"] += 1
+                continue
+            with lock:
+                reads.append(time.perf_counter() - start)
+
+    def writer():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                with write_engine.begin() as conn:
+                    conn.execute(insert(Post), [
+                        {"content": "new", "author_id": 1, "community_id": 1, "subject": "Math", "created_at": datetime.utcnow()}
+                        for _ in range(args.batch)
+                    ])
+            except Exception:
+                with lock:
+                    errors["write"] += 1
+                continue
+            with lock:
+                writes.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer) for _ in range(args.writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"-- {profile}")
+    print(summarize("reads", reads, elapsed, errors["read"]))
+    print(summarize(f"writes x{args.batch}", writes, elapsed, errors["write"]))
+    write_engine.dispose()
+    read_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--batch", type=int, default=50, help="rows per write transaction")
+    parser.add_argument("--posts", type=int, default=20000, help="rows seeded before the run")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--profile", choices=["default", "wal", "both"], default="both")
+    args = parser.parse_args()
+
+    for profile in (["default", "wal"] if args.profile == "both" else [args.profile]):
+        run(profile, args)
+
+
+if __name__ == "__main__":
+    main()
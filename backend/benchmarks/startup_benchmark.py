@@ -0,0 +1,116 @@
+"""Cold start: import time and time to first request, in fresh processes.
+
+Each run starts a new interpreter in a scratch directory and records
+- import: interpreter start until `import app.main` returns
+- startup: lifespan (migrations when auto_migrate is on, background jobs)
+- first request: GET /api/health answered
+once against a new database and once against the already-migrated one. The
+slowest modules of one `python -X importtime` run are listed after. Run from backend/:
+
+    python -m benchmarks.startup_benchmark --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import BACKEND_DIR
+
+CHILD = r"""
+import asyncio, json, sys, time
+started = float(sys.argv[1])
+from app.main import app
+imported = time.time()
+
+async def get(path):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+             "headers": [], "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80)}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages[0]["status"]
+
+async def main():
+    async with app.router.lifespan_context(app):
+        ready = time.time()
+        status = await get("/api/health")
+        answered = time.time()
+    print(json.dumps({"import": imported - started, "startup": ready - imported,
+                      "first_request": answered - ready, "total": answered - started, "status": status}))
+
+asyncio.run(main())
+"""
+
+
+def _env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def run_once(workdir: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, repr(time.time())],
+        cwd=workdir, env=_env(), capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_profile(workdir: str, top: int):
+    """(module, cumulative ms) of the slowest imports under app.main"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=workdir, env=_env(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+            rows.append((name, int(cumulative) / 1000))
+        except ValueError:
+            continue  # the header line
+    return sorted(rows, key=lambda row: -row[1])[:top]
+
+
+def report(name: str, runs):
+    line = f"{name:<10}"
+    for phase in ("import", "startup", "first_request", "total"):
+        line += f" {phase}={statistics.median(run[phase] for run in runs) * 1000:>7.1f}ms"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    args = parser.parse_args()
+
+    cold, warm = [], []
+    for _ in range(args.runs):
+        workdir = tempfile.mkdtemp(prefix="mentii-startup-")
+        cold.append(run_once(workdir))
+        warm.append(run_once(workdir))
+    print(f"median of {args.runs} runs")
+    report("new db", cold)
+    report("migrated", warm)
+
+    print("\nslowest imports (cumulative):")
+    for name, ms in import_profile(tempfile.mkdtemp(prefix="mentii-startup-"), args.top):
+        print(f"  {ms:>8.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
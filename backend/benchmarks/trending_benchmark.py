@@ -0,0 +1,100 @@
+"""Replay a synthetic like/comment stream through the trending engine.
+
+Measures the cost of applying an event, rebuilding the boards and reading a
+top-K, next to re-sorting every post in the window per read (what the old
+`get_trending_posts` did in SQL). Pure in-memory, no database.
+
+Run from backend/:
+
+    python -m benchmarks.trending_benchmark --posts 100000 --events 1000000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.harness import percentile
+
+from app.services.trending_engine import TrendingEngine, community_board, subject_board
+
+SUBJECTS = ["Math", "Biology", "Chemistry", "Physics", "English", "History", "Geography", "Kiswahili"]
+
+
+def make_posts(rng, posts: int, communities: int, window_hours: float):
+    now = datetime.utcnow()
+    rows = []
+    for post_id in range(1, posts + 1):
+        age = rng.random() * window_hours
+        rows.append((
+            post_id,
+            rng.randint(1, communities),
+            rng.choice(SUBJECTS),
+            now - timedelta(hours=age),
+            0,
+            0,
+        ))
+    return rows
+
+
+def make_events(rng, posts: int, events: int):
+    # Heavy-tailed popularity, a handful of posts get most of the likes
+    weights = [1 / rank ** 1.1 for rank in range(1, posts + 1)]
+    targets = rng.choices(range(1, posts + 1), weights=weights, k=events)
+    return [(post_id, "comment_count" if rng.random() < 0.1 else "like_count", 1) for post_id in targets]
+
+
+def time_reads(fn, reads: int):
+    samples = []
+    for _ in range(reads):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(name: str, samples):
+    us = [s * 1e6 for s in samples]
+    print(f"{name:<24} p50={percentile(us, 50):>10.1f}us p99={percentile(us, 99):>10.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--communities", type=int, default=500)
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    engine = TrendingEngine(half_life_hours=6, window_hours=48, refresh_interval=60)
+    rows = make_posts(rng, args.posts, args.communities, 47)
+    events = make_events(rng, args.posts, args.events)
+
+    start = time.perf_counter()
+    engine.load(rows)
+    print(f"load {args.posts} posts          {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    for post_id, column, delta in events:
+        engine.record(post_id, column, delta)
+    elapsed = time.perf_counter() - start
+    print(f"replay {args.events} events   {elapsed:.3f}s ({elapsed / args.events * 1e6:.2f}us/event, "
+          f"{args.events / elapsed:.0f} events/s)")
+
+    report("top-K global", time_reads(lambda: engine.top(args.limit), args.reads))
+    report("top-K community", time_reads(lambda: engine.top(args.limit, community_board(rng.randint(1, args.communities))), args.reads))
+    report("top-K subject", time_reads(lambda: engine.top(args.limit, subject_board(rng.choice(SUBJECTS))), args.reads))
+
+    # Baseline: score every post in the window on each read
+    likes = {}
+    for post_id, column, delta in events:
+        likes[post_id] = likes.get(post_id, 0) + delta
+    baseline = [(post_id, likes.get(post_id, 0)) for post_id, *_ in rows]
+    report("full sort per read", time_reads(
+        lambda: sorted(baseline, key=lambda row: row[1], reverse=True)[:args.limit], max(1, args.reads // 10)
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
-from app.database import engine, Base
-from app.models import User, Post, Community, Message, Resource, Comment, UserProfile
+from app.database import engine, SessionLocal
+from app.schema import ensure_schema
+from app.services.community_service import CommunityService
 
-print("Creating database tables...")
-Base.metadata.create_all(bind=engine)
-print("Database tables created successfully!")
\ No newline at end of file
+print("Migrating database...")
+ensure_schema(engine)
+
+# member_count is denormalized, resync it with user_communities
+db = SessionLocal()
+CommunityService(db).recount()
+db.close()
+print("Database is up to date!")
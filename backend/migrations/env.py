@@ -0,0 +1,63 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from app.config import settings
+from app.models import Base
+
+config = context.config
+# app.schema.ensure_schema() passes its own connection and keeps the app's logging
+connection = config.attributes.get("connection")
+if connection is None and config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def _include_object(obj, name, type_, reflected, compare_to):
+    """Leave the search index's objects to app.services.search_index: the FTS5
+    tables (and their shadow tables) on SQLite, the tsvector columns and their
+    GIN indexes on Postgres. They aren't in the models, autogenerate would drop them"""
+    if type_ == "table" and "_fts" in name:
+        return False
+    if type_ in ("column", "index") and name.endswith("search_vector"):
+        return False
+    return True
+
+
+def _configure(**kwargs):
+    context.configure(
+        target_metadata=target_metadata,
+        include_object=_include_object,
+        # SQLite can't ALTER constraints or nullability, batch ops rebuild the table
+        render_as_batch=True,
+        compare_type=False,
+        **kwargs
+    )
+
+
+def run_migrations_offline():
+    _configure(url=settings.database_url, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    if connection is not None:
+        _configure(connection=connection)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    engine = create_engine(settings.database_url, poolclass=pool.NullPool)
+    with engine.connect() as conn:
+        _configure(connection=conn)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
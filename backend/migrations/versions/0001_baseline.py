@@ -0,0 +1,176 @@
+"""Baseline: the schema as create_all() built it before migrations existed
+
+Databases created that way are stamped with this revision by
+app.schema.ensure_schema() and upgraded from here.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _created_at(name="created_at"):
+    return sa.Column(name, sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True)
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=True),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("user_type", sa.String(), nullable=True),
+        sa.Column("level", sa.String(), nullable=True),
+        sa.Column("subjects", sa.JSON(), nullable=True),
+        sa.Column("avatar_url", sa.String(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        _created_at(),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_id", "users", ["id"], unique=False)
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "communities",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("subject", sa.String(), nullable=True),
+        sa.Column("level", sa.String(), nullable=True),
+        sa.Column("icon", sa.String(), nullable=True),
+        sa.Column("banner_color", sa.String(), nullable=True),
+        sa.Column("is_teacher_led", sa.Boolean(), nullable=True),
+        sa.Column("created_by", sa.Integer(), nullable=True),
+        _created_at(),
+        sa.ForeignKeyConstraint(["created_by"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_communities_id", "communities", ["id"], unique=False)
+    op.create_index("ix_communities_name", "communities", ["name"], unique=True)
+
+    op.create_table(
+        "messages",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=True),
+        sa.Column("sender_id", sa.Integer(), nullable=True),
+        sa.Column("receiver_id", sa.Integer(), nullable=True),
+        sa.Column("is_read", sa.Boolean(), nullable=True),
+        _created_at(),
+        sa.ForeignKeyConstraint(["receiver_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["sender_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_messages_id", "messages", ["id"], unique=False)
+
+    op.create_table(
+        "resources",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("file_url", sa.String(), nullable=True),
+        sa.Column("file_type", sa.String(), nullable=True),
+        sa.Column("subject", sa.String(), nullable=True),
+        sa.Column("level", sa.String(), nullable=True),
+        sa.Column("uploaded_by", sa.Integer(), nullable=True),
+        sa.Column("download_count", sa.Integer(), nullable=True),
+        _created_at(),
+        sa.ForeignKeyConstraint(["uploaded_by"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_resources_id", "resources", ["id"], unique=False)
+
+    op.create_table(
+        "user_profiles",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("bio", sa.Text(), nullable=True),
+        sa.Column("badges", sa.String(), nullable=True),
+        sa.Column("streak_days", sa.Integer(), nullable=True),
+        sa.Column("followers_count", sa.Integer(), nullable=True),
+        sa.Column("following_count", sa.Integer(), nullable=True),
+        _created_at("last_active"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id"),
+    )
+    op.create_index("ix_user_profiles_id", "user_profiles", ["id"], unique=False)
+
+    op.create_table(
+        "posts",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=True),
+        sa.Column("image_url", sa.String(), nullable=True),
+        sa.Column("author_id", sa.Integer(), nullable=True),
+        sa.Column("community_id", sa.Integer(), nullable=True),
+        sa.Column("subject", sa.String(), nullable=True),
+        sa.Column("tags", sa.String(), nullable=True),
+        sa.Column("like_count", sa.Integer(), nullable=True),
+        sa.Column("comment_count", sa.Integer(), nullable=True),
+        _created_at(),
+        sa.ForeignKeyConstraint(["author_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["community_id"], ["communities.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_posts_id", "posts", ["id"], unique=False)
+
+    op.create_table(
+        "user_communities",
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("community_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["community_id"], ["communities.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+    )
+
+    op.create_table(
+        "comments",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("post_id", sa.Integer(), nullable=True),
+        sa.Column("author_id", sa.Integer(), nullable=True),
+        _created_at(),
+        sa.ForeignKeyConstraint(["author_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["post_id"], ["posts.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_comments_id", "comments", ["id"], unique=False)
+
+    op.create_table(
+        "post_likes",
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("post_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["post_id"], ["posts.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+    )
+
+
+def downgrade():
+    op.drop_table("post_likes")
+    op.drop_index("ix_comments_id", table_name="comments")
+    op.drop_table("comments")
+    op.drop_table("user_communities")
+    op.drop_index("ix_posts_id", table_name="posts")
+    op.drop_table("posts")
+    op.drop_index("ix_user_profiles_id", table_name="user_profiles")
+    op.drop_table("user_profiles")
+    op.drop_index("ix_resources_id", table_name="resources")
+    op.drop_table("resources")
+    op.drop_index("ix_messages_id", table_name="messages")
+    op.drop_table("messages")
+    op.drop_index("ix_communities_name", table_name="communities")
+    op.drop_index("ix_communities_id", table_name="communities")
+    op.drop_table("communities")
+    op.drop_index("ix_users_username", table_name="users")
+    op.drop_index("ix_users_id", table_name="users")
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_table("users")
@@ -0,0 +1,191 @@
+"""Counters, conversations, search index, keyset indexes and uniqueness
+
+Everything the models gained since the baseline:
+- users.subjects, on databases older than the column itself
+- conversations summary table, backfilled from messages
+- communities.member_count, recounted from user_communities
+- user_profiles.badges (names) -> badge_mask (bits)
+- unique, non-null user_communities / post_likes pairs (duplicates removed)
+- resources storage columns
+- (created_at, id) keyset indexes and the history/comment/resource listing indexes
+- full-text search objects (FTS5 tables and triggers, or tsvector columns)
+
+Databases that got some of this from create_all() before migrations existed
+are stamped at the baseline, so every step checks before it changes anything.
+
+Revision ID: 0002_performance_schema
+Revises: 0001_baseline
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+
+revision = "0002_performance_schema"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+# streak_service.BADGES at the time of this migration: name -> bit
+BADGE_BITS = {"7-day-streak": 1, "30-day-streak": 2}
+
+INDEXES = [
+    ("users", "ix_users_created_at_id", ["created_at", "id"]),
+    ("posts", "ix_posts_created_at_id", ["created_at", "id"]),
+    ("posts", "ix_posts_community_created_at_id", ["community_id", "created_at", "id"]),
+    ("communities", "ix_communities_created_at_id", ["created_at", "id"]),
+    ("messages", "ix_messages_pair_created_at_id", ["sender_id", "receiver_id", "created_at", "id"]),
+    ("comments", "ix_comments_post_created_at_id", ["post_id", "created_at", "id"]),
+    ("resources", "ix_resources_created_at_id", ["created_at", "id"]),
+    ("resources", "ix_resources_subject_level_created_at_id", ["subject", "level", "created_at", "id"]),
+]
+
+# association table -> (columns, unique constraint, index on the second column)
+PAIRS = {
+    "user_communities": (("user_id", "community_id"), "uq_user_communities", "ix_user_communities_community_id"),
+    "post_likes": (("user_id", "post_id"), "uq_post_likes", "ix_post_likes_post_id"),
+}
+
+RESOURCE_COLUMNS = [
+    ("storage_key", sa.String()),
+    ("filename", sa.String()),
+    ("content_type", sa.String()),
+    ("size", sa.Integer()),
+]
+
+
+def _inspector():
+    # Fresh every time, batch operations rebuild tables underneath a cached one
+    return sa.inspect(op.get_bind())
+
+
+def _has_table(table):
+    return _inspector().has_table(table)
+
+
+def _columns(table):
+    return {column["name"] for column in _inspector().get_columns(table)}
+
+
+def _indexes(table):
+    return {index["name"] for index in _inspector().get_indexes(table)}
+
+
+def _uniques(table):
+    return {constraint["name"] for constraint in _inspector().get_unique_constraints(table)}
+
+
+def _dedupe_pairs(table, columns):
+    """Drop rows with a NULL side and all but one copy of each pair"""
+    bind = op.get_bind()
+    a, b = columns
+    op.execute(f"DELETE FROM {table} WHERE {a} IS NULL OR {b} IS NULL")
+    if bind.dialect.name == "postgresql":
+        op.execute(
+            f"DELETE FROM {table} x USING {table} y "
+            f"WHERE x.ctid > y.ctid AND x.{a} = y.{a} AND x.{b} = y.{b}"
+        )
+    else:
+        op.execute(f"DELETE FROM {table} WHERE rowid NOT IN (SELECT MIN(rowid) FROM {table} GROUP BY {a}, {b})")
+
+
+def upgrade():
+    if "subjects" not in _columns("users"):
+        op.add_column("users", sa.Column("subjects", sa.JSON(), nullable=True))
+
+    if not _has_table("conversations"):
+        op.create_table(
+            "conversations",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_a_id", sa.Integer(), nullable=False),
+            sa.Column("user_b_id", sa.Integer(), nullable=False),
+            sa.Column("last_message_id", sa.Integer(), nullable=True),
+            sa.Column("last_message", sa.Text(), nullable=True),
+            sa.Column("last_sender_id", sa.Integer(), nullable=True),
+            sa.Column("last_message_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("unread_a", sa.Integer(), nullable=False),
+            sa.Column("unread_b", sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(["last_message_id"], ["messages.id"]),
+            sa.ForeignKeyConstraint(["last_sender_id"], ["users.id"]),
+            sa.ForeignKeyConstraint(["user_a_id"], ["users.id"]),
+            sa.ForeignKeyConstraint(["user_b_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("user_a_id", "user_b_id", name="uq_conversations_pair"),
+        )
+        op.create_index("ix_conversations_id", "conversations", ["id"], unique=False)
+        op.create_index("ix_conversations_user_a_last", "conversations", ["user_a_id", "last_message_at"])
+        op.create_index("ix_conversations_user_b_last", "conversations", ["user_b_id", "last_message_at"])
+        from app.services.chat_service import ChatService
+
+        ChatService(Session(bind=op.get_bind())).backfill()
+
+    if "member_count" not in _columns("communities"):
+        op.add_column("communities", sa.Column("member_count", sa.Integer(), server_default="0", nullable=False))
+
+    profile_columns = _columns("user_profiles")
+    if "badge_mask" not in profile_columns:
+        op.add_column("user_profiles", sa.Column("badge_mask", sa.Integer(), server_default="0", nullable=False))
+    if "badges" in profile_columns:
+        mask = " + ".join(
+            f"CASE WHEN badges LIKE '%{name}%' THEN {bit} ELSE 0 END" for name, bit in BADGE_BITS.items()
+        )
+        op.execute(f"UPDATE user_profiles SET badge_mask = {mask} WHERE badges IS NOT NULL")
+        with op.batch_alter_table("user_profiles") as batch:
+            batch.drop_column("badges")
+
+    for table, (columns, unique, index) in PAIRS.items():
+        if unique in _uniques(table):
+            continue
+        _dedupe_pairs(table, columns)
+        with op.batch_alter_table(table) as batch:
+            for column in columns:
+                batch.alter_column(column, existing_type=sa.Integer(), nullable=False)
+            batch.create_unique_constraint(unique, list(columns))
+        if index not in _indexes(table):
+            op.create_index(index, table, [columns[1]])
+    # Counted once duplicate memberships are gone
+    op.execute(
+        "UPDATE communities SET member_count = "
+        "(SELECT COUNT(*) FROM user_communities WHERE user_communities.community_id = communities.id)"
+    )
+
+    resource_columns = _columns("resources")
+    for name, type_ in RESOURCE_COLUMNS:
+        if name not in resource_columns:
+            op.add_column("resources", sa.Column(name, type_, nullable=True))
+
+    for table, name, columns in INDEXES:
+        if name not in _indexes(table):
+            op.create_index(name, table, columns)
+
+    from app.services.search_index import get_search_index
+
+    bind = op.get_bind()
+    get_search_index(bind.engine).install(bind)
+
+
+def downgrade():
+    # Search objects are left in place, the baseline schema doesn't mind them
+    for table, name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    with op.batch_alter_table("resources") as batch:
+        for name, _ in reversed(RESOURCE_COLUMNS):
+            batch.drop_column(name)
+    for table, (columns, unique, index) in PAIRS.items():
+        op.drop_index(index, table_name=table)
+        with op.batch_alter_table(table) as batch:
+            batch.drop_constraint(unique, type_="unique")
+            for column in columns:
+                batch.alter_column(column, existing_type=sa.Integer(), nullable=True)
+    op.add_column("user_profiles", sa.Column("badges", sa.String(), nullable=True))
+    for name, bit in BADGE_BITS.items():
+        op.execute(
+            f"UPDATE user_profiles SET badges = COALESCE(badges || ',', '') || '{name}' "
+            f"WHERE badge_mask & {bit} != 0"
+        )
+    with op.batch_alter_table("user_profiles") as batch:
+        batch.drop_column("badge_mask")
+    with op.batch_alter_table("communities") as batch:
+        batch.drop_column("member_count")
+    op.drop_table("conversations")